@@ -1,12 +1,25 @@
+import threading
 import streamlit as st
 from src.chatbot import Chatbot
+from src.engine import get_engine
 
-chatbot = Chatbot()
+# Heavy resources (LLM clients, retriever, memory graph) are built once per process
+@st.cache_resource
+def load_engine():
+    engine = get_engine()
+    # Built in the background so the page renders at once; a message sent
+    # before warm-up finishes waits only for what is still missing
+    threading.Thread(target=engine.warm_up, name="engine-warm-up", daemon=True).start()
+    return engine
 
 # Initialize session state to store conversation
 if 'conversation' not in st.session_state:
     st.session_state.conversation = []
 
+# Per-session conversation handle, so user_id/thread_id survive reruns
+if 'chatbot' not in st.session_state:
+    st.session_state.chatbot = Chatbot(engine=load_engine())
+
 # Function to handle user input
 def handle_input():
     user_input = st.session_state.user_input
@@ -15,12 +28,9 @@ def handle_input():
     elif user_input:
         # Store user input in the session state conversation list
         st.session_state.conversation.append({"role": "user", "content": user_input})
-        
-        # Get chatbot response
-        response = chatbot.process_message(user_input)
-        
-        # Store chatbot response in the session state conversation list
-        st.session_state.conversation.append({"role": "chatbot", "content": response})
+
+        # The response is streamed below the conversation history on this rerun
+        st.session_state.pending_input = user_input
         
     # Clear the input field after submission
     st.session_state.user_input = ""
@@ -85,6 +95,22 @@ for message in st.session_state.conversation:
             </div>
         """, unsafe_allow_html=True)
 
+# Stream the chatbot response for the latest message token by token
+pending_input = st.session_state.pop("pending_input", None)
+if pending_input:
+    placeholder = st.empty()
+    response = ""
+    for token in st.session_state.chatbot.stream_message(pending_input):
+        response += token
+        placeholder.markdown(f"""
+            <div class='chatbot-bubble'>
+                {response}
+            </div>
+        """, unsafe_allow_html=True)
+
+    # Store chatbot response in the session state conversation list
+    st.session_state.conversation.append({"role": "chatbot", "content": response})
+
 st.markdown("</div>", unsafe_allow_html=True)
 
 # Input box at the bottom
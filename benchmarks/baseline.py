@@ -0,0 +1,45 @@
+"""Saving benchmark metrics and comparing them with a saved baseline."""
+import json
+import os
+
+
+def save(path: str, metrics: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(metrics, f, indent=2, sort_keys=True)
+    print(f"\nsaved to {path}")
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float = 0.25, min_deltas: dict = None,
+            higher_is_better=()) -> list:
+    """Print metrics next to the baseline and return the names that regressed.
+
+    A metric regresses when it is worse than the baseline by more than
+    `tolerance` (relative) and by more than the absolute delta in
+    `min_deltas` for its name's suffix, e.g. {"_ms": 20}. Larger values
+    are worse unless the name is in `higher_is_better`.
+    """
+    min_deltas = min_deltas or {}
+    regressions = []
+    print(f"\n{'metric':<44} {'value':>11} {'baseline':>11} {'change':>8}")
+    for name, value in metrics.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<44} {value:11.2f} {'-':>11} {'-':>8}")
+            continue
+        change = (value - before) / abs(before) if before else 0.0
+        worse_by = before - value if name in higher_is_better else value - before
+        min_delta = next((delta for suffix, delta in min_deltas.items() if name.endswith(suffix)), 0.0)
+        regressed = worse_by > max(tolerance * abs(before), min_delta)
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<44} {value:11.2f} {before:11.2f} {change:+8.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+    return regressions
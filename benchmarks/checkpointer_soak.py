@@ -0,0 +1,84 @@
+"""Resident memory after many simulated sessions, per checkpointer.
+
+Usage (from the repository root):
+
+    python -m benchmarks.checkpointer_soak --sessions 10000 --turns 5
+
+Each session is a thread on a small LangGraph graph (no LLM) that appends a
+user and an assistant message per turn, like the memory graph does. Reports
+resident set size after every 10% of sessions for MemorySaver and for
+BoundedSqliteSaver. Run one checkpointer per process (`--saver`) for clean
+numbers; the default runs both in sequence.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from src.utils.checkpointer import BoundedSqliteSaver
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def build_graph(checkpointer):
+    def reply(state: MessagesState):
+        return {"messages": [("ai", "x" * 400)]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node(reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def soak(saver_name, sessions, turns, tmp):
+    if saver_name == "memory":
+        checkpointer = MemorySaver()
+    else:
+        checkpointer = BoundedSqliteSaver(os.path.join(tmp, "checkpoints.sqlite3"), max_threads_in_memory=100)
+    graph = build_graph(checkpointer)
+
+    start = time.perf_counter()
+    baseline = rss_mb()
+    step = max(sessions // 10, 1)
+    for session in range(sessions):
+        config = {"configurable": {"thread_id": f"session-{session}"}}
+        for turn in range(turns):
+            graph.invoke({"messages": [("user", f"message {turn} " + "y" * 200)]}, config)
+        if (session + 1) % step == 0:
+            print(f"{saver_name:<8} sessions={session + 1:>7,}  rss={rss_mb():8.1f} MB  (+{rss_mb() - baseline:7.1f} MB)")
+    print(f"{saver_name:<8} done in {time.perf_counter() - start:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--saver", choices=["memory", "sqlite"], default=None)
+    args = parser.parse_args()
+
+    if args.saver is None:
+        # Separate processes so one saver's heap does not inflate the other's RSS
+        for saver_name in ("memory", "sqlite"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.checkpointer_soak", "--sessions", str(args.sessions),
+                 "--turns", str(args.turns), "--saver", saver_name],
+                check=True,
+            )
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        soak(args.saver, args.sessions, args.turns, tmp)
+
+
+if __name__ == "__main__":
+    main()
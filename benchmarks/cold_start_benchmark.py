@@ -0,0 +1,156 @@
+"""Import-time and cold-start report, with a baseline check for regressions.
+
+Usage (from the repository root):
+
+    python -m benchmarks.cold_start_benchmark
+    python -m benchmarks.cold_start_benchmark --save benchmarks/data/cold_start.json
+    python -m benchmarks.cold_start_benchmark --baseline benchmarks/data/cold_start.json
+    python -m benchmarks.cold_start_benchmark --warm-up --michelin
+
+Every measurement runs in a fresh interpreter. Imports are timed with
+`python -X importtime` and without OPENAI_API_KEY or TAVILY_API_KEY, so a
+module that builds a client or loads a resource at import fails here. The
+report lists each entry module's cumulative import time and the packages
+that account for most of it.
+
+"cold start" is the wall time of importing `src.chatbot` and creating the
+engine and a `Chatbot` handle. `--warm-up` also times `engine.warm_up()`
+stage by stage with placeholder keys; the Michelin retriever is included
+with `--michelin`, which needs the database to exist already.
+
+With `--baseline`, a metric slower than the baseline by more than
+`--tolerance` (relative) and `--min-delta-ms` (absolute) is a regression,
+and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+from benchmarks import baseline
+
+ENTRY_MODULES = [
+    "src.chatbot",
+    "src.engine",
+    "src.services.llm_gateway",
+    "src.chains.restaurant_chain",
+    "src.utils.long_term_memory",
+    "server",
+]
+
+KEY_VARS = ("OPENAI_API_KEY", "TAVILY_API_KEY")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import json, time
+start = time.perf_counter()
+from src.chatbot import Chatbot
+from src.engine import get_engine
+Chatbot(engine=get_engine())
+timings = dict(cold_start=time.perf_counter() - start)
+if {warm_up}:
+    timings.update(get_engine().warm_up(michelin={michelin}))
+print(json.dumps(timings))
+"""
+
+
+def _env(with_keys: bool) -> dict:
+    env = dict(os.environ)
+    env["LANGCHAIN_TRACING_V2"] = "false"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    for name in KEY_VARS:
+        env.pop(name, None)
+    if with_keys:
+        # Client construction only needs a key to be present, not a valid one
+        env["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY", "sk-benchmark-placeholder")
+        env["TAVILY_API_KEY"] = os.getenv("TAVILY_API_KEY", "tvly-benchmark-placeholder")
+    return env
+
+
+def parse_importtime(stderr: str):
+    """[(depth, name, self_us, cumulative_us)] from `-X importtime` output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_part, cumulative_us, name = line.split("|", 2)
+        self_us = int(self_part.split(":")[-1])
+        # One leading space, then two more per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), self_us, int(cumulative_us)))
+    return entries
+
+
+def time_import(module: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(with_keys=False),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} without API keys failed:\n{result.stderr[-2000:]}")
+    entries = parse_importtime(result.stderr)
+    total_us = next(cumulative for depth, name, _, cumulative in reversed(entries) if name == module)
+    by_package = defaultdict(int)
+    for _, name, self_us, _ in entries:
+        by_package[name.split(".")[0]] += self_us
+    return total_us / 1e6, by_package
+
+
+def time_cold_start(warm_up: bool, michelin: bool) -> dict:
+    code = COLD_START.format(warm_up=warm_up, michelin=michelin)
+    # The warm-up creates the checkpoint and recall databases under data/;
+    # only the Michelin retriever needs the real one
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=REPO_ROOT if michelin else workdir, env=_env(with_keys=warm_up))
+    if result.returncode != 0:
+        raise RuntimeError(f"cold start failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int, warm_up: bool, michelin: bool, top: int):
+    metrics = {}
+    for module in ENTRY_MODULES:
+        samples = [time_import(module) for _ in range(runs)]
+        metrics[f"import:{module}_ms"] = 1000 * statistics.median(total for total, _ in samples)
+        if module == "src.chatbot" or module == ENTRY_MODULES[-1]:
+            packages = samples[-1][1]
+            heaviest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+            print(f"heaviest packages under `import {module}` (self time, last run):")
+            for package, self_us in heaviest:
+                print(f"    {package:<28} {self_us / 1000:9.1f} ms")
+
+    samples = [time_cold_start(warm_up, michelin) for _ in range(runs)]
+    for stage in samples[0]:
+        metrics[f"startup:{stage}_ms"] = 1000 * statistics.median(sample[stage] for sample in samples)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement; the median is kept.")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed per import report.")
+    parser.add_argument("--warm-up", action="store_true", help="Also time engine.warm_up() stage by stage.")
+    parser.add_argument("--michelin", action="store_true", help="Include the Michelin retriever in the warm-up.")
+    parser.add_argument("--save", default=None, help="Write the metrics as JSON, e.g. as a new baseline.")
+    parser.add_argument("--baseline", default=None, help="JSON from an earlier --save to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    metrics = run(args.runs, args.warm_up, args.michelin, args.top)
+
+    regressions = baseline.compare(metrics, baseline.load(args.baseline) if args.baseline else {},
+                                   args.tolerance, {"_ms": args.min_delta_ms})
+    if args.save:
+        baseline.save(args.save, metrics)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Prompt tokens of the Michelin chain with and without context packing.
+
+Usage (from the repository root):
+
+    python -m benchmarks.context_packing_benchmark --rows 2000 --budget 800
+    python -m benchmarks.context_packing_benchmark --csv data/dataset/canada_michelin_guide_restaurants_Aug2024.csv
+
+Restaurants come from `--csv` or from synthetic rows. `--duplicate-rate` of
+the synthetic rows are listed twice, at another street number, as happens
+across guide revisions. A lexical `MichelinRetriever` over an in-memory
+docstore answers a fixed query set, so no embeddings or API keys are
+needed.
+
+Each query's prompt is rendered twice. The old one puts the template with
+the column glossary and `str(documents)` into `{context}`. The packed one
+goes through `RestaurantChain`'s own template and packer. The report gives
+the prompt tokens per query, the total saving and its cost at the chain
+model's input price. "kept" is the share of distinct retrieved restaurants
+that are still in the packed context.
+"""
+import os
+import argparse
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.stores import InMemoryStore
+
+from benchmarks.fakes import install_fake_models
+from benchmarks.ingest_benchmark import synthetic_rows
+from src.chains.michelin_context import parse_fields
+from src.chains.michelin_retriever import MichelinRetriever
+from src.utils.build_RAG_db import iter_csv_chunks, row_to_document
+from src.utils.tracing import estimate_cost
+
+# The Michelin prompt before context packing
+LEGACY_TEMPLATE = """
+            Information to understand the context:
+            Data: michelin guide restaurants
+            Columns:
+                Name: The name of the restaurant.
+                Address: Full address, including city, region, and country.
+                Location: City and country of the restaurant.
+                Price: The average cost range represented by symbols (e.g., $, $$, $$$).
+                Cuisine: Type of cuisine offered by the restaurant.
+                Coordinates: Longitude and latitude for mapping the restaurant's location.
+                Contact Information: Phone number and URLs for the Michelin Guide page and the restaurant's official website.
+                Award: Michelin distinction (e.g., Michelin Star, Bib Gourmand, Selected Restaurants).
+                GreenStar: Indicates whether the restaurant has a Michelin Green Star for sustainability.
+                Description: A brief summary highlighting the restaurant's ambiance, menu, and standout dishes.
+
+            Answer the question based on the following context: {context}
+            Question: {input}
+        """
+
+QUERIES = [
+    "Which Michelin 1 Star restaurants serve ramen in Toronto?",
+    "Best Michelin-starred sushi in Vancouver under $$$?",
+    "Recommend a Michelin Guide restaurant near downtown Montreal.",
+    "Bib Gourmand French restaurants in Toronto",
+    "What is the address of a Japanese Michelin restaurant in Vancouver?",
+    "Michelin Green Star restaurants with a sustainable menu",
+    "Phone number and website to book a 2 Stars restaurant in Montreal",
+    "Cheap Michelin Korean food in Toronto",
+    "Italian Michelin Selected Restaurants with a terrace in Vancouver",
+    "Seafood tasting menu in a Michelin restaurant",
+]
+
+
+def load_documents(args):
+    if args.csv:
+        return {row_id: document for chunk in iter_csv_chunks(args.csv, 1000) for row_id, _, document in chunk}
+    rows = synthetic_rows(args.rows, seed=args.seed)
+    step = int(1 / args.duplicate_rate) if args.duplicate_rate else 0
+    duplicates = [dict(row, Address="1" + row["Address"]) for row in rows[::step]] if step else []
+    rows = rows + duplicates
+    return {f"row-{i}": row_to_document(row, i) for i, row in enumerate(rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=None, help="Michelin CSV; synthetic rows when omitted.")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--budget", type=int, default=800, help="Context budget, tokens.")
+    args = parser.parse_args()
+
+    # The chain is built for its template and packer only; no model is called
+    install_fake_models()
+    from src.chains.restaurant_chain import RestaurantChain
+
+    chain = RestaurantChain(top_k=args.top_k, context_budget_tokens=args.budget)
+    docstore = InMemoryStore()
+    docstore.mset(list(load_documents(args).items()))
+    chain._retriever = MichelinRetriever(vectorstore=None, docstore=docstore, top_k=args.top_k, mode="lexical")
+
+    legacy_prompt = ChatPromptTemplate.from_template(LEGACY_TEMPLATE)
+    packed_prompt = ChatPromptTemplate.from_template(chain.templates["michelin"])
+    count = chain.context_packer.count_tokens
+
+    print(f"{len(docstore.store)} restaurants ({os.path.basename(args.csv) if args.csv else 'synthetic'}), "
+          f"top {args.top_k}, budget {args.budget} tokens")
+    print(f"  {'query':<60} {'docs':>4} {'rows':>4} {'old':>6} {'packed':>6} {'saved':>6} {'kept':>5}")
+    totals = {"old": 0, "packed": 0}
+    for query in QUERIES:
+        documents = chain._retrieve(query, None)
+        context = chain._pack(query, documents)
+        old = count(legacy_prompt.format(context=documents, input=query))
+        packed = count(packed_prompt.format(context=context, input=query))
+        totals["old"] += old
+        totals["packed"] += packed
+        names = {parse_fields(document).get("Name") for document in documents}
+        kept = sum(f"\n{name} | " in f"\n{context}" for name in names) / len(names) if names else 1.0
+        print(f"  {query[:60]:<60} {len(documents):4d} {len(context.splitlines()) - 1:4d} {old:6d} {packed:6d} "
+              f"{1 - packed / old:6.0%} {kept:5.0%}")
+
+    saved = totals["old"] - totals["packed"]
+    model = chain.llm.model
+    print(f"total prompt tokens: old {totals['old']}, packed {totals['packed']} "
+          f"({saved / totals['old']:.0%} fewer)")
+    print(f"input cost per 1000 queries on {model}: old ${1000 * estimate_cost(model, totals['old'], 0) / len(QUERIES):.3f}, "
+          f"packed ${1000 * estimate_cost(model, totals['packed'], 0) / len(QUERIES):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""A local, OpenAI-compatible fake for load tests.
+
+Usage (from the repository root):
+
+    python -m benchmarks.fake_openai_server --port 8765 --latency 0.3 --tokens-per-s 100
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+
+/v1/chat/completions answers after `--latency` seconds and streams
+`--answer-tokens` words at `--tokens-per-s`. Requests that force a function
+(structured output) get a tool call whose arguments pick the last enum
+value of each required field, which is "others" for the service router. Requests that offer tools without forcing
+one (the memory agent) get an empty answer, so turns fall through to the
+routed services, unless `--agent-answers` is set. /v1/embeddings returns
+deterministic hash vectors. /stats reports request counts.
+"""
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import argparse
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+settings = {"latency_s": 0.3, "tokens_per_s": 100.0, "answer_tokens": 40, "dim": 256, "agent_answers": False}
+stats = Counter()
+
+
+def _vector(key: str, dim: int):
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    values = []
+    while len(values) < dim:
+        values.extend(b / 127.5 - 1.0 for b in digest)
+        digest = hashlib.sha256(digest).digest()
+    return values[:dim]
+
+
+def _fake_arguments(parameters: dict) -> dict:
+    arguments = {}
+    for name in parameters.get("required", []):
+        schema = parameters.get("properties", {}).get(name, {})
+        if "enum" in schema:
+            arguments[name] = schema["enum"][-1]
+        elif schema.get("type") in ("integer", "number"):
+            arguments[name] = 0
+        elif schema.get("type") == "boolean":
+            arguments[name] = False
+        else:
+            arguments[name] = "fake"
+    return arguments
+
+
+def _plan(body: dict):
+    """(content words, tool call or None) for a chat completion request."""
+    tools = body.get("tools") or []
+    choice = body.get("tool_choice")
+    if isinstance(choice, dict) or (choice == "required" and tools):
+        name = choice["function"]["name"] if isinstance(choice, dict) else tools[0]["function"]["name"]
+        function = next(tool["function"] for tool in tools if tool["function"]["name"] == name)
+        call = {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                "function": {"name": name, "arguments": json.dumps(_fake_arguments(function.get("parameters", {})))}}
+        return [], call
+    if tools and not settings["agent_answers"]:
+        return [], None
+    return [f"word{i}" for i in range(settings["answer_tokens"])], None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["chat_completions"] += 1
+    words, call = _plan(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    model = body.get("model", "fake")
+    prompt_tokens = sum(len(str(message.get("content") or "").split()) for message in body.get("messages", []))
+    await asyncio.sleep(settings["latency_s"])
+
+    if not body.get("stream"):
+        await asyncio.sleep(len(words) / settings["tokens_per_s"])
+        message = {"role": "assistant", "content": " ".join(words) if words else ("" if call is None else None)}
+        if call is not None:
+            message["tool_calls"] = [call]
+        return JSONResponse({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if call else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                      "total_tokens": prompt_tokens + len(words)},
+        })
+
+    stats["streams"] += 1
+
+    def chunk(delta, finish_reason=None):
+        return "data: " + json.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        if call is not None:
+            yield chunk({"tool_calls": [dict(call, index=0)]})
+        for i, word in enumerate(words):
+            await asyncio.sleep(1 / settings["tokens_per_s"])
+            yield chunk({"content": word if i == 0 else f" {word}"})
+        yield chunk({}, "tool_calls" if call else "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield "data: " + json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                          "total_tokens": prompt_tokens + len(words)},
+            }) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body["input"]
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    stats["embeddings"] += 1
+    stats["embedded_texts"] += len(inputs)
+    await asyncio.sleep(settings["latency_s"] / 4)
+    data = [{"object": "embedding", "index": i, "embedding": _vector(json.dumps(item), settings["dim"])}
+            for i, item in enumerate(inputs)]
+    return {"object": "list", "data": data, "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+
+@app.get("/stats")
+async def get_stats():
+    return dict(stats)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-s", type=float, default=100.0)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimension.")
+    parser.add_argument("--agent-answers", action="store_true")
+    args = parser.parse_args()
+
+    settings.update(latency_s=args.latency, tokens_per_s=args.tokens_per_s, answer_tokens=args.answer_tokens,
+                    dim=args.dim, agent_answers=args.agent_answers)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Local stand-ins for the OpenAI models, with configurable latency.
+
+`FakeChatModel`, `FakeEmbeddings` and `FakeTokenizer` replace the chat
+models, the embeddings model and tiktoken's encodings, so the real chains
+and memory graph run without network access or API keys; install them
+with `install_fake_models()`.
+"""
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import Counter
+from typing import Any, Iterator, AsyncIterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash-based embeddings with simulated request latency.
+
+    Each call sleeps `latency_s` plus `per_text_s` per input text, like one
+    batched embeddings request.
+    """
+
+    def __init__(self, dim: int = 256, latency_s: float = 0.0, per_text_s: float = 0.0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.per_text_s = per_text_s
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        values = []
+        while len(values) < self.dim:
+            values.extend(b / 127.5 - 1.0 for b in digest)
+            digest = hashlib.sha256(digest).digest()
+        return values[:self.dim]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.latency_s + self.per_text_s * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeTokenizer:
+    """Word-level stand-in for a tiktoken encoding, which would be downloaded on first use.
+
+    A token is a word with the whitespace before it. Ids are assigned on
+    first sight, so `decode` restores any prefix of an encoded text exactly.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._pieces = []
+        self._lock = threading.Lock()
+
+    def encode(self, text: str, **kwargs) -> List[int]:
+        tokens = []
+        for piece in re.findall(r"\s*\S+|\s+", text):
+            token = self._ids.get(piece)
+            if token is None:
+                with self._lock:
+                    token = self._ids.setdefault(piece, len(self._pieces))
+                    if token == len(self._pieces):
+                        self._pieces.append(piece)
+            tokens.append(token)
+        return tokens
+
+    def decode(self, tokens, **kwargs) -> str:
+        return "".join(self._pieces[token] for token in tokens)
+
+
+class FakeModelStats:
+    """Calls and tokens of every fake model that shares this object."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.tool_calls = Counter()
+        self.prompt_tokens = Counter()
+        self.completion_tokens = Counter()
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int, tool_call: Optional[str]):
+        with self._lock:
+            self.calls[model] += 1
+            self.prompt_tokens[model] += prompt_tokens
+            self.completion_tokens[model] += completion_tokens
+            if tool_call:
+                self.tool_calls[tool_call] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"calls": dict(self.calls), "tool_calls": dict(self.tool_calls),
+                    "prompt_tokens": dict(self.prompt_tokens), "completion_tokens": dict(self.completion_tokens)}
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+# (pattern on the user's message, tool) pairs tried in order by the memory agent
+DEFAULT_TOOL_SCRIPT = (
+    (r"\b(remember|i am|i'm|i like|i love|i prefer|my )", "save_recall_memory"),
+    (r"\b(what do you know about me|do you remember)\b", "search_recall_memories"),
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model with simulated latency and token rate.
+
+    Each call waits `latency_s`, then produces `answer_tokens` words at
+    `tokens_per_s` (0 is instant). The words depend only on the prompt.
+
+    With tools bound, a forced tool (structured output) gets arguments
+    built from its JSON schema; enum values are picked by a hash of the
+    prompt. Otherwise `tool_script` decides: the first pattern that matches
+    the latest user message calls its tool with that message. A turn that
+    already has a tool result is answered. Any other turn is answered with
+    probability `agent_answer_rate`, chosen by hash, and gets an empty reply
+    otherwise, so the routed services take over. A tool-calling message
+    carries `tool_call_preamble` as its text, as models sometimes write a
+    sentence before calling a tool.
+    """
+
+    model: str = "fake"
+    latency_s: float = 0.0
+    tokens_per_s: float = 0.0
+    answer_tokens: int = 20
+    agent_answer_rate: float = 0.0
+    tool_call_preamble: str = ""
+    tool_script: Any = DEFAULT_TOOL_SCRIPT
+    stats: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model}
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        params = super()._get_ls_params(stop=stop, **kwargs)
+        params["ls_model_name"] = self.model
+        return params
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _plan(self, messages: List[BaseMessage], tools=None, tool_choice=None) -> AIMessage:
+        prompt = "\n".join(str(message.content) for message in messages)
+        seed = _stable_hash(prompt)
+        prompt_tokens = len(prompt.split())
+        tools = tools or []
+        last_user = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+
+        call = None
+        if tools and tool_choice not in (None, "auto", "none"):
+            if isinstance(tool_choice, dict):
+                name = tool_choice["function"]["name"]
+            elif tool_choice in ("any", "required"):
+                name = tools[0]["function"]["name"]
+            else:
+                name = tool_choice
+            function = next(tool["function"] for tool in tools if tool["function"]["name"] == name)
+            call = (name, self._arguments(function.get("parameters", {}), seed, last_user))
+        elif tools and not isinstance(messages[-1], ToolMessage):
+            names = {tool["function"]["name"] for tool in tools}
+            for pattern, name in self.tool_script:
+                if name in names and re.search(pattern, last_user.lower()):
+                    key = "memory" if name == "save_recall_memory" else "query"
+                    call = (name, {key: last_user})
+                    break
+            if call is None and (seed % 1000) >= 1000 * self.agent_answer_rate:
+                return self._finish(AIMessage(content=""), prompt_tokens, 0, None)
+
+        if call is not None:
+            name, arguments = call
+            message = AIMessage(content=self.tool_call_preamble, tool_calls=[{"name": name, "args": arguments, "id": f"call_{seed % 10**12}",
+                                                         "type": "tool_call"}])
+            return self._finish(message, prompt_tokens, len(str(arguments).split()), name)
+        words = [f"word{(seed >> (i % 48)) % 1000}" for i in range(self.answer_tokens)]
+        return self._finish(AIMessage(content=" ".join(words)), prompt_tokens, len(words), None)
+
+    @staticmethod
+    def _arguments(parameters: dict, seed: int, text: str) -> dict:
+        arguments = {}
+        for name in parameters.get("required", []):
+            schema = parameters.get("properties", {}).get(name, {})
+            if "enum" in schema:
+                arguments[name] = schema["enum"][seed % len(schema["enum"])]
+            elif schema.get("type") in ("integer", "number"):
+                arguments[name] = seed % 10
+            elif schema.get("type") == "boolean":
+                arguments[name] = bool(seed % 2)
+            else:
+                arguments[name] = text
+        return arguments
+
+    def _finish(self, message: AIMessage, prompt_tokens: int, completion_tokens: int, tool_call):
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens}
+        if self.stats is not None:
+            self.stats.record(self.model, prompt_tokens, completion_tokens, tool_call)
+        return message
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_s if self.tokens_per_s else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._plan(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        time.sleep(self.latency_s + self._token_delay() * len(str(message.content).split()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._plan(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        await asyncio.sleep(self.latency_s + self._token_delay() * len(str(message.content).split()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage):
+        words = str(message.content).split()
+        for i, word in enumerate(words):
+            yield AIMessageChunk(content=word if i == 0 else f" {word}")
+        tool_call_chunks = [{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                            for i, call in enumerate(message.tool_calls)]
+        yield AIMessageChunk(content="", tool_call_chunks=tool_call_chunks, usage_metadata=message.usage_metadata)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._plan(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        time.sleep(self.latency_s)
+        for chunk in self._chunks(message):
+            if chunk.content:
+                time.sleep(self._token_delay())
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager is not None and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._plan(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        await asyncio.sleep(self.latency_s)
+        for chunk in self._chunks(message):
+            if chunk.content:
+                await asyncio.sleep(self._token_delay())
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager is not None and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+
+def install_fake_models(stats: FakeModelStats = None, latency_s: float = 0.0, tokens_per_s: float = 0.0,
+                        answer_tokens: int = 20, agent_answer_rate: float = 0.0, embeddings: Embeddings = None,
+                        tokenizer: FakeTokenizer = None, tool_call_preamble: str = ""):
+    """Make the LLM gateway build fakes instead of OpenAI models and tiktoken encodings."""
+    from src.services import llm_gateway
+
+    embeddings = embeddings if embeddings is not None else FakeEmbeddings()
+    tokenizer = tokenizer if tokenizer is not None else FakeTokenizer()
+
+    def chat(model, callbacks=None, **kwargs):
+        return FakeChatModel(model=model, latency_s=latency_s, tokens_per_s=tokens_per_s, answer_tokens=answer_tokens,
+                             agent_answer_rate=agent_answer_rate, tool_call_preamble=tool_call_preamble, stats=stats,
+                             callbacks=callbacks)
+
+    llm_gateway.set_model_factories(chat=chat, embeddings=lambda model, **kwargs: embeddings,
+                                    tokenizer=lambda model: tokenizer)
+    return embeddings
@@ -0,0 +1,168 @@
+"""Offline recall@k and latency of lexical, vector and hybrid Michelin retrieval.
+
+Usage (from the repository root):
+
+    python -m benchmarks.hybrid_retrieval_eval --queries 200
+    python -m benchmarks.hybrid_retrieval_eval --fake --rows 5000 --queries 200
+
+Three query kinds are generated from sampled restaurants, each with that
+restaurant as the single relevant answer:
+
+    name     "Tell me about <Name>"
+    street   "What is at <number street> in <city>"
+    semantic first sentence of the Description (with --fake, an exact child
+             chunk, since hash embeddings carry no meaning)
+
+For every mode the script reports recall@1/5/k per kind, p50/p95 latency
+and how many query-embedding calls were made; hybrid mode skips the call
+when BM25 is decisive. `--fake` indexes a synthetic CSV (or `--csv`) into a
+temporary directory with the local fake embedder.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from collections import defaultdict
+
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.chains.michelin_retriever import MichelinRetriever
+from src.utils.docstore import SQLiteDocStore
+from src.utils.build_RAG_db import (
+    CHILD_CHUNK_SIZE, COLLECTION_NAME, PERSIST_DIRECTORY, build_michelin_database, docstore_path,
+)
+
+MODES = ("lexical", "vector", "hybrid")
+
+
+class CountingEmbeddings(Embeddings):
+    """Counts query embeddings, the remote call hybrid mode tries to avoid."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self.embeddings.embed_query(text)
+
+
+def fields_of(document):
+    return dict(line.split(": ", 1) for line in document.page_content.split("\n") if ": " in line)
+
+
+def make_queries(parents, n, fake, seed):
+    rng = random.Random(seed)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHILD_CHUNK_SIZE)
+    queries = []
+    for row_id in rng.sample(sorted(parents), min(n, len(parents))):
+        document = parents[row_id]
+        fields = fields_of(document)
+        queries.append(("name", f"Tell me about {fields['Name']}", row_id))
+        street = fields["Address"].split(",")[0]
+        queries.append(("street", f"What is at {street} in {fields['Location'].split(',')[0]}", row_id))
+        if fake:
+            semantic = rng.choice(splitter.split_documents([document])).page_content
+        else:
+            semantic = fields["Description"].split(". ")[0]
+        queries.append(("semantic", semantic, row_id))
+    return queries
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def evaluate(retriever, embeddings, queries, cutoffs):
+    hits = defaultdict(lambda: defaultdict(int))
+    totals = defaultdict(int)
+    latencies = []
+    calls_before = embeddings.queries
+    for kind, query, row_id in queries:
+        start = time.perf_counter()
+        documents = retriever.invoke(query)
+        latencies.append(time.perf_counter() - start)
+        ranked = [document.metadata["_row_id"] for document in documents]
+        totals[kind] += 1
+        for cutoff in cutoffs:
+            hits[kind][cutoff] += row_id in ranked[:cutoff]
+    return hits, totals, latencies, embeddings.queries - calls_before
+
+
+def tag_row_ids(docstore):
+    # Parents carry no id of their own; remember it for scoring
+    mget = docstore.mget
+
+    def tagged_mget(keys):
+        documents = mget(keys)
+        for key, document in zip(keys, documents):
+            if document is not None:
+                document.metadata["_row_id"] = key
+        return documents
+
+    docstore.mget = tagged_mget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=None, help="Defaults to the Michelin CSV, or a synthetic one with --fake.")
+    parser.add_argument("--rows", type=int, default=5000, help="Synthetic rows with --fake and no --csv.")
+    parser.add_argument("--queries", type=int, default=200, help="Restaurants sampled; three queries each.")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.fake:
+            from benchmarks.fakes import FakeEmbeddings
+            from benchmarks.ingest_benchmark import synthetic_rows, write_csv
+
+            base = FakeEmbeddings()
+            csv_path = args.csv
+            if csv_path is None:
+                csv_path = os.path.join(tmp, "michelin.csv")
+                write_csv(csv_path, synthetic_rows(args.rows, seed=args.seed))
+            persist_directory = os.path.join(tmp, "chroma")
+            build_michelin_database(csv_path=csv_path, persist_directory=persist_directory, embeddings=base)
+        else:
+            from langchain_openai import OpenAIEmbeddings
+
+            base = OpenAIEmbeddings()
+            persist_directory = PERSIST_DIRECTORY
+
+        embeddings = CountingEmbeddings(base)
+        docstore = SQLiteDocStore(docstore_path(persist_directory))
+        keys = list(docstore.yield_keys())
+        parents = dict(zip(keys, docstore.mget(keys)))
+        queries = make_queries(parents, args.queries, args.fake, args.seed)
+        tag_row_ids(docstore)
+        vectorstore = Chroma(collection_name=COLLECTION_NAME, embedding_function=embeddings,
+                             persist_directory=persist_directory)
+
+        cutoffs = sorted({1, 5, args.top_k})
+        kinds = ("name", "street", "semantic")
+        print(f"queries={len(queries)}  restaurants={len(parents)}  top_k={args.top_k}")
+        print(f"  {'mode':<8} " + "  ".join(f"{kind:>8}@{cutoff:<2}" for kind in kinds for cutoff in cutoffs)
+              + "      p50 ms   p95 ms  embed calls")
+        for mode in MODES:
+            retriever = MichelinRetriever(vectorstore=vectorstore, docstore=docstore, top_k=args.top_k, mode=mode)
+            # Build the indexes and load vectors outside the timed loop
+            retriever.index, retriever.lexical
+            hits, totals, latencies, calls = evaluate(retriever, embeddings, queries, cutoffs)
+            recalls = "  ".join(
+                f"{hits[kind][cutoff] / totals[kind]:>11.1%}" for kind in kinds for cutoff in cutoffs
+            )
+            print(f"  {mode:<8} {recalls}  {percentile(latencies, 0.5) * 1000:9.1f}  "
+                  f"{percentile(latencies, 0.95) * 1000:7.1f}  {calls:>11}")
+
+
+if __name__ == "__main__":
+    main()
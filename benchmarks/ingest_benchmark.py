@@ -0,0 +1,111 @@
+"""Throughput of the Michelin ingest pipeline against a local fake embedder.
+
+Usage (from the repository root):
+
+    python -m benchmarks.ingest_benchmark --rows 5000 --workers 1 4 8 --latency 0.2
+
+For each worker count a synthetic CSV is indexed into a fresh Chroma
+directory. The run is then repeated unchanged (everything skipped), and
+once more after editing `--change-rate` of the rows and dropping a few, to
+show upsert and delete handling.
+"""
+import os
+import csv
+import random
+import argparse
+import tempfile
+
+from src.utils.build_RAG_db import FIELDNAMES, build_michelin_database
+from benchmarks.fakes import FakeEmbeddings
+
+# City and its approximate centre (latitude, longitude)
+CITIES = {
+    "Toronto, Canada": (43.65, -79.38),
+    "Montreal, Canada": (45.50, -73.57),
+    "Vancouver, Canada": (49.28, -123.12),
+    "Quebec City, Canada": (46.81, -71.21),
+}
+AWARDS = ["1 Star", "2 Stars", "Bib Gourmand", "Selected Restaurants"]
+CUISINES = ["Japanese", "French", "Contemporary", "Italian", "Seafood", "Korean"]
+STREETS = ["Main Street", "Queen Street West", "Rue Saint-Denis", "Granville Street", "Ossington Avenue",
+           "Boulevard Saint-Laurent", "Dundas Street", "Commercial Drive", "Rue Notre-Dame", "King Street East"]
+DISHES = ["duck confit", "omakase", "tagliatelle", "oysters", "bibimbap", "tasting menu", "lobster roll",
+          "foie gras", "wood-fired pizza", "tempura", "tourtiere", "smoked brisket"]
+
+
+def synthetic_rows(n, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        city = rng.choice(list(CITIES))
+        latitude, longitude = CITIES[city]
+        rows.append({
+            "Name": f"Restaurant {i}",
+            "Address": f"{rng.randrange(1, 999)} {rng.choice(STREETS)}, {city}",
+            "Location": city,
+            "Price": "$" * rng.randrange(1, 5),
+            "Cuisine": rng.choice(CUISINES),
+            # Spread over roughly 20 km around the city centre
+            "Longitude": f"{longitude + rng.uniform(-0.15, 0.15):.4f}",
+            "Latitude": f"{latitude + rng.uniform(-0.1, 0.1):.4f}",
+            "PhoneNumber": "+1 555 0100",
+            "Url": f"https://guide.michelin.com/restaurant-{i}",
+            "WebsiteUrl": f"https://restaurant-{i}.example",
+            "Award": rng.choice(AWARDS),
+            "GreenStar": str(rng.random() < 0.1).upper(),
+            "FacilitiesAndServices": "Air conditioning,Counter dining",
+            "Description": f"Known for its {rng.choice(DISHES)}. " + "A lively room serving seasonal plates. " * rng.randrange(2, 8),
+        })
+    return rows
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _report(label, stats, embeddings):
+    rate = stats["upserted"] / stats["elapsed_s"] if stats["elapsed_s"] else 0.0
+    print(f"  {label:<10} {stats['elapsed_s']:7.2f} s  upserted={stats['upserted']:>6}  skipped={stats['skipped']:>6}  "
+          f"deleted={stats['deleted']:>4}  rows/s={rate:8.1f}  embed calls={embeddings.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per fake embeddings request.")
+    parser.add_argument("--change-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    for workers in args.workers:
+        print(f"workers={workers}")
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "michelin.csv")
+            persist_directory = os.path.join(tmp, "chroma")
+            write_csv(csv_path, rows)
+
+            def run(label):
+                embeddings = FakeEmbeddings(latency_s=args.latency)
+                stats = build_michelin_database(
+                    csv_path=csv_path, persist_directory=persist_directory, embeddings=embeddings,
+                    batch_size=args.batch_size, max_workers=workers,
+                )
+                _report(label, stats, embeddings)
+
+            run("initial")
+            run("unchanged")
+
+            changed = [dict(row) for row in rows[:-10]]
+            for row in random.Random(1).sample(changed, int(len(changed) * args.change_rate)):
+                row["Description"] += " Now with a new tasting menu."
+            write_csv(csv_path, changed)
+            run("edited")
+
+
+if __name__ == "__main__":
+    main()
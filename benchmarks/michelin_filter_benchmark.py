@@ -0,0 +1,154 @@
+"""Filtered vs unfiltered Michelin retrieval: latency and constraint precision.
+
+Usage (from the repository root):
+
+    python -m benchmarks.michelin_filter_benchmark --queries 200
+    python -m benchmarks.michelin_filter_benchmark --fake --rows 5000 --queries 200
+
+Each query is generated from a sampled restaurant's own metadata with one
+to three constraints (award, price cap, cuisine, "in <city>" or "near
+<city>"), e.g. "Bib Gourmand Japanese near Montreal under $$". The same
+query goes to the plain parent-document retriever and to MichelinRetriever.
+Precision is the fraction of returned restaurants that satisfy every
+constraint of the query; "empty" counts queries that returned nothing.
+
+`--fake` indexes a synthetic CSV (or `--csv`) into a temporary directory
+with the local fake embedder, so only the filtering effect is measured.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from langchain_chroma import Chroma
+
+from src.chains.michelin_retriever import MichelinRetriever
+from src.utils.docstore import SQLiteDocStore
+from src.utils.build_RAG_db import (
+    COLLECTION_NAME, ID_KEY, PERSIST_DIRECTORY, build_michelin_database, docstore_path,
+)
+from src.utils.michelin_index import DEFAULT_NEAR_KM, MichelinFilters, MichelinIndex, city_of
+from benchmarks.michelin_retrieval_benchmark import build_retriever
+
+
+def make_query(metadata, index, rng):
+    """A query phrase and the filters it should be parsed into."""
+    parts, filters = [], MichelinFilters()
+    kinds = rng.sample(["award", "price", "cuisine", "location"], rng.randrange(1, 4))
+    award = metadata.get("award", "")
+    if "award" in kinds and award and award.lower() != "selected restaurants":
+        parts.append(award)
+        filters["awards"] = [award.lower()]
+    if "cuisine" in kinds and metadata.get("cuisine"):
+        cuisine = metadata["cuisine"].split(",")[0].strip()
+        parts.append(f"{cuisine} restaurant")
+        filters["cuisines"] = [cuisine.lower()]
+    else:
+        parts.append("restaurant")
+    city = city_of(metadata.get("location", ""))
+    if "location" in kinds and city:
+        if rng.random() < 0.5 and city in index.city_centroids:
+            parts.append(f"near {metadata['location'].split(',')[0]}")
+            filters["near"] = index.city_centroids[city]
+            filters["radius_km"] = DEFAULT_NEAR_KM
+        else:
+            parts.append(f"in {metadata['location'].split(',')[0]}")
+            filters["city"] = city
+    if "price" in kinds and metadata.get("price_level"):
+        cap = min(metadata["price_level"] + rng.randrange(0, 2), 4)
+        parts.append(f"under {'$' * cap}")
+        filters["max_price"] = cap
+    return " ".join(parts), filters
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run(label, retriever, queries, index):
+    latencies, precisions, empty = [], [], 0
+    for query, filters in queries:
+        start = time.perf_counter()
+        documents = retriever.invoke(query)
+        latencies.append(time.perf_counter() - start)
+        if not documents:
+            empty += 1
+            continue
+        ids = [document.metadata.get(ID_KEY) or document.metadata["_row_id"] for document in documents]
+        precisions.append(sum(index.matches(row_id, filters) for row_id in ids) / len(ids))
+    precision = sum(precisions) / len(precisions) if precisions else 0.0
+    print(f"  {label:<11} p50={percentile(latencies, 0.5) * 1000:7.1f} ms  p95={percentile(latencies, 0.95) * 1000:7.1f} ms  "
+          f"precision={precision:6.1%}  empty={empty}")
+
+
+def tag_row_ids(retriever):
+    # Parents carry no id of their own; remember it for precision scoring
+    docstore = retriever.docstore
+    mget = docstore.mget
+
+    def tagged_mget(keys):
+        documents = mget(keys)
+        for key, document in zip(keys, documents):
+            if document is not None:
+                document.metadata["_row_id"] = key
+        return documents
+
+    docstore.mget = tagged_mget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=None, help="Defaults to the Michelin CSV, or a synthetic one with --fake.")
+    parser.add_argument("--rows", type=int, default=5000, help="Synthetic rows with --fake and no --csv.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10, help="Child chunks fetched per query.")
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.fake:
+            from benchmarks.fakes import FakeEmbeddings
+            from benchmarks.ingest_benchmark import synthetic_rows, write_csv
+
+            embeddings = FakeEmbeddings()
+            csv_path = args.csv
+            if csv_path is None:
+                csv_path = os.path.join(tmp, "michelin.csv")
+                write_csv(csv_path, synthetic_rows(args.rows, seed=args.seed))
+            persist_directory = os.path.join(tmp, "chroma")
+            build_michelin_database(csv_path=csv_path, persist_directory=persist_directory, embeddings=embeddings)
+        else:
+            from langchain_openai import OpenAIEmbeddings
+
+            embeddings = OpenAIEmbeddings()
+            persist_directory = PERSIST_DIRECTORY
+
+        start = time.perf_counter()
+        index = MichelinIndex.from_docstore(SQLiteDocStore(docstore_path(persist_directory)))
+        print(f"index: {len(index.rows)} restaurants built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        rng = random.Random(args.seed)
+        sampled = rng.sample(sorted(index.rows), min(args.queries, len(index.rows)))
+        queries = [make_query(index.rows[row_id], index, rng) for row_id in sampled]
+
+        unfiltered = build_retriever(persist_directory, embeddings, args.k)
+        filtered = MichelinRetriever(
+            vectorstore=Chroma(collection_name=COLLECTION_NAME, embedding_function=embeddings,
+                               persist_directory=persist_directory),
+            docstore=SQLiteDocStore(docstore_path(persist_directory)),
+            k=args.k,
+        )
+        filtered._index = index
+        for retriever in (unfiltered, filtered):
+            tag_row_ids(retriever)
+
+        print(f"queries={len(queries)}  child k={args.k}")
+        run("unfiltered", unfiltered, queries, index)
+        run("filtered", filtered, queries, index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Latency and recall of the Michelin parent-document retriever.
+
+Usage (from the repository root):
+
+    python -m benchmarks.michelin_retrieval_benchmark --queries 100
+    python -m benchmarks.michelin_retrieval_benchmark --fake --queries 100
+
+By default the persisted index under data/embeddings_chroma is queried
+with OpenAI embeddings (build it first with `python -m src.utils.build_RAG_db`).
+Each query is the first sentence of a sampled restaurant's Description; a hit
+means that restaurant's parent row is among the returned documents.
+
+`--fake` indexes the CSV into a temporary directory with the local fake
+embedder and queries with exact child-chunk texts. That checks the
+child-to-parent wiring and measures latency without network access, but its
+recall says nothing about embedding quality.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from langchain_chroma import Chroma
+from langchain.retrievers import ParentDocumentRetriever
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.utils.docstore import SQLiteDocStore
+from src.utils.build_RAG_db import (
+    CHILD_CHUNK_SIZE, COLLECTION_NAME, ID_KEY, MICHELIN_CSV_PATH, PERSIST_DIRECTORY,
+    build_michelin_database, docstore_path, iter_csv_chunks, row_key,
+)
+
+
+def build_retriever(persist_directory, embeddings, k):
+    vectorstore = Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
+        persist_directory=persist_directory,
+    )
+    return ParentDocumentRetriever(
+        vectorstore=vectorstore,
+        docstore=SQLiteDocStore(docstore_path(persist_directory)),
+        child_splitter=RecursiveCharacterTextSplitter(chunk_size=CHILD_CHUNK_SIZE),
+        id_key=ID_KEY,
+        search_kwargs={"k": k},
+    )
+
+
+def sample_queries(csv_path, n, fake, seed):
+    rows = [(row_id, document) for chunk in iter_csv_chunks(csv_path, 1000) for row_id, _, document in chunk]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHILD_CHUNK_SIZE)
+    rng = random.Random(seed)
+    queries = []
+    for row_id, document in rng.sample(rows, min(n, len(rows))):
+        if fake:
+            query = rng.choice(splitter.split_documents([document])).page_content
+        else:
+            description = document.page_content.split("Description: ", 1)[-1]
+            query = description.split(". ")[0]
+        queries.append((row_id, query))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=MICHELIN_CSV_PATH)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10, help="Child chunks fetched per query.")
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = sample_queries(args.csv, args.queries, args.fake, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.fake:
+            from benchmarks.fakes import FakeEmbeddings
+
+            embeddings = FakeEmbeddings()
+            persist_directory = os.path.join(tmp, "chroma")
+            build_michelin_database(csv_path=args.csv, persist_directory=persist_directory, embeddings=embeddings)
+        else:
+            from langchain_openai import OpenAIEmbeddings
+
+            embeddings = OpenAIEmbeddings()
+            persist_directory = PERSIST_DIRECTORY
+
+        retriever = build_retriever(persist_directory, embeddings, args.k)
+        latencies, hits, parents = [], 0, 0
+        for row_id, query in queries:
+            start = time.perf_counter()
+            documents = retriever.invoke(query)
+            latencies.append(time.perf_counter() - start)
+            parents += len(documents)
+            hits += any(row_key_of(document) == row_id for document in documents)
+
+    latencies.sort()
+    print(f"queries={len(queries)}  child k={args.k}  mean parents returned={parents / len(queries):.1f}")
+    print(f"recall@parents={hits / len(queries):.1%}")
+    print(f"latency p50={latencies[len(latencies) // 2] * 1000:.1f} ms  "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms")
+
+
+def row_key_of(document):
+    fields = dict(line.split(": ", 1) for line in document.page_content.split("\n") if ": " in line)
+    return row_key(fields)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Offline end-to-end benchmark of the chatbot pipeline.
+
+Usage (from the repository root):
+
+    python -m benchmarks.pipeline_benchmark --users 20 --turns 5 --concurrency 8
+    python -m benchmarks.pipeline_benchmark --save benchmarks/data/pipeline_baseline.json
+    python -m benchmarks.pipeline_benchmark --baseline benchmarks/data/pipeline_baseline.json
+
+The real `Chatbot`, `ChatbotEngine`, restaurant chains, Michelin retriever
+and memory graph run on `FakeChatModel`, `FakeEmbeddings` and
+`FakeTokenizer` (see benchmarks/fakes.py). The fakes are installed through
+the LLM gateway, which also hands out the tokenizers, so no network access
+(not even tiktoken's first-use download) or API keys are needed. The working directory is a
+temporary one with a synthetic Michelin CSV, so the database, checkpoints
+and recall memories never touch data/.
+
+`--users` conversations of `--turns` turns come from benchmarks.workload.
+Each user's turns run in order, and up to `--concurrency` users run at
+once. `--mode batch` sends the whole workload through `src.batch.BatchRunner`
+instead, with `--concurrency` calls per batch; a turn's latency is then the
+time until its wave finished. The report gives:
+
+- throughput and p50/p95/p99 turn latency, also per intent;
+- the process RSS after warm-up and its growth over the run;
+- LLM and embedding calls per turn;
+- which branch answered.
+
+The fakes are deterministic. Call counts can still vary slightly with
+`--concurrency`, because that changes which repeated questions hit the
+response cache.
+
+With `--baseline`, a metric that is worse than the baseline by more than
+`--tolerance` is a regression, and the exit status is 1. Throughput
+regresses when it drops.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import Counter, defaultdict
+
+from benchmarks import baseline
+from benchmarks.fakes import FakeEmbeddings, FakeModelStats, install_fake_models
+from benchmarks.ingest_benchmark import synthetic_rows, write_csv
+from benchmarks.workload import generate_workload
+
+
+def rss_mb() -> float:
+    """Resident set size of this process; the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def build_offline_engine(rows: int, seed: int = 0):
+    """A warmed-up `ChatbotEngine` in a temporary working directory with a synthetic Michelin CSV.
+
+    Call `install_fake_models()` first. Returns the engine, the directory
+    (keep it referenced while the engine is in use) and the warm-up seconds.
+    """
+    # Fakes need no keys, but the database build checks for one
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+    from src.utils.build_RAG_db import MICHELIN_CSV_PATH
+
+    os.makedirs(os.path.dirname(MICHELIN_CSV_PATH))
+    write_csv(MICHELIN_CSV_PATH, synthetic_rows(rows, seed=seed))
+
+    from src.engine import ChatbotEngine
+
+    engine = ChatbotEngine()
+    start = time.perf_counter()
+    # Builds the Michelin database from the synthetic CSV as well
+    engine.warm_up()
+    return engine, workdir, time.perf_counter() - start
+
+
+async def run_turn(chatbot, message: str, mode: str):
+    if mode == "stream":
+        async for _ in chatbot.astream_message(message):
+            pass
+    elif mode == "sync":
+        await asyncio.to_thread(chatbot.process_message, message)
+    else:
+        await chatbot.aprocess_message(message)
+
+
+async def run_batch(engine, conversations, concurrency: int, on_half=None):
+    from src.batch import BatchRunner
+
+    records = [{"user_id": conversation["user_id"], "thread_id": conversation["thread_id"], "message": turn["message"],
+                "intent": turn["intent"]} for conversation in conversations for turn in conversation["turns"]]
+    runner = BatchRunner(engine, max_concurrency=concurrency)
+    results = []
+    start = time.perf_counter()
+    async for result in runner.arun(records):
+        # Latency is the time until the turn's wave finished
+        results.append((result["intent"], time.perf_counter() - start, result.get("winner")))
+        if on_half is not None and len(results) == len(records) // 2:
+            on_half()
+    return results, time.perf_counter() - start
+
+
+async def run_workload(engine, conversations, concurrency: int, mode: str, on_half=None):
+    from src.chatbot import Chatbot
+
+    if mode == "batch":
+        return await run_batch(engine, conversations, concurrency, on_half)
+
+    slots = asyncio.Semaphore(concurrency)
+    results = []
+    total = sum(len(conversation["turns"]) for conversation in conversations)
+
+    async def user(conversation):
+        chatbot = Chatbot(engine=engine, user_id=conversation["user_id"], thread_id=conversation["thread_id"])
+        async with slots:
+            for turn in conversation["turns"]:
+                start = time.perf_counter()
+                await run_turn(chatbot, turn["message"], mode)
+                results.append((turn["intent"], time.perf_counter() - start, chatbot.last_turn_timings.get("winner")))
+                if on_half is not None and len(results) == total // 2:
+                    on_half()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(conversation) for conversation in conversations))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5, help="Turns per user.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=["invoke", "stream", "sync", "batch"], default="invoke")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM time to first token, seconds.")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="Fake LLM output rate; 0 is instant.")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--agent-answer-rate", type=float, default=0.3,
+                        help="Share of turns the memory agent answers itself.")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Fake embeddings request time, seconds.")
+    parser.add_argument("--rows", type=int, default=300, help="Synthetic Michelin rows.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None, help="Write the metrics as JSON, e.g. as a new baseline.")
+    parser.add_argument("--baseline", default=None, help="JSON from an earlier --save to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline_metrics = baseline.load(args.baseline) if args.baseline else {}
+
+    stats = FakeModelStats()
+    embeddings = install_fake_models(
+        stats, latency_s=args.latency, tokens_per_s=args.tokens_per_s, answer_tokens=args.answer_tokens,
+        agent_answer_rate=args.agent_answer_rate, embeddings=FakeEmbeddings(latency_s=args.embed_latency),
+    )
+    engine, workdir, warm_up_s = build_offline_engine(args.rows, args.seed)
+
+    conversations = generate_workload(args.users, args.turns, seed=args.seed)
+    calls_before, embed_calls_before = Counter(stats.snapshot()["calls"]), embeddings.calls
+    rss = {"start": rss_mb()}
+    results, elapsed = asyncio.run(run_workload(
+        engine, conversations, args.concurrency, args.mode, on_half=lambda: rss.setdefault("half", rss_mb()),
+    ))
+    rss["end"] = rss_mb()
+
+    turns = len(results)
+    latencies = [latency for _, latency, _ in results]
+    calls = Counter(stats.snapshot()["calls"])
+    calls.subtract(calls_before)
+
+    print(f"{turns} turns by {args.users} users, concurrency {args.concurrency}, mode {args.mode}")
+    print(f"  warm-up (incl. {args.rows}-row Michelin build) {warm_up_s:.1f} s")
+    print(f"  {'intent':<12} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    by_intent = defaultdict(list)
+    for intent, latency, _ in results:
+        by_intent[intent].append(latency)
+    for intent, values in sorted(by_intent.items()):
+        print(f"  {intent:<12} {len(values):6d} {1000 * percentile(values, 0.5):8.1f} "
+              f"{1000 * percentile(values, 0.95):8.1f}")
+    winners = Counter(winner for _, _, winner in results)
+    print("  answered by: " + ", ".join(f"{winner}={count}" for winner, count in winners.most_common()))
+
+    metrics = {
+        "throughput_tps": turns / elapsed,
+        "latency_p50_ms": 1000 * percentile(latencies, 0.5),
+        "latency_p95_ms": 1000 * percentile(latencies, 0.95),
+        "latency_p99_ms": 1000 * percentile(latencies, 0.99),
+        "rss_start_mb": rss["start"],
+        "rss_growth_mb": rss["end"] - rss["start"],
+        "rss_growth_second_half_mb": rss["end"] - rss.get("half", rss["start"]),
+        "llm_calls_per_turn": sum(calls.values()) / turns,
+        "embedding_calls_per_turn": (embeddings.calls - embed_calls_before) / turns,
+    }
+    for model, count in sorted(calls.items()):
+        metrics[f"llm_calls_per_turn:{model}"] = count / turns
+
+    regressions = baseline.compare(metrics, baseline_metrics, args.tolerance,
+                                   {"_ms": 5.0, "_mb": 10.0, "_per_turn": 0.05},
+                                   higher_is_better=("throughput_tps",))
+    if save_path:
+        baseline.save(save_path, metrics)
+    # Out of the temporary directory, so it can be removed at exit
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
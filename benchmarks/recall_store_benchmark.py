@@ -0,0 +1,100 @@
+"""Recall-memory search latency as the total number of stored memories grows.
+
+Usage (from the repository root):
+
+    python -m benchmarks.recall_store_benchmark --sizes 10000 100000 1000000 --users 1000
+
+Memories are random unit vectors spread evenly over `--users` users, so the
+per-user partition size is `size / users`. "partitioned" is RecallMemoryStore
+(SQLite + per-user NumPy matrix, cold and warm partition). "global scan"
+mimics the previous InMemoryVectorStore path: a Python filter over every
+stored memory followed by cosine ranking; it is skipped above `--scan-limit`.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+from src.utils.recall_store import RecallMemoryStore
+
+
+def populate(store, size, users, dim, rng):
+    per_user = size // users
+    for u in range(users):
+        vectors = rng.standard_normal((per_user, dim), dtype=np.float32)
+        store.add_embedded(f"user-{u}", [f"memory {u}-{i}" for i in range(per_user)], vectors)
+
+
+def global_scan(documents, user_id, query, k=3):
+    matches = [doc for doc in documents if doc["user_id"] == user_id]
+    matrix = np.stack([doc["vector"] for doc in matches])
+    scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    return [matches[i]["content"] for i in np.argsort(-scores)[:k]]
+
+
+def _ms(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.95) - 1] * 1000
+
+
+def run(size, users, dim, queries, scan_limit, seed):
+    rng = np.random.default_rng(seed)
+    picker = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RecallMemoryStore(embeddings=None, path=os.path.join(tmp, "recall.sqlite3"), max_cached_users=users)
+        start = time.perf_counter()
+        populate(store, size, users, dim, rng)
+        load_s = time.perf_counter() - start
+        store._partitions.clear()
+
+        cold, warm = [], []
+        for _ in range(queries):
+            user_id = f"user-{picker.randrange(users)}"
+            query = rng.standard_normal(dim, dtype=np.float32)
+            for samples in (cold, warm):
+                start = time.perf_counter()
+                store.search_by_vector(user_id, query)
+                samples.append(time.perf_counter() - start)
+            store._partitions.pop(user_id, None)
+        store.close()
+
+    print(f"size={size:>9,}  per-user={size // users:>6,}  insert={load_s:7.1f} s")
+    print(f"  partitioned cold   p50={_ms(cold)[0]:8.3f} ms  p95={_ms(cold)[1]:8.3f} ms")
+    print(f"  partitioned warm   p50={_ms(warm)[0]:8.3f} ms  p95={_ms(warm)[1]:8.3f} ms")
+
+    if size > scan_limit:
+        print("  global scan        skipped (above --scan-limit)")
+        return
+    per_user = size // users
+    documents = [
+        {"user_id": f"user-{u}", "content": f"memory {u}-{i}", "vector": rng.standard_normal(dim, dtype=np.float32)}
+        for u in range(users) for i in range(per_user)
+    ]
+    scan = []
+    for _ in range(queries):
+        query = rng.standard_normal(dim, dtype=np.float32)
+        start = time.perf_counter()
+        global_scan(documents, f"user-{picker.randrange(users)}", query)
+        scan.append(time.perf_counter() - start)
+    print(f"  global scan        p50={_ms(scan)[0]:8.3f} ms  p95={_ms(scan)[1]:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=64, help="Embedding width (1536 for text-embedding-ada-002).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-limit", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.users, args.dim, args.queries, args.scan_limit, args.seed)
+
+
+if __name__ == "__main__":
+    main()
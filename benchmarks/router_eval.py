@@ -0,0 +1,112 @@
+"""Offline evaluation of the tiered intent router.
+
+Usage (from the repository root):
+
+    python -m benchmarks.router_eval
+    python -m benchmarks.router_eval --threshold 0.4 --with-llm
+
+Two labelled sets are scored separately: the development set the keyword
+rules were written against, and a held-out set written afterwards, which
+includes messages the rules once misrouted (personal statements that
+mention food, single weak keywords). Accuracy on the development set says
+little about the threshold; the held-out set is the one to watch.
+
+Without `--with-llm` only the local keyword tier runs, and the report gives
+its precision on the messages it routes and the share it routes. Messages
+it is not confident about are LLM fallbacks, and end-to-end accuracy is not
+known. With `--with-llm` the fallback and an all-LLM baseline are actually
+called (needs OPENAI_API_KEY) and the accuracy covers every message.
+
+Cost per 1k messages uses `--llm-cost-per-call`, the estimated price of one
+gpt-3.5-turbo structured routing call (~180 prompt + ~15 completion tokens).
+"""
+import json
+import time
+import argparse
+
+from src.services.intent_classifier import ROUTE_RULES, KeywordIntentClassifier, TieredClassifier
+
+DEFAULT_DATASET = "benchmarks/data/router_eval.jsonl"
+DEFAULT_HELDOUT = "benchmarks/data/router_eval_heldout.jsonl"
+# 180 prompt tokens at $0.50/1M plus 15 completion tokens at $1.50/1M
+DEFAULT_LLM_COST_PER_CALL = (180 * 0.50 + 15 * 1.50) / 1_000_000
+
+
+def load_dataset(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(rows, threshold, llm_route=None):
+    classifier = TieredClassifier(
+        [KeywordIntentClassifier(ROUTE_RULES)],
+        fallback=llm_route or (lambda message: None),
+        confidence_threshold=threshold,
+    )
+    local = local_correct = correct = 0
+    local_errors = []
+    start = time.perf_counter()
+    for row in rows:
+        # One pass through the tiers; without an LLM the fallback returns None
+        label, tier = classifier.classify_with_tier(row["message"])
+        if tier != "llm":
+            local += 1
+            local_correct += label == row["service_type"]
+            if label != row["service_type"]:
+                local_errors.append((row["message"], row["service_type"], label))
+        correct += label == row["service_type"]
+    elapsed = time.perf_counter() - start
+    return {
+        # Unknown without the LLM: fallbacks are not scored
+        "accuracy": correct / len(rows) if llm_route else None,
+        "local_precision": local_correct / local if local else None,
+        "fallback_rate": 1 - local / len(rows),
+        "elapsed_s": elapsed,
+        "local_errors": local_errors,
+        "stats": classifier.stats.snapshot(),
+    }
+
+
+def report(name, rows, result, args):
+    local_latency = result["stats"]["mean_latency_s"].get("keyword", 0.0)
+    cost_per_1k = result["fallback_rate"] * 1000 * args.llm_cost_per_call
+    baseline_cost_per_1k = 1000 * args.llm_cost_per_call
+    precision = result["local_precision"]
+
+    print(f"{name}: {len(rows)} messages, threshold {args.threshold}")
+    if result["accuracy"] is not None:
+        print(f"  tiered accuracy: {result['accuracy']:.1%}")
+    print(f"  local precision: {'-' if precision is None else f'{precision:.1%}'}   "
+          f"local hit rate: {1 - result['fallback_rate']:.1%}   mean local latency: {local_latency * 1e6:.1f} us")
+    print(f"  LLM cost per 1k messages: ${cost_per_1k:.4f} (all-LLM: ${baseline_cost_per_1k:.4f})")
+    for message, expected, got in result["local_errors"]:
+        print(f"    local miss: {message!r} expected={expected} got={got}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--heldout", default=DEFAULT_HELDOUT, help="Held-out set; an empty string skips it.")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--llm-cost-per-call", type=float, default=DEFAULT_LLM_COST_PER_CALL)
+    parser.add_argument("--with-llm", action="store_true")
+    args = parser.parse_args()
+
+    datasets = [("development set", load_dataset(args.dataset))]
+    if args.heldout:
+        datasets.append(("held-out set", load_dataset(args.heldout)))
+    llm_route = None
+    if args.with_llm:
+        from src.services.router_service import ChatbotRouter
+
+        router = ChatbotRouter()
+        llm_route = router._llm_route
+
+    for name, rows in datasets:
+        if llm_route is not None:
+            baseline_correct = sum(llm_route(row["message"]) == row["service_type"] for row in rows)
+            print(f"{name}: all-LLM baseline accuracy: {baseline_correct / len(rows):.1%}")
+        report(name, rows, evaluate(rows, args.threshold, llm_route), args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Load test of the async API server against the local fake OpenAI server.
+
+Usage (from the repository root):
+
+    python -m benchmarks.server_load_test --requests 500 --concurrency 32 --users 100
+    python -m benchmarks.server_load_test --stream --requests 500 --concurrency 32
+
+The fake OpenAI server (benchmarks.fake_openai_server) and `uvicorn
+server:app` are started as subprocesses in a temporary working directory,
+with a synthetic Michelin CSV there whose index is built before the server
+starts, so the checkpoints, recall memories and Chroma index they create
+never touch data/. Requests are spread over
+`--users` sessions and sent by `--concurrency` clients; the report gives
+requests/sec, latency percentiles (and time to first token with
+`--stream`), 429 rejections and errors, plus the server's /metrics,
+which include the LLM gateway's queue depth and wait times. The gateway's
+rate limits default to values high enough not to throttle the fake; lower
+`--rpm`/`--tpm` to watch the scheduler queue requests.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+from src.utils.build_RAG_db import MICHELIN_CSV_PATH
+from benchmarks.ingest_benchmark import synthetic_rows, write_csv
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGES = [
+    "What are the must-see attractions in Kyoto?",
+    "Plan a 3-day itinerary for Lisbon",
+    "Recommend a Bib Gourmand restaurant in Toronto",
+    "Any Japanese restaurants near Montreal under $$?",
+    "Where should I travel in October for hiking?",
+    "What's the weather usually like in Iceland?",
+    "Suggest a cheap place to eat sushi in Vancouver",
+    "Give me ideas for a romantic weekend getaway",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+async def wait_ready(url, timeout_s):
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise TimeoutError(f"{url} did not come up within {timeout_s}s")
+
+
+async def one_turn(client, base_url, body, stream):
+    start = time.perf_counter()
+    if not stream:
+        response = await client.post(f"{base_url}/chat", json=body)
+        return response.status_code, time.perf_counter() - start, None
+    ttft = None
+    async with client.stream("POST", f"{base_url}/chat/stream", json=body) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return response.status_code, time.perf_counter() - start, None
+        status = 200
+        async for line in response.aiter_lines():
+            if line.startswith("event: error"):
+                status = 500
+            elif line.startswith("data: {\"token\"") and ttft is None:
+                ttft = time.perf_counter() - start
+    return status, time.perf_counter() - start, ttft
+
+
+async def run_load(base_url, args):
+    rng = random.Random(args.seed)
+    jobs = asyncio.Queue()
+    for i in range(args.requests):
+        user = f"user-{rng.randrange(args.users)}"
+        jobs.put_nowait({"message": rng.choice(MESSAGES), "user_id": user, "thread_id": f"{user}-thread"})
+
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(300.0)) as client:
+        async def worker():
+            while not jobs.empty():
+                body = jobs.get_nowait()
+                try:
+                    results.append(await one_turn(client, base_url, body, args.stream))
+                except httpx.HTTPError:
+                    results.append((-1, float("nan"), None))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        server_metrics = (await client.get(f"{base_url}/metrics")).json()
+    return results, elapsed, server_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake LLM time to first token, seconds.")
+    parser.add_argument("--tokens-per-s", type=float, default=100.0)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=300, help="Synthetic Michelin rows indexed at startup.")
+    parser.add_argument("--max-concurrent-turns", type=int, default=64)
+    parser.add_argument("--max-queued-turns", type=int, default=256)
+    parser.add_argument("--rpm", type=float, default=100000, help="Gateway requests/min for every model.")
+    parser.add_argument("--tpm", type=float, default=100000000, help="Gateway tokens/min for every model.")
+    parser.add_argument("--openai-port", type=int, default=8765)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, MICHELIN_CSV_PATH)
+        os.makedirs(os.path.dirname(csv_path))
+        write_csv(csv_path, synthetic_rows(args.rows, seed=args.seed))
+
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+            OPENAI_BASE_URL=f"http://127.0.0.1:{args.openai_port}/v1",
+            OPENAI_API_KEY="sk-fake",
+            TAVILY_API_KEY=os.environ.get("TAVILY_API_KEY", "fake"),
+            LANGCHAIN_TRACING_V2="false",
+            MAX_CONCURRENT_TURNS=str(args.max_concurrent_turns),
+            MAX_QUEUED_TURNS=str(args.max_queued_turns),
+            LLM_MODEL_LIMITS=json.dumps({
+                model: {"rpm": args.rpm, "tpm": args.tpm}
+                for model in ("gpt-3.5-turbo", "gpt-4o", "text-embedding-ada-002")
+            }),
+        )
+        fake = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_openai_server", "--port", str(args.openai_port),
+             "--latency", str(args.latency), "--tokens-per-s", str(args.tokens_per_s),
+             "--answer-tokens", str(args.answer_tokens)],
+            cwd=REPO_ROOT, env=env,
+        )
+        server = None
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_ready(f"http://127.0.0.1:{args.openai_port}/stats", 30))
+            # The server refuses to start without the Michelin index
+            subprocess.run(
+                [sys.executable, "-m", "src.utils.build_RAG_db"],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, check=True,
+            )
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "server:app", "--app-dir", REPO_ROOT,
+                 "--port", str(args.port), "--log-level", "warning"],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+            )
+            asyncio.run(wait_ready(f"{base_url}/health", 300))
+            results, elapsed, server_metrics = asyncio.run(run_load(base_url, args))
+            fake_stats = httpx.get(f"http://127.0.0.1:{args.openai_port}/stats").json()
+        finally:
+            for process in filter(None, (server, fake)):
+                process.terminate()
+                process.wait(timeout=30)
+
+    ok = [latency for status, latency, _ in results if status == 200]
+    ttfts = [ttft for status, _, ttft in results if status == 200 and ttft is not None]
+    rejected = sum(status == 429 for status, _, _ in results)
+    errors = len(results) - len(ok) - rejected
+    print(f"requests={len(results)}  concurrency={args.concurrency}  users={args.users}  "
+          f"mode={'stream' if args.stream else 'chat'}")
+    print(f"  throughput   {len(ok) / elapsed:8.1f} req/s over {elapsed:.1f} s")
+    print(f"  latency      p50={percentile(ok, 0.5) * 1000:7.0f} ms  p95={percentile(ok, 0.95) * 1000:7.0f} ms  "
+          f"p99={percentile(ok, 0.99) * 1000:7.0f} ms")
+    if args.stream:
+        print(f"  ttft         p50={percentile(ttfts, 0.5) * 1000:7.0f} ms  p95={percentile(ttfts, 0.95) * 1000:7.0f} ms")
+    print(f"  rejected(429)={rejected}  errors={errors}")
+    print(f"  server /metrics: {json.dumps(server_metrics)}")
+    print(f"  fake OpenAI: {json.dumps(fake_stats)}")
+
+
+if __name__ == "__main__":
+    main()
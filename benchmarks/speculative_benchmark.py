@@ -0,0 +1,67 @@
+"""Serial vs speculative turn latency on the real pipeline with fake models.
+
+Usage (from the repository root):
+
+    python -m benchmarks.speculative_benchmark --turns 20 --latency 0.4 --memory-answer-rate 0.3
+
+The real engine runs on the fakes that `install_fake_models()` puts behind
+the LLM gateway (see benchmarks.pipeline_benchmark), so no network access or
+API keys are needed. Every fake model call takes `--latency`. The memory
+agent answers `--memory-answer-rate` of the turns; the rest fall back to
+the router and a routed service. Each mode replays the same messages on a
+new thread with the response cache cleared. Reports mean per-turn wall time
+and the time saved by running the router alongside the memory graph.
+"""
+import argparse
+
+from src.chatbot import Chatbot
+from benchmarks.fakes import install_fake_models
+from benchmarks.pipeline_benchmark import build_offline_engine
+from benchmarks.workload import generate_workload
+
+
+def run(engine, messages, label, speculative, speculate_service):
+    engine.response_cache.clear()
+    # A new user and thread per mode, so earlier modes leave no history or recall memories
+    chatbot = Chatbot(
+        engine=engine,
+        user_id=f"speculative-benchmark-{label}",
+        thread_id=f"speculative-benchmark-{label}",
+        speculative=speculative,
+        speculate_service=speculate_service,
+    )
+    timings = []
+    for message in messages:
+        chatbot.process_message(message)
+        timings.append(chatbot.last_turn_timings)
+    return timings
+
+
+def _report(label, timings):
+    n = len(timings)
+    total = sum(t["total_s"] for t in timings) / n
+    saved = sum(t["saved_s"] for t in timings) / n
+    fallback = sum(1 for t in timings if t["winner"] != "memory")
+    print(f"{label:<28} mean turn={total * 1000:8.1f} ms   mean saved={saved * 1000:8.1f} ms   fallback turns={fallback}/{n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.4, help="Seconds per fake LLM call.")
+    parser.add_argument("--memory-answer-rate", type=float, default=0.3)
+    parser.add_argument("--rows", type=int, default=300, help="Synthetic Michelin rows.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    install_fake_models(latency_s=args.latency, agent_answer_rate=args.memory_answer_rate)
+    engine, workdir, _ = build_offline_engine(args.rows, args.seed)
+    messages = [turn["message"] for turn in generate_workload(1, args.turns, seed=args.seed)[0]["turns"]]
+
+    _report("serial", run(engine, messages, "serial", False, False))
+    _report("speculative router", run(engine, messages, "router", True, False))
+    _report("speculative router+service", run(engine, messages, "service", True, True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare Streamlit-rerun startup cost with and without the shared engine.
+
+Usage (from the repository root):
+
+    python -m benchmarks.startup_benchmark --reruns 5
+    python -m benchmarks.startup_benchmark --reruns 5 --message "Best sushi in Toronto?"
+
+"Without" rebuilds every resource on each rerun, the way `app.py` used to
+call `Chatbot()` at module level. "With" reuses the process-wide engine and
+the per-session `Chatbot` handle. Each mode runs in its own process, so
+neither one pays the other's imports. `--message` additionally times the
+first message of each mode; it needs a working OPENAI_API_KEY.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from src.chatbot import Chatbot
+from src.engine import ChatbotEngine, get_engine
+from src.services import llm_gateway
+from src.utils import embedding_service, long_term_memory
+
+
+def _warm(engine):
+    # Touch every lazy resource so its construction cost is measured
+    engine.services
+    engine.router
+    engine.graph
+
+
+def _forget_shared_resources():
+    # The memory graph, its models and stores and the HTTP clients are cached
+    # process-wide; a rerun without the engine must build them again
+    long_term_memory.shutdown()
+    long_term_memory._resources.clear()
+    embedding_service._service = None
+    llm_gateway._clients.clear()
+
+
+def run_without_engine(reruns, message=None):
+    timings = []
+    for i in range(reruns):
+        _forget_shared_resources()
+        start = time.perf_counter()
+        engine = ChatbotEngine()
+        _warm(engine)
+        chatbot = Chatbot(engine=engine)
+        if message and i == 0:
+            chatbot.process_message(message)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_with_engine(reruns, message=None):
+    timings = []
+    session = {}
+    for i in range(reruns):
+        start = time.perf_counter()
+        engine = get_engine()
+        _warm(engine)
+        if "chatbot" not in session:
+            session["chatbot"] = Chatbot(engine=engine)
+        if message and i == 0:
+            session["chatbot"].process_message(message)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+MODES = {"without": run_without_engine, "with": run_with_engine}
+
+
+def _report(label, timings):
+    first, rest = timings[0], timings[1:]
+    mean_rest = sum(rest) / len(rest) if rest else 0.0
+    print(f"{label:<16} first={first * 1000:9.1f} ms   later reruns (mean of {len(rest)})={mean_rest * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--message", default=None, help="Also time the first message (calls the OpenAI API).")
+    parser.add_argument("--mode", choices=MODES, default=None, help="Run one mode here and print its timings as JSON.")
+    args = parser.parse_args()
+
+    if not args.message:
+        # Client construction only needs a key to be present, not a valid one
+        os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+        os.environ.setdefault("TAVILY_API_KEY", "tvly-benchmark-placeholder")
+
+    if args.mode:
+        print(json.dumps(MODES[args.mode](args.reruns, args.message)))
+        return
+
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks.startup_benchmark", "--mode", mode, "--reruns", str(args.reruns)]
+        if args.message:
+            command += ["--message", args.message]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        # The timings are the last line; anything the resources log comes before it
+        _report(f"{mode} engine", json.loads(output.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Per-turn CPU time of building the recall query, full re-encode vs incremental.
+
+Usage (from the repository root):
+
+    python -m benchmarks.token_window_benchmark --turns 10 100 1000
+
+"full" is the previous load_memories behavior: get_buffer_string over the
+whole conversation, tiktoken-encode it, decode the first 2048 tokens.
+"incremental" is TokenWindow, which encodes only the new messages and keeps
+the newest 2048 tokens. Reports mean CPU time per turn over each whole
+conversation and for its last 10 turns.
+"""
+import time
+import argparse
+
+import tiktoken
+from langchain_core.messages import AIMessage, HumanMessage, get_buffer_string
+
+from src.utils.token_window import TokenWindow
+
+USER_TEXT = "I'm planning a trip to Montreal in October with my partner, we love food markets and jazz. "
+AI_TEXT = "Great choice! Montreal in October has beautiful fall colours; here are a few ideas for your visit. " * 3
+
+
+def full_reencode(tokenizer, messages):
+    convo_str = get_buffer_string(messages)
+    return tokenizer.decode(tokenizer.encode(convo_str)[:2048])
+
+
+def run(tokenizer, turns):
+    messages = []
+    window = TokenWindow(tokenizer, max_tokens=2048)
+    full, incremental = [], []
+    for turn in range(turns):
+        messages = messages + [
+            HumanMessage(content=f"{turn}: {USER_TEXT}", id=f"h{turn}"),
+            AIMessage(content=AI_TEXT, id=f"a{turn}"),
+        ]
+        start = time.process_time()
+        full_reencode(tokenizer, messages)
+        full.append(time.process_time() - start)
+
+        start = time.process_time()
+        window.update(messages)
+        window.text
+        incremental.append(time.process_time() - start)
+    return full, incremental
+
+
+def _us(samples):
+    return sum(samples) / len(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--model", default="gpt-4o")
+    args = parser.parse_args()
+
+    tokenizer = tiktoken.encoding_for_model(args.model)
+    for turns in args.turns:
+        full, incremental = run(tokenizer, turns)
+        print(
+            f"turns={turns:>5}  full: mean={_us(full):9.0f} us  last10={_us(full[-10:]):9.0f} us   "
+            f"incremental: mean={_us(incremental):7.0f} us  last10={_us(incremental[-10:]):7.0f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Cost of a traced span, to check tracing can stay on in production.
+
+Usage (from the repository root):
+
+    python -m benchmarks.tracing_overhead_benchmark --spans 200000
+
+Times `with span(...)` blocks, three levels deep like turn -> memory ->
+node, plus one LLM span with token usage per turn, for a disabled tracer,
+the always-on aggregator, and the aggregator plus a JSONL exporter writing
+to a temporary file. A turn makes about 10 spans and takes hundreds of
+milliseconds, so a few microseconds per span is noise.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.utils.tracing import JsonlExporter, Tracer
+
+
+def run(tracer: Tracer, turns: int) -> float:
+    start = time.perf_counter()
+    for _ in range(turns):
+        with tracer.span("turn", mode="bench"):
+            with tracer.span("memory"):
+                with tracer.span("memory.agent"):
+                    llm = tracer.start("llm")
+                    llm.add_usage("gpt-4o", 120, 30)
+                    tracer.finish(llm)
+            with tracer.span("router") as router:
+                router.set(service_type="others")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=200000)
+    args = parser.parse_args()
+    spans_per_turn = 5
+    turns = args.spans // spans_per_turn
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traces.jsonl")
+        jsonl = JsonlExporter(path)
+        tracers = {
+            "disabled": Tracer(enabled=False),
+            "aggregator": Tracer(),
+            "aggregator+jsonl": Tracer([jsonl]),
+            "aggregator+jsonl 10% sampled": Tracer([jsonl], sample_rate=0.1),
+        }
+        for label, tracer in tracers.items():
+            elapsed = run(tracer, turns)
+            print(f"{label:<30} {1e6 * elapsed / (turns * spans_per_turn):7.2f} us/span"
+                  f"   {1e6 * elapsed / turns:8.1f} us/turn")
+        jsonl.close()
+        print(f"jsonl: {os.path.getsize(path) / 1e6:.1f} MB written")
+
+
+if __name__ == "__main__":
+    main()
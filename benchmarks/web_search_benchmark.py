@@ -0,0 +1,149 @@
+"""Agent-loop iterations and search calls saved by the cached web search.
+
+Usage (from the repository root):
+
+    python -m benchmarks.web_search_benchmark --users 50 --turns 4 --concurrency 8
+
+The memory agent's travel questions from benchmarks.workload go through a
+scripted agent loop. A question covers one to three topics and needs
+`--needed` results for each. Every model call costs `--model-latency`.
+The agent searches until it has enough results and then answers:
+
+- "tavily": the previous tool, one query per call and one result per query,
+  uncached. The agent rephrases a topic to get further results.
+- "cached": the `web_search` tool, which takes every topic in one call and
+  returns `--max-results` results per query through the cache.
+
+Both use the same local stub backend, which takes `--search-latency` per
+query and returns results that depend only on the query. The report gives
+agent model calls per question, backend calls, the cache hit rate and
+question latency.
+"""
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.workload import generate_workload
+from src.utils.web_search import CachedWebSearch
+
+INTENTS = {"itinerary": 3, "attractions": 3, "ideas": 2}
+ASPECTS = [" opening hours", " prices"]
+
+
+class StubSearchBackend:
+    """Deterministic results after a fixed delay, with a call counter."""
+
+    def __init__(self, latency_s: float = 0.3):
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str, max_results: int):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_s)
+        digest = hashlib.sha256(query.lower().encode("utf-8")).hexdigest()[:8]
+        return [{"url": f"https://example.com/{digest}/{i}", "content": f"Result {i} for {query}"}
+                for i in range(max_results)]
+
+
+def topics(message: str):
+    extra = int(hashlib.sha256(message.encode("utf-8")).hexdigest(), 16) % (len(ASPECTS) + 1)
+    return [message] + [message + aspect for aspect in ASPECTS[:extra]]
+
+
+def run_question(search, message: str, needed: int, model_latency_s: float, batched: bool, max_iterations: int):
+    """Model calls the scripted agent makes for one question."""
+    wanted = {topic: needed for topic in topics(message)}
+    attempts = dict.fromkeys(wanted, 0)
+    model_calls = 0
+    while True:
+        model_calls += 1
+        time.sleep(model_latency_s)
+        pending = [topic for topic, missing in wanted.items() if missing > 0]
+        if not pending or model_calls >= max_iterations:
+            return model_calls
+        if not batched:
+            # One query per call; later attempts rephrase the topic
+            pending = pending[:1]
+        queries = {}
+        for topic in pending:
+            queries[topic + ("" if not attempts[topic] else f" part {attempts[topic] + 1}")] = topic
+            attempts[topic] += 1
+        results = search(list(queries))
+        for query, topic in queries.items():
+            found = results.get(query)
+            if isinstance(found, list):
+                wanted[topic] -= len(found)
+
+
+def run(label, search, conversations, args, batched):
+    latencies, calls = [], []
+    lock = threading.Lock()
+
+    def user(conversation):
+        for turn in conversation["turns"]:
+            start = time.perf_counter()
+            model_calls = run_question(search, turn["message"], args.needed, args.model_latency, batched,
+                                       args.max_iterations)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                calls.append(model_calls)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(user, conversations))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "label": label,
+        "questions": len(calls),
+        "model_calls": sum(calls) / len(calls),
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p95_ms": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "elapsed_s": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--needed", type=int, default=3, help="Results the agent wants per topic.")
+    parser.add_argument("--max-results", type=int, default=3, help="Results per query of the cached tool.")
+    parser.add_argument("--max-iterations", type=int, default=10, help="Model calls before the agent gives up.")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="Seconds per agent model call.")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="Seconds per backend query.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    conversations = generate_workload(args.users, args.turns, seed=args.seed, mix=INTENTS, repeat_rate=0.3)
+
+    tavily_backend = StubSearchBackend(args.search_latency)
+    cached_backend = StubSearchBackend(args.search_latency)
+    cached = CachedWebSearch(backend=cached_backend, max_results=args.max_results)
+
+    # Uncached, one query per call and one result, like TavilySearchResults(max_results=1)
+    legacy = run("tavily", lambda queries: {queries[0]: tavily_backend(queries[0], 1)}, conversations, args,
+                 batched=False)
+    legacy["backend_calls"] = tavily_backend.calls
+    new = run("cached", cached.search, conversations, args, batched=True)
+    new["backend_calls"] = cached_backend.calls
+    cached.close()
+
+    print(f"{legacy['questions']} questions by {args.users} users, concurrency {args.concurrency}, "
+          f"{args.needed} results wanted per topic")
+    print(f"  {'tool':<8} {'model calls/q':>13} {'backend calls':>13} {'p50 ms':>8} {'p95 ms':>8} {'elapsed s':>9}")
+    for result in (legacy, new):
+        print(f"  {result['label']:<8} {result['model_calls']:13.2f} {result['backend_calls']:13d} "
+              f"{result['p50_ms']:8.0f} {result['p95_ms']:8.0f} {result['elapsed_s']:9.2f}")
+    print(f"agent loop iterations saved: {legacy['model_calls'] - new['model_calls']:.2f} per question, "
+          f"{round((legacy['model_calls'] - new['model_calls']) * new['questions'])} in total")
+    print(f"cache hit rate: {cached.metrics()['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic multi-user, multi-turn conversations for offline benchmarks.
+
+`generate_workload(users, turns_per_user, seed)` returns one conversation
+per user. Each turn is drawn from a mix of intents: Michelin and general
+restaurant questions, itineraries, attractions, travel ideas, small talk,
+and personal facts that the memory agent saves. The same seed always gives
+the same conversations.
+"""
+import random
+from typing import Dict, List
+
+from benchmarks.ingest_benchmark import AWARDS, CITIES, DISHES
+
+TEMPLATES = {
+    "michelin": [
+        "Which Michelin {award} restaurants serve {dish} in {city}?",
+        "Best Michelin-starred {dish} in {city} under $$$?",
+        "Recommend a Michelin Guide restaurant near downtown {city}.",
+    ],
+    "restaurant": [
+        "Where can I get good {dish} in {city}?",
+        "Any cheap restaurants for {dish} around {city}?",
+    ],
+    "itinerary": [
+        "Plan a {days}-day itinerary for {city}.",
+        "How should I split {days} days between {city} and {other}?",
+    ],
+    "attractions": [
+        "What are the top tourist attractions in {city}?",
+        "Which museums in {city} are worth visiting?",
+    ],
+    "ideas": [
+        "Suggest a weekend trip idea from {city}.",
+        "Where should I travel in {month} for good food?",
+    ],
+    "personal": [
+        "Remember that I am vegetarian.",
+        "I love {dish} and hate long queues.",
+        "My budget is about ${budget} per night.",
+        "I prefer trains over flights.",
+    ],
+    "small_talk": [
+        "Thanks, that helps!",
+        "Hi there!",
+    ],
+}
+
+# Relative frequency of each intent
+DEFAULT_MIX = {"michelin": 3, "restaurant": 2, "itinerary": 2, "attractions": 2, "ideas": 1, "personal": 2,
+               "small_talk": 1}
+
+MONTHS = ["January", "March", "May", "July", "September", "November"]
+
+
+def _message(rng: random.Random, intent: str) -> str:
+    cities = list(CITIES)
+    city = rng.choice(cities)
+    return rng.choice(TEMPLATES[intent]).format(
+        city=city,
+        other=rng.choice([c for c in cities if c != city]),
+        dish=rng.choice(DISHES),
+        award=rng.choice(AWARDS),
+        days=rng.randint(2, 7),
+        month=rng.choice(MONTHS),
+        budget=rng.choice([100, 150, 250, 400]),
+    )
+
+
+def generate_workload(users: int, turns_per_user: int, seed: int = 0, mix: Dict[str, int] = None,
+                      repeat_rate: float = 0.1) -> List[dict]:
+    """[{"user_id", "thread_id", "turns": [{"intent", "message"}]}], one per user.
+
+    With probability `repeat_rate` a turn repeats a message another user
+    already sent, as popular questions do, which exercises the caches.
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    intents, weights = zip(*mix.items())
+    sent = []
+    conversations = []
+    for u in range(users):
+        turns = []
+        for _ in range(turns_per_user):
+            if sent and rng.random() < repeat_rate:
+                intent, message = rng.choice(sent)
+            else:
+                intent = rng.choices(intents, weights)[0]
+                message = _message(rng, intent)
+                sent.append((intent, message))
+            turns.append({"intent": intent, "message": message})
+        conversations.append({"user_id": f"user-{u}", "thread_id": f"user-{u}-thread", "turns": turns})
+    return conversations
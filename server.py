@@ -0,0 +1,275 @@
+"""Async HTTP API for the travel chatbot.
+
+Run with:
+
+    python -m src.utils.build_RAG_db    # once; startup fails without the Michelin index
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+
+    POST /chat         {"message", "user_id"?, "thread_id"?} -> {"response", "user_id", "thread_id", "timings"}
+    POST /chat/stream  same body; Server-Sent Events, one {"token"} per event, then [DONE]
+    GET  /health
+    GET  /metrics             counters, cache and gateway stats, time to first token of streamed turns
+    GET  /metrics/prometheus  span latencies, LLM tokens and cost in Prometheus text format
+
+All sessions share one `ChatbotEngine`; each (user_id, thread_id) pair
+gets its own `Chatbot` handle. Turns of one thread run one at a time, and
+at most MAX_CONCURRENT_TURNS turns run at once with up to MAX_QUEUED_TURNS
+waiting; beyond that requests are rejected with 429 and a Retry-After hint.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import contextlib
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.chatbot import Chatbot
+from src.engine import get_engine
+from src.services import llm_gateway
+from src.utils.build_RAG_db import docstore_path
+from src.utils.tracing import get_tracer
+from src.utils.web_search import get_web_search
+
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", "64"))
+MAX_QUEUED_TURNS = int(os.getenv("MAX_QUEUED_TURNS", "256"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))
+
+
+class ChatRequest(BaseModel):
+    message: str
+    user_id: Optional[str] = None
+    thread_id: Optional[str] = None
+
+
+class ChatResponse(BaseModel):
+    response: str
+    user_id: str
+    thread_id: str
+    timings: dict
+
+
+class Overloaded(Exception):
+    pass
+
+
+class TurnLimiter:
+    """Bounds concurrent turns, and the queue of turns waiting for a slot."""
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._slots.locked() and self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded("server busy")
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+
+class SessionRegistry:
+    """Chatbot handles keyed by (user_id, thread_id), least recently used evicted.
+
+    Evicting a handle loses nothing: conversation state is in the engine's
+    checkpointer and recall store, keyed by the same ids.
+    """
+
+    def __init__(self, engine, max_sessions: int):
+        self.engine = engine
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def get(self, user_id: Optional[str], thread_id: Optional[str]):
+        user_id = user_id or str(uuid.uuid4())
+        thread_id = thread_id or str(uuid.uuid4())
+        key = (user_id, thread_id)
+        session = self._sessions.get(key)
+        if session is None:
+            session = (Chatbot(engine=self.engine, user_id=user_id, thread_id=thread_id), asyncio.Lock())
+            self._sessions[key] = session
+            if len(self._sessions) > self.max_sessions:
+                # Least recently used first, skipping handles with a turn in progress
+                idle = [other for other, (_, lock) in self._sessions.items() if other != key and not lock.locked()]
+                for other in idle[:len(self._sessions) - self.max_sessions]:
+                    del self._sessions[other]
+        self._sessions.move_to_end(key)
+        return session
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Building the Michelin index takes minutes of embedding calls; it is a
+    # separate step, never a side effect of starting the server
+    if not os.path.exists(docstore_path()):
+        raise RuntimeError(
+            f"Michelin index not found at {docstore_path()}; build it first with"
+            " `python -m src.utils.build_RAG_db`"
+        )
+    app.state.engine = get_engine()
+    # Load the shared chains and indexes off the event loop, before the first request
+    await asyncio.to_thread(app.state.engine.warm_up)
+    app.state.sessions = SessionRegistry(app.state.engine, MAX_SESSIONS)
+    app.state.limiter = TurnLimiter(MAX_CONCURRENT_TURNS, MAX_QUEUED_TURNS)
+    app.state.turns = 0
+    app.state.errors = 0
+    # Streamed turns' time to first token: [count, sum_s, max_s]
+    app.state.ttft = [0, 0.0, 0.0]
+    yield
+    # Queued recall memories are written before the clients close
+    from src.utils import long_term_memory
+
+    await asyncio.to_thread(long_term_memory.shutdown)
+    await llm_gateway.aclose()
+    get_web_search().close()
+    get_tracer().close()
+
+
+app = FastAPI(title="Travel chatbot", lifespan=lifespan)
+
+
+def _busy():
+    return HTTPException(status_code=429, detail="Too many requests in flight", headers={"Retry-After": "1"})
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    chatbot, lock = app.state.sessions.get(request.user_id, request.thread_id)
+    try:
+        # The slot first, so turns waiting on their thread's lock count against the queue bound
+        async with app.state.limiter.slot(), lock:
+            response = await chatbot.aprocess_message(request.message)
+    except Overloaded:
+        raise _busy()
+    except Exception:
+        app.state.errors += 1
+        raise
+    app.state.turns += 1
+    return ChatResponse(
+        response=response or "",
+        user_id=chatbot.user_id,
+        thread_id=chatbot.thread_id,
+        timings=chatbot.last_turn_timings,
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    chatbot, lock = app.state.sessions.get(request.user_id, request.thread_id)
+    # Held before the 200 status line is sent: a full queue is still a 429,
+    # and the locked session cannot be evicted and handed out a second time
+    held = contextlib.AsyncExitStack()
+    try:
+        await held.enter_async_context(app.state.limiter.slot())
+        await held.enter_async_context(lock)
+    except Overloaded:
+        await held.aclose()
+        raise _busy()
+    except BaseException:
+        await held.aclose()
+        raise
+
+    async def events():
+        ids = {"user_id": chatbot.user_id, "thread_id": chatbot.thread_id}
+        yield f"event: session\ndata: {json.dumps(ids)}\n\n"
+        try:
+            async for token in chatbot.astream_message(request.message):
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except Exception as e:
+            app.state.errors += 1
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        app.state.turns += 1
+        _record_ttft(chatbot.last_turn_timings)
+        yield f"event: timings\ndata: {json.dumps(chatbot.last_turn_timings)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return _HeldStreamingResponse(events(), held, media_type="text/event-stream")
+
+
+class _HeldStreamingResponse(StreamingResponse):
+    """Releases `held` once the response is done, even if the client left before the body started."""
+
+    def __init__(self, content, held: contextlib.AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self.held = held
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.held.aclose()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "time": time.time()}
+
+
+def _record_ttft(timings: dict):
+    ttft_s = timings.get("ttft_s")
+    if ttft_s is None:
+        return
+    ttft = app.state.ttft
+    ttft[0] += 1
+    ttft[1] += ttft_s
+    ttft[2] = max(ttft[2], ttft_s)
+
+
+def _ttft_metrics() -> dict:
+    count, total_s, max_s = app.state.ttft
+    return {"count": count, "mean_ms": 1000 * total_s / count if count else 0.0, "max_ms": 1000 * max_s}
+
+
+def _recall_writer_metrics():
+    from src.utils.long_term_memory import get_recall_writer
+
+    return get_recall_writer().metrics()
+
+
+@app.get("/metrics")
+async def metrics():
+    engine = app.state.engine
+    limiter = app.state.limiter
+    return {
+        "turns": app.state.turns,
+        "errors": app.state.errors,
+        "sessions": len(app.state.sessions),
+        "running": limiter.running,
+        "waiting": limiter.waiting,
+        "rejected": limiter.rejected,
+        "ttft": _ttft_metrics(),
+        "response_cache": engine.response_cache.metrics(),
+        "llm_gateway": llm_gateway.gateway_metrics(),
+        "recall_writer": _recall_writer_metrics(),
+        "web_search": get_web_search().metrics(),
+        "tracing": get_tracer().aggregator.snapshot(),
+    }
+
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(get_tracer().aggregator.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,292 @@
+"""Offline batch mode: many conversations through the chatbot pipeline.
+
+Usage (from the repository root):
+
+    python -m src.batch questions.jsonl answers.jsonl --concurrency 16
+    python -m src.batch questions.jsonl answers.jsonl --data-dir replay/
+
+Each input line is a JSON object with "user_id" and "message", and
+optionally "thread_id" (the user id by default) and "id". Each output line
+carries the input's fields plus "index" (the record's position, from 0),
+"response", "winner" (the branch that answered), "wave", and "timings",
+the seconds spent in each stage the turn went through. A turn that failed
+has "error" instead of "response". Lines are written as each wave
+finishes, in input order within the wave.
+
+The replay's conversation checkpoints and recall memories go to
+`--data-dir`, a new temporary directory by default, never to the app's
+data/ unless it is passed explicitly. The Michelin index and the
+embedding and web search caches are shared with the app.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+from typing import AsyncIterator, List
+
+from langchain_core.messages import AIMessage
+from src.engine import get_engine
+from src.utils import long_term_memory
+from src.utils.tracing import span
+
+RESTAURANT_SERVICE = "restaurant_recommendations"
+
+
+def _error(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+class BatchRunner:
+    """Runs many turns stage by stage, batching each stage's calls.
+
+    The memory graph keeps state per thread, so turns run in waves: wave n
+    holds the n-th message of every thread, which keeps each thread's
+    order. A wave runs the memory graph with `.abatch`. The turns the memory
+    agent did not answer are then routed together, the restaurant ones are
+    split into Michelin and general ones together, the Michelin queries
+    that need a query vector are embedded in one pass, and each service's
+    batch method answers its turns. These stages keep no thread state, so
+    they overlap the next wave's memory graph. `max_concurrency` bounds each
+    of these batches.
+
+    The turns are written to `engine`'s memory graph, so a replay should use
+    an engine whose checkpoints and recall memories are its own; see
+    `long_term_memory.set_data_dir`.
+    """
+
+    def __init__(self, engine, max_concurrency: int = 8):
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        # Total seconds per stage, over the whole run
+        self.stage_timings = defaultdict(float)
+        self.waves = 0
+
+    async def _abounded(self, func, items) -> list:
+        # For injected services and routers without a batch method
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def call(item):
+            async with slots:
+                return await func(item)
+
+        return await asyncio.gather(*(call(item) for item in items), return_exceptions=True)
+
+    def _stage(self, name: str, start: float, turns: List[dict]) -> float:
+        elapsed = time.perf_counter() - start
+        self.stage_timings[name] += elapsed
+        for turn in turns:
+            turn["timings"][f"{name}_s"] = elapsed
+        return elapsed
+
+    async def _aroute(self, turns: List[dict]):
+        router = self.engine.router
+        messages = [turn["message"] for turn in turns]
+        start = time.perf_counter()
+        if hasattr(router, "aroute_messages"):
+            service_types = await router.aroute_messages(messages, self.max_concurrency)
+        else:
+            service_types = await self._abounded(router.aroute_message, messages)
+        self._stage("router", start, turns)
+        for turn, service_type in zip(turns, service_types):
+            turn["service_type"] = service_type
+
+        chain = self.engine.restaurant_chain
+        restaurant = [turn for turn in turns if turn["service_type"] == RESTAURANT_SERVICE]
+        if chain is None or not restaurant:
+            return
+        start = time.perf_counter()
+        restaurant_types = await chain.aclassify_batch([turn["message"] for turn in restaurant], self.max_concurrency)
+        self._stage("restaurant_type", start, restaurant)
+        for turn, restaurant_type in zip(restaurant, restaurant_types):
+            turn["restaurant_type"] = restaurant_type
+
+        michelin = [turn for turn in restaurant if turn["restaurant_type"] == "michelin"]
+        if michelin:
+            start = time.perf_counter()
+            await asyncio.to_thread(chain.prefetch_embeddings, [turn["message"] for turn in michelin])
+            self._stage("embed", start, michelin)
+
+    @staticmethod
+    def _waves(turns: List[dict]) -> List[List[dict]]:
+        waves, seen = [], defaultdict(int)
+        for turn in turns:
+            wave = seen[(turn["user_id"], turn["thread_id"])]
+            seen[(turn["user_id"], turn["thread_id"])] += 1
+            if wave == len(waves):
+                waves.append([])
+            turn["wave"] = wave
+            waves[wave].append(turn)
+        return waves
+
+    async def _amemory(self, turns: List[dict]):
+        inputs = [{"messages": [("user", turn["message"])]} for turn in turns]
+        configs = [{"configurable": {"user_id": turn["user_id"], "thread_id": turn["thread_id"]},
+                    "max_concurrency": self.max_concurrency} for turn in turns]
+        start = time.perf_counter()
+        with span("batch.memory", turns=len(turns)):
+            states = await self.engine.graph.abatch(inputs, configs, return_exceptions=True)
+        self._stage("memory", start, turns)
+        for turn, state in zip(turns, states):
+            if isinstance(state, Exception):
+                turn["error"] = _error(state)
+                continue
+            last = state["messages"][-1] if state.get("messages") else None
+            if isinstance(last, AIMessage) and last.content:
+                turn["response"], turn["winner"] = last.content, "memory"
+
+    async def _aservice(self, service_type: str, turns: List[dict]):
+        service = self.engine.services.get(service_type)
+        chain = self.engine.restaurant_chain
+        messages = [turn["message"] for turn in turns]
+        start = time.perf_counter()
+        with span("batch.service", service_type=service_type, turns=len(turns)):
+            if service is None:
+                responses = [ValueError(f"Unknown service type: {service_type}")] * len(turns)
+            elif service_type == RESTAURANT_SERVICE and chain is not None:
+                responses = await chain.abatch_restaurant_recommendations(
+                    messages, [turn.get("restaurant_type") for turn in turns], self.max_concurrency,
+                )
+            elif service_type == RESTAURANT_SERVICE:
+                responses = await service.abatch(messages, config={"max_concurrency": self.max_concurrency},
+                                                 return_exceptions=True)
+            elif hasattr(service, "abatch_messages"):
+                responses = await service.abatch_messages(messages, self.max_concurrency)
+            else:
+                responses = await self._abounded(service.aprocess_message, messages)
+        self._stage("service", start, turns)
+        for turn, response in zip(turns, responses):
+            if isinstance(response, Exception):
+                turn["error"] = _error(response)
+            else:
+                turn["response"], turn["winner"] = response, service_type
+
+    async def _aservices(self, turns: List[dict]):
+        turns = [turn for turn in turns if "response" not in turn and "error" not in turn]
+        if not turns:
+            return
+        await self._aroute(turns)
+        groups = defaultdict(list)
+        for turn in turns:
+            for key in ("service_type", "restaurant_type"):
+                if isinstance(turn.get(key), Exception):
+                    turn["error"] = _error(turn[key])
+                    break
+            else:
+                groups[turn["service_type"]].append(turn)
+        await asyncio.gather(*(self._aservice(service_type, group) for service_type, group in groups.items()))
+
+    @staticmethod
+    def _turn(index: int, record) -> dict:
+        if not isinstance(record, dict) or not record.get("user_id") or not isinstance(record.get("message"), str):
+            return {"index": index, "error": "Each record needs a user_id and a message", "timings": {}}
+        turn = dict(record, index=index, timings={})
+        turn["user_id"] = str(record["user_id"])
+        turn["thread_id"] = str(record.get("thread_id") or record["user_id"])
+        return turn
+
+    @staticmethod
+    def _result(turn: dict) -> dict:
+        result = {key: value for key, value in turn.items()
+                  if key not in ("service_type", "restaurant_type", "timings")}
+        result["timings"] = turn["timings"]
+        return result
+
+    async def arun(self, records) -> AsyncIterator[dict]:
+        """Yield one result per record, wave by wave."""
+        turns = [self._turn(index, record) for index, record in enumerate(records)]
+        for turn in turns:
+            if "error" in turn:
+                yield self._result(turn)
+        turns = [turn for turn in turns if "error" not in turn]
+        if not turns:
+            return
+
+        with span("batch", turns=len(turns)):
+            previous = None
+            for wave in self._waves(turns):
+                self.waves += 1
+                await self._amemory(wave)
+                # Routing and services keep no thread state, so they overlap the next wave's memory graph
+                services = asyncio.create_task(self._aservices(wave))
+                if previous is not None:
+                    await previous[1]
+                    for turn in previous[0]:
+                        yield self._result(turn)
+                previous = (wave, services)
+            await previous[1]
+            for turn in previous[0]:
+                yield self._result(turn)
+
+
+def read_jsonl(path: str) -> list:
+    """Records of a JSONL file; a malformed line becomes its raw text, which the runner rejects."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                records.append(line.rstrip("\n"))
+    return records
+
+
+async def arun_batch(records, output, runner: BatchRunner) -> dict:
+    """Write `runner`'s results to the `output` file as JSON lines; returns counts."""
+    counts = defaultdict(int)
+    async for result in runner.arun(records):
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        counts["turns"] += 1
+        counts["errors"] += "error" in result
+        if "winner" in result:
+            counts[f"winner:{result['winner']}"] += 1
+    return dict(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL of {user_id, message[, thread_id, id]} records.")
+    parser.add_argument("output", help="JSONL file for the results.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight per batch.")
+    parser.add_argument("--data-dir", default=None,
+                        help="Directory for the replay's checkpoints and recall memories; a temporary one by default.")
+    args = parser.parse_args()
+
+    records = read_jsonl(args.input)
+    temporary = None
+    if args.data_dir is None:
+        temporary = tempfile.TemporaryDirectory(prefix="batch-")
+        args.data_dir = temporary.name
+    os.makedirs(args.data_dir, exist_ok=True)
+    long_term_memory.set_data_dir(args.data_dir)
+    engine = get_engine()
+    start = time.perf_counter()
+    engine.warm_up()
+    warm_up_s = time.perf_counter() - start
+
+    runner = BatchRunner(engine, max_concurrency=args.concurrency)
+    start = time.perf_counter()
+    with open(args.output, "w", encoding="utf-8") as output:
+        counts = asyncio.run(arun_batch(records, output, runner))
+    elapsed = time.perf_counter() - start
+
+    turns = counts.pop("turns", 0)
+    print(f"{turns} turns in {runner.waves} waves, {elapsed:.1f} s ({turns / elapsed if elapsed else 0:.1f} turns/s), "
+          f"{counts.pop('errors', 0)} errors; warm-up {warm_up_s:.1f} s")
+    print("  stages: " + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in runner.stage_timings.items()))
+    print("  answered by: " + ", ".join(f"{key.split(':', 1)[1]}={count}" for key, count in sorted(counts.items())))
+    if temporary is None:
+        print(f"  checkpoints and recall memories: {args.data_dir}")
+    else:
+        # The recall writer drains into the temporary directory before it goes
+        long_term_memory.shutdown()
+        temporary.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import re
+import threading
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+from src.utils.bm25_index import tokenize
+from src.services.llm_gateway import get_tokenizer as get_model_tokenizer
+
+# Always shown, in this order
+BASE_FIELDS = ("Name", "Location", "Award", "Price", "Cuisine")
+# Shown only when the query asks about them
+OPTIONAL_FIELDS = (
+    ("Address", r"\b(address|where|street|near|close to|located|neighbou?rhood|downtown)\b"),
+    ("GreenStar", r"\b(green|sustainab\w*|eco|environment\w*)\b"),
+    ("FacilitiesAndServices", r"\b(parking|wheelchair|terrace|garden|counter|air condition\w*|facilit\w*|"
+                              r"private room|dog|wine list|view)\b"),
+    ("PhoneNumber", r"\b(phone|call|contact|number)\b"),
+    ("WebsiteUrl", r"\b(website|site|url|link|book\w*|reserv\w*)\b"),
+)
+# Shorter column titles, to save tokens in the header row
+COLUMN_TITLES = {"FacilitiesAndServices": "Facilities", "GreenStar": "Green Star", "PhoneNumber": "Phone",
+                 "WebsiteUrl": "Website"}
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """The encoding of the Michelin chain's model, loaded on first use."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = get_model_tokenizer("gpt-3.5-turbo")
+    return _tokenizer
+
+
+def parse_fields(document: Document) -> dict:
+    """The "column: value" lines of a parent document as a dict."""
+    fields = {}
+    for line in document.page_content.split("\n"):
+        name, sep, value = line.partition(": ")
+        if sep:
+            fields[name.strip()] = value.strip()
+    return fields
+
+
+def query_fields(query: str) -> List[str]:
+    """Columns to show for `query`: the base ones plus any it asks about."""
+    lowered = query.lower()
+    return list(BASE_FIELDS) + [field for field, pattern in OPTIONAL_FIELDS if re.search(pattern, lowered)]
+
+
+def _cell(value: str) -> str:
+    # A cell must stay on one line and not split the row
+    return " ".join(value.replace("|", "/").split())
+
+
+class MichelinContextPacker:
+    """Renders retrieved restaurants as a compact, token-budgeted table.
+
+    Each document is projected to the columns the query needs (see
+    `query_fields`) plus a Description column. A row is dropped when an
+    earlier row has the same name and either the same location or a nearly
+    identical description (`dedupe_threshold`, the Jaccard similarity of
+    their word sets). Rows are added in rank order while their columns
+    fit in `max_tokens`. The remaining budget then goes to the
+    descriptions, in rank order, each capped at `max_description_tokens`
+    and cut on a token boundary.
+    """
+
+    def __init__(self, max_tokens: int = 800, max_description_tokens: int = 60, dedupe_threshold: float = 0.9,
+                 tokenizer=None):
+        self.max_tokens = max_tokens
+        self.max_description_tokens = max_description_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        return self._tokenizer or get_tokenizer()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
+
+    def _dedupe(self, rows: List[dict]) -> List[dict]:
+        kept, seen = [], {}
+        for row in rows:
+            name = " ".join(tokenize(row.get("Name", "")))
+            location = row.get("Location", "").lower()
+            words = set(tokenize(row.get("Description", "")))
+            # The same restaurant listed twice, or re-listed with an edited description
+            duplicate = any(
+                location == other_location or (words and len(words & other) / len(words | other) >= self.dedupe_threshold)
+                for other_location, other in seen.get(name, ())
+            )
+            if duplicate:
+                continue
+            seen.setdefault(name, []).append((location, words))
+            kept.append(row)
+        return kept
+
+    def _trim(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        tokens = self.tokenizer.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.tokenizer.decode(tokens[:max_tokens]).rstrip() + "…"
+
+    def pack_with_stats(self, query: str, documents: List[Document]) -> Tuple[str, dict]:
+        columns = query_fields(query)
+        rows = self._dedupe([parse_fields(document) for document in documents])
+        header = " | ".join(COLUMN_TITLES.get(column, column) for column in columns + ["Description"])
+        used = self.count_tokens(header) + 1
+
+        # Rows without their descriptions, in rank order, while they fit
+        packed = []
+        for row in rows:
+            cells = " | ".join(_cell(row.get(column, "")) for column in columns)
+            cost = self.count_tokens(cells + " | ") + 1
+            if used + cost > self.max_tokens:
+                break
+            used += cost
+            packed.append((cells, _cell(row.get("Description", ""))))
+
+        lines = [header]
+        for cells, description in packed:
+            description = self._trim(description, min(self.max_description_tokens, self.max_tokens - used))
+            used += self.count_tokens(description)
+            lines.append(f"{cells} | {description}")
+        text = "\n".join(lines)
+        return text, {
+            "documents": len(documents),
+            "deduped": len(documents) - len(rows),
+            "rows": len(packed),
+            "columns": len(columns) + 1,
+            "tokens": self.count_tokens(text),
+        }
+
+    def pack(self, query: str, documents: List[Document]) -> str:
+        return self.pack_with_stats(query, documents)[0]
+
@@ -0,0 +1,177 @@
+import threading
+from typing import Any, List, Literal, Optional
+
+import numpy as np
+from pydantic import ConfigDict, PrivateAttr
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from src.utils.build_RAG_db import ID_KEY
+from src.utils.bm25_index import BM25Index, reciprocal_rank_fusion
+from src.utils.michelin_index import MichelinIndex, extract_filters
+from src.utils.tracing import span
+
+# Parent fields that carry no searchable words
+LEXICAL_SKIP_FIELDS = ("Longitude", "Latitude", "PhoneNumber", "Url", "WebsiteUrl")
+
+
+def lexical_text(document: Document) -> str:
+    lines = [line for line in document.page_content.split("\n") if not line.startswith(LEXICAL_SKIP_FIELDS)]
+    # Names are what users quote most; count them twice
+    return "\n".join(lines + [document.metadata.get("name", "")])
+
+
+class MichelinRetriever(BaseRetriever):
+    """Parent-document retriever that applies structured filters first.
+
+    Award, price, cuisine and location constraints found in the query are
+    resolved against in-process indexes over the parent metadata, and only
+    the child chunks of the surviving parents are ranked by similarity.
+    When no more than `top_k` parents match, all of them are returned; if
+    the query shares words with them, BM25 orders them without an embedding
+    call. Queries without constraints, or whose constraints no parent
+    meets, go to the Chroma HNSW index, as with ParentDocumentRetriever.
+
+    Filtered queries scan the candidates' child vectors exactly, from a
+    matrix loaded out of the collection on first use. Chroma's own `$in`
+    metadata filter costs far more than the scan at this data size, and its
+    HNSW search can fail when few vectors pass the filter.
+
+    In "hybrid" mode a local BM25 index ranks the same candidates, and the
+    lexical and vector rankings are merged by reciprocal-rank fusion. When
+    the best BM25 hit outscores the runner-up by `decisive_ratio` (a quoted
+    restaurant name or street), the query-embedding call is skipped and the
+    lexical ranking is used alone. "lexical" and "vector" modes use one
+    ranking only; a lexical query with no BM25 hit falls back to the vector
+    ranking.
+
+    The indexes and child vectors are built once, on first use or in
+    `warm_up`, under a lock shared by concurrent queries.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: Any
+    docstore: Any
+    # Child chunks fetched per query; several usually share a parent
+    k: int = 10
+    # Parents returned per query
+    top_k: int = 10
+    mode: Literal["hybrid", "vector", "lexical"] = "hybrid"
+    rrf_k: int = 60
+    # Set to 0 to always embed the query in hybrid mode
+    decisive_ratio: float = 2.0
+    decisive_min_score: float = 4.0
+    _index: Optional[MichelinIndex] = PrivateAttr(default=None)
+    _lexical: Optional[BM25Index] = PrivateAttr(default=None)
+    _child_parents: Optional[np.ndarray] = PrivateAttr(default=None)
+    _child_vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def _build_indexes(self):
+        # Both indexes come from one docstore scan, on first use
+        with self._lock:
+            if self._index is not None and self._lexical is not None:
+                return
+            keys = list(self.docstore.yield_keys())
+            parents = {key: document for key, document in zip(keys, self.docstore.mget(keys)) if document is not None}
+            if self._index is None:
+                self._index = MichelinIndex({key: document.metadata for key, document in parents.items()})
+            self._lexical = BM25Index({key: lexical_text(document) for key, document in parents.items()})
+
+    @property
+    def index(self) -> MichelinIndex:
+        if self._index is None:
+            self._build_indexes()
+        return self._index
+
+    @property
+    def lexical(self) -> BM25Index:
+        if self._lexical is None:
+            self._build_indexes()
+        return self._lexical
+
+    def _load_child_vectors(self):
+        if self._child_vectors is None:
+            with self._lock:
+                if self._child_vectors is None:
+                    found = self.vectorstore._collection.get(include=["embeddings", "metadatas"])
+                    self._child_parents = np.array([metadata.get(ID_KEY, "") for metadata in found["metadatas"]])
+                    self._child_vectors = np.asarray(found["embeddings"], dtype=np.float32)
+        return self._child_parents, self._child_vectors
+
+    def warm_up(self):
+        """Build the filter and BM25 indexes and load the child vectors now."""
+        self.lexical
+        self._load_child_vectors()
+
+    def _filtered_search(self, query: str, candidates) -> List[str]:
+        parents, vectors = self._load_child_vectors()
+        rows = np.flatnonzero(np.isin(parents, list(candidates)))
+        if not len(rows):
+            return []
+        target = np.asarray(self.vectorstore.embeddings.embed_query(query), dtype=np.float32)
+        # Squared L2, the collection's default space
+        distances = ((vectors[rows] - target) ** 2).sum(axis=1)
+        nearest = rows[np.argsort(distances)[:self.k]]
+        return [str(parent) for parent in parents[nearest]]
+
+    def _vector_ranking(self, query: str, candidates) -> List[str]:
+        if candidates is None:
+            children = self.vectorstore.similarity_search(query, k=self.k)
+            child_parents = [child.metadata.get(ID_KEY) for child in children]
+        else:
+            child_parents = self._filtered_search(query, candidates)
+        ranking = []
+        for parent_id in child_parents:
+            if parent_id is not None and parent_id not in ranking:
+                ranking.append(parent_id)
+        return ranking
+
+    def _is_decisive(self, hits) -> bool:
+        if not hits or not self.decisive_ratio or hits[0][1] < self.decisive_min_score:
+            return False
+        return len(hits) == 1 or hits[0][1] >= self.decisive_ratio * hits[1][1]
+
+    def _plan(self, query: str, candidates):
+        """How `query` is retrieved: the candidates to rank, the BM25 hits, and whether to embed it."""
+        if candidates is not None and not candidates:
+            # Constraints nothing satisfies, often a misread one; search everything instead
+            candidates = None
+        if self.mode == "vector":
+            return candidates, None, True
+        hits = self.lexical.search(query, k=self.top_k, candidates=candidates)
+        if not hits:
+            # Nothing to rank lexically
+            return candidates, hits, True
+        if candidates is not None and len(candidates) <= self.top_k:
+            # Every candidate is returned anyway; BM25 puts the ones the query names first
+            return candidates, hits, False
+        return candidates, hits, self.mode == "hybrid" and not self._is_decisive(hits)
+
+    def needs_embedding(self, query: str) -> bool:
+        """Whether retrieving `query` will embed it, so batches can embed such queries up front."""
+        return self._plan(query, self.index.candidates(extract_filters(query, self.index)))[2]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with span("michelin.retrieve", mode=self.mode) as retrieve_span:
+            filters = extract_filters(query, self.index)
+            candidates = self.index.candidates(filters)
+            retrieve_span.set(filters=sorted(filters), candidates=None if candidates is None else len(candidates))
+            documents = self._retrieve(query, candidates)
+            retrieve_span.set(results=len(documents))
+        return documents
+
+    def _retrieve(self, query: str, candidates) -> List[Document]:
+        candidates, hits, embed = self._plan(query, candidates)
+        if not hits:
+            ids = self._vector_ranking(query, candidates)
+        elif not embed:
+            ids = [doc_id for doc_id, _ in hits]
+        else:
+            ids = reciprocal_rank_fusion([[doc_id for doc_id, _ in hits], self._vector_ranking(query, candidates)],
+                                         k=self.rrf_k)
+        if candidates is not None and len(candidates) <= self.top_k:
+            # The vector scan keeps `k` child chunks, and BM25 only scores parents sharing a word with the query
+            ids = ids + [doc_id for doc_id in sorted(candidates) if doc_id not in ids]
+        return [document for document in self.docstore.mget(ids[:self.top_k]) if document is not None]
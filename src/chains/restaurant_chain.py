@@ -1,49 +1,101 @@
 import os
+import asyncio
+import threading
 from typing import Literal
 from operator import itemgetter
 from typing_extensions import TypedDict
-from langchain_chroma import Chroma
-from langchain_openai import ChatOpenAI
-from langchain.storage import InMemoryStore
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.retrievers import ParentDocumentRetriever
-from langchain_openai.embeddings import OpenAIEmbeddings
 from langchain_core.output_parsers import StrOutputParser
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
-from src.utils.build_RAG_db import build_michelin_database
+from langchain_core.runnables import RunnableGenerator, RunnableLambda, RunnablePassthrough
+from src.utils.docstore import SQLiteDocStore
+from src.services.llm_gateway import get_chat_model
+from src.utils.embedding_service import get_embedding_service
+from src.chains.michelin_retriever import MichelinRetriever
+from src.chains.michelin_context import MichelinContextPacker
+from src.utils.tracing import span
+from src.utils.build_RAG_db import COLLECTION_NAME, PERSIST_DIRECTORY, build_michelin_database, docstore_path
+from src.services.intent_classifier import RESTAURANT_TYPE_RULES, KeywordIntentClassifier, TieredClassifier
 
 class RestaurantType(TypedDict):
     restaurant_type: Literal["general", "michelin"]
 
 class RestaurantChain:
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo")
-        self.embeddings = OpenAIEmbeddings()
-        self.retriever = self.build_michelin_guide_rag()
+    def __init__(self, cache=None, retrieval_mode="hybrid", top_k=10, context_budget_tokens=800):
+        self.llm = get_chat_model("gpt-3.5-turbo")
+        # Optional shared ResponseCache, keyed by restaurant type and prompt template
+        self.cache = cache
+        self.templates = {}
+        # Shared with the recall memory store, so repeated queries are embedded once
+        self.embeddings = get_embedding_service()
+        # Michelin retrieval: "hybrid" (BM25 + vectors), "vector" or "lexical"
+        self.retrieval_mode = retrieval_mode
+        self.top_k = top_k
+        # Retrieved restaurants are rendered as a table of at most this many tokens
+        self.context_packer = MichelinContextPacker(max_tokens=context_budget_tokens)
+        # Opened on the first Michelin query or by warm_up(); on a fresh
+        # checkout that also builds the database
+        self._retriever = None
+        self._retriever_lock = threading.Lock()
         self.general_restaurant_chain = self.build_general_recommendation_chain()
         self.michelin_guide_chain = self.build_michelin_recommendation_chain()
         self.restaurant_type_route_chain = self.define_restaurant_type_route_chain()
 
+    @property
+    def retriever(self) -> MichelinRetriever:
+        if self._retriever is None:
+            with self._retriever_lock:
+                if self._retriever is None:
+                    self._retriever = self.build_michelin_guide_rag()
+        return self._retriever
+
+    def _retrieve(self, query, config):
+        return self.retriever.invoke(query, config)
+
+    async def _aretrieve(self, query, config):
+        return await self.retriever.ainvoke(query, config)
+
+    def _pack(self, query, documents):
+        with span("michelin.pack") as pack_span:
+            context, stats = self.context_packer.pack_with_stats(query, documents)
+            pack_span.set(**stats)
+        return context
+
+    def _context(self, query, config):
+        return self._pack(query, self._retrieve(query, config))
+
+    async def _acontext(self, query, config):
+        return self._pack(query, await self._aretrieve(query, config))
+
+    def warm_up(self):
+        """Open the Michelin retriever and build its in-memory indexes."""
+        self.retriever.warm_up()
+
     def build_michelin_guide_rag(self):
+        from langchain_chroma import Chroma
 
-        persist_directory = "data/embeddings_chroma"
-        if not os.path.exists(persist_directory):
+        persist_directory = PERSIST_DIRECTORY
+        # The parent docstore is written together with the child vectors
+        if not os.path.exists(docstore_path(persist_directory)):
             build_michelin_database()
 
         vectorstore = Chroma(
-            collection_name="michelin_guide_restaurants", 
+            collection_name=COLLECTION_NAME, 
             embedding_function=self.embeddings,
             persist_directory=persist_directory
         )
         
-        store = InMemoryStore()
-        child_splitter = RecursiveCharacterTextSplitter(chunk_size=200)
-        
-        retriever = ParentDocumentRetriever(
+        # Persisted parents, opened on first query; the CSV is not re-read
+        store = SQLiteDocStore(docstore_path(persist_directory))
+
+        # Award, price, cuisine and location constraints narrow the candidates
+        # before the lexical and similarity search
+        retriever = MichelinRetriever(
             vectorstore=vectorstore,
             docstore=store,
-            child_splitter=child_splitter,
+            # Several chunks usually come from the same restaurant
+            k=10,
+            top_k=self.top_k,
+            mode=self.retrieval_mode,
         )
 
         return retriever
@@ -54,6 +106,7 @@ class RestaurantChain:
             
             Question: {input}
         """
+        self.templates["general"] = general_restaurant_template
         general_restaurant_prompt = ChatPromptTemplate.from_template(general_restaurant_template)
         
         general_restaurant_chain = (
@@ -67,29 +120,23 @@ class RestaurantChain:
 
     def build_michelin_recommendation_chain(self):
         michelin_guide_template = """
-            Information to understand the context: 
-            Data: michelin guide restaurants 
-            Columns: 
-                Name: The name of the restaurant.
-                Address: Full address, including city, region, and country.
-                Location: City and country of the restaurant.
-                Price: The average cost range represented by symbols (e.g., $, $$, $$$).
-                Cuisine: Type of cuisine offered by the restaurant.
-                Coordinates: Longitude and latitude for mapping the restaurant's location.
-                Contact Information: Phone number and URLs for the Michelin Guide page and the restaurant's official website.
-                Award: Michelin distinction (e.g., Michelin Star, Bib Gourmand, Selected Restaurants).
-                GreenStar: Indicates whether the restaurant has a Michelin Green Star for sustainability.
-                Description: A brief summary highlighting the restaurant's ambiance, menu, and standout dishes.
-
-            Answer the question based on the following context: {context}
+            You recommend restaurants from the Michelin Guide.
+            The context is a table of matching restaurants, one per line, with "|" between columns.
+            Price runs from $ to $$$$. Award is the Michelin distinction (3, 2 or 1 Star, Bib Gourmand, Selected Restaurants).
+            Descriptions ending in "…" are shortened.
+
+            Answer the question based on the following context:
+            {context}
+
             Question: {input}
         """
 
+        self.templates["michelin"] = michelin_guide_template
         michelin_guide_prompt = ChatPromptTemplate.from_template(michelin_guide_template)
         
         michelin_guide_chain = (
             {
-                "context": self.retriever, 
+                "context": RunnableLambda(self._context, afunc=self._acontext),
                 "input": RunnablePassthrough()
             } 
             | michelin_guide_prompt 
@@ -107,28 +154,146 @@ class RestaurantChain:
                 ("human", "{message}"),
             ]
         )
-        restaurant_type_route_chain = route_prompt | self.llm.with_structured_output(RestaurantType) | itemgetter("restaurant_type")
+        llm_route_chain = route_prompt | self.llm.with_structured_output(RestaurantType) | itemgetter("restaurant_type")
+
+        # Keyword rules settle the obvious cases without an LLM call
+        self.restaurant_type_classifier = TieredClassifier(
+            [KeywordIntentClassifier(RESTAURANT_TYPE_RULES)],
+            fallback=lambda message: llm_route_chain.invoke({"message": message}),
+            afallback=lambda message: llm_route_chain.ainvoke({"message": message}),
+            abatch_fallback=lambda messages, max_concurrency: llm_route_chain.abatch(
+                [{"message": message} for message in messages],
+                config={"max_concurrency": max_concurrency}, return_exceptions=True,
+            ),
+        )
+        restaurant_type_route_chain = RunnableLambda(
+            self.restaurant_type_classifier.classify,
+            afunc=self.restaurant_type_classifier.aclassify,
+        )
         return restaurant_type_route_chain
 
-    def get_restaurant_recommendation_result(self, restaurant_type, query):
+    def _cache_get(self, restaurant_type, query):
+        if self.cache is None or restaurant_type not in self.templates:
+            return None
+        return self.cache.get(f"restaurant_{restaurant_type}", self.templates[restaurant_type], query)
+
+    def _cache_put(self, restaurant_type, query, res):
+        if self.cache is not None and restaurant_type in self.templates and res is not None:
+            self.cache.put(f"restaurant_{restaurant_type}", self.templates[restaurant_type], query, res)
+
+    def _get_recommendation_chain(self, restaurant_type):
         if restaurant_type == 'general':
-            print("Get restaurant_type = general")
-            res = self.general_restaurant_chain.invoke(query)
+            return self.general_restaurant_chain
         elif restaurant_type == 'michelin':
-            print("Get restaurant_type = michelin")
-            res = self.michelin_guide_chain.invoke(query)
-        else:
-            res = None
-        return res
+            return self.michelin_guide_chain
+        return None
+
+    def stream_restaurant_recommendation(self, restaurant_type, query):
+        cached = self._cache_get(restaurant_type, query)
+        if cached is not None:
+            yield cached
+            return
+
+        chain = self._get_recommendation_chain(restaurant_type)
+        if chain is None:
+            return
+        chunks = []
+        for chunk in chain.stream(query):
+            chunks.append(chunk)
+            yield chunk
+        self._cache_put(restaurant_type, query, "".join(chunks))
+
+    async def astream_restaurant_recommendation(self, restaurant_type, query):
+        cached = self._cache_get(restaurant_type, query)
+        if cached is not None:
+            yield cached
+            return
+
+        chain = self._get_recommendation_chain(restaurant_type)
+        if chain is None:
+            return
+        chunks = []
+        async for chunk in chain.astream(query):
+            chunks.append(chunk)
+            yield chunk
+        self._cache_put(restaurant_type, query, "".join(chunks))
+
+    def prefetch_embeddings(self, queries):
+        """Embed, in one pass, the Michelin queries whose retrieval will need a
+        query vector; the retriever then finds them in the embedding cache."""
+        with span("michelin.prefetch", queries=len(queries)) as prefetch_span:
+            texts = list(dict.fromkeys(query for query in queries if self.retriever.needs_embedding(query)))
+            if texts:
+                self.embeddings.embed_documents(texts)
+            prefetch_span.set(embedded=len(texts))
+        return len(texts)
+
+    async def aclassify_batch(self, queries, max_concurrency=None):
+        """'general' or 'michelin' for each query, or the exception that prevented it."""
+        return await self.restaurant_type_classifier.aclassify_batch(queries, max_concurrency)
+
+    async def abatch_restaurant_recommendations(self, queries, restaurant_types=None, max_concurrency=None):
+        """Answers for many queries, one `.abatch` per restaurant type.
+
+        `restaurant_types` are classified here when not given. Michelin query
+        vectors are embedded together first, and repeated queries are answered
+        once. A failed query gets the exception instead of an answer.
+        """
+        if restaurant_types is None:
+            restaurant_types = await self.aclassify_batch(queries, max_concurrency)
+        responses = [
+            restaurant_type if isinstance(restaurant_type, Exception) else self._cache_get(restaurant_type, query)
+            for restaurant_type, query in zip(restaurant_types, queries)
+        ]
+        pending = {}
+        for restaurant_type, query, response in zip(restaurant_types, queries, responses):
+            if response is None:
+                pending.setdefault(restaurant_type, {})[query] = None
+        if "michelin" in pending:
+            await asyncio.to_thread(self.prefetch_embeddings, list(pending["michelin"]))
+
+        for restaurant_type, group in pending.items():
+            chain = self._get_recommendation_chain(restaurant_type)
+            if chain is None:
+                continue
+            answers = await chain.abatch(list(group), config={"max_concurrency": max_concurrency},
+                                         return_exceptions=True)
+            for query, answer in zip(list(group), answers):
+                group[query] = answer
+                if not isinstance(answer, Exception):
+                    self._cache_put(restaurant_type, query, answer)
+        return [pending[restaurant_type][query] if response is None else response
+                for restaurant_type, query, response in zip(restaurant_types, queries, responses)]
+
+    def get_restaurant_recommendation_result(self, restaurant_type, query):
+        chunks = list(self.stream_restaurant_recommendation(restaurant_type, query))
+        return "".join(chunks) if chunks else None
+
+    def _transform_recommendation(self, inputs):
+        # The parallel step streams one partial dict per branch
+        x = {}
+        for chunk in inputs:
+            x.update(chunk)
+        yield from self.stream_restaurant_recommendation(
+            restaurant_type=x["restaurant_type"],
+            query=x["message"]
+        )
+
+    async def _atransform_recommendation(self, inputs):
+        x = {}
+        async for chunk in inputs:
+            x.update(chunk)
+        async for token in self.astream_restaurant_recommendation(
+            restaurant_type=x["restaurant_type"],
+            query=x["message"]
+        ):
+            yield token
 
     def get_restaurant_chain(self):
+        # A generator step, so .stream()/.astream() yield answer tokens and
+        # .invoke() returns their concatenation
         restaurant_chain = {
             "restaurant_type": self.restaurant_type_route_chain,
             "message": RunnablePassthrough()
-        } | RunnableLambda(
-            lambda x: self.get_restaurant_recommendation_result(
-                restaurant_type=x["restaurant_type"], 
-                query=x["message"]
-            )
-        )
-        return restaurant_chain
\ No newline at end of file
+        } | RunnableGenerator(self._transform_recommendation, self._atransform_recommendation)
+        return restaurant_chain
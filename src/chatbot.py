@@ -1,53 +1,311 @@
-import os
+import time
 import uuid
-from dotenv import load_dotenv
-from src.utils.long_term_memory import graph
-from src.services.router_service import ChatbotRouter
-from src.services.chatbot_service import ChatbotService
-from src.chains.restaurant_chain import RestaurantChain
+import asyncio
+import contextlib
+from src.engine import get_engine
+from src.services import llm_gateway
+from src.utils.tracing import span
 
-load_dotenv()
 
 class Chatbot:
-    def __init__(self):
-        os.environ["LANGCHAIN_TRACING_V2"] = "true"
-        
-        self.memory_config = {"configurable": {"user_id": str(uuid.uuid4()), "thread_id": "1"}}
-
-        # Initialize regular services
-        self.services = {
-            "tourist_attraction": ChatbotService("You are an expert in finding tourist attractions."),
-            "itinerary_planning": ChatbotService("You are an expert in travel itinerary planning."),
-            "exploring_travel_ideas": ChatbotService("You are an expert in recommending travel ideas."),
-            "others": ChatbotService("You are a friendly and helpful chatbot."),
-            # Special case for restaurant recommendations
-            "restaurant_recommendations": RestaurantChain().get_restaurant_chain()
-        }
-
-        self.router = ChatbotRouter()
+    """Per-session conversation handle on top of the shared `ChatbotEngine`.
+
+    With `speculative=True` the service router (and, with `speculate_service`,
+    the routed service itself) runs concurrently with the memory graph; the
+    branch that the usual decision logic does not pick is cancelled.
+
+    Each turn is traced as a `turn` span, with `memory`, `router` and
+    `service` spans (and their node, retrieval and LLM spans) below it.
+    """
+
+    def __init__(self, engine=None, user_id: str = None, thread_id: str = None,
+                 speculative: bool = False, speculate_service: bool = False):
+        self.engine = engine if engine is not None else get_engine()
+        self.user_id = user_id or str(uuid.uuid4())
+        self.thread_id = thread_id or str(uuid.uuid4())
+        self.speculative = speculative
+        self.speculate_service = speculate_service
+
+        self.memory_config = {"configurable": {"user_id": self.user_id, "thread_id": self.thread_id}}
+        # Wall-clock breakdown of the most recent turn, in seconds
+        self.last_turn_timings = {}
+
+    def _turn_span(self, mode: str):
+        return span("turn", mode=mode, user_id=self.user_id, thread_id=self.thread_id)
+
+    def _end_turn_span(self, turn_span):
+        turn_span.set(**{key: self.last_turn_timings[key] for key in ("winner", "cancelled", "ttft_s")
+                         if key in self.last_turn_timings})
 
     def process_message(self, message: str) -> str:
+        if self.speculative:
+            # On the gateway's persistent loop, where the shared async clients live
+            return llm_gateway.run_sync(self.aprocess_message(message))
+
+        with self._turn_span("invoke") as turn_span:
+            response = self._process_message(message)
+            self._end_turn_span(turn_span)
+        return response
+
+    async def aprocess_message(self, message: str) -> str:
+        with self._turn_span("ainvoke") as turn_span:
+            response = await self._aprocess_message(message)
+            self._end_turn_span(turn_span)
+        return response
+
+    def stream_message(self, message: str):
+        """Yield answer tokens from whichever branch answers the turn.
+
+        The memory agent's answer is streamed once its message is complete and
+        calls no tool, so the text matches `process_message`'s; if the agent
+        stays silent, the routed service (or the Michelin RAG chain) is
+        streamed token by token instead. Time to first token is recorded as `ttft_s` in
+        `last_turn_timings`.
+        """
+        with self._turn_span("stream") as turn_span:
+            yield from self._stream_message(message)
+            self._end_turn_span(turn_span)
+
+    async def astream_message(self, message: str):
+        with self._turn_span("astream") as turn_span:
+            async for token in self._astream_message(message):
+                yield token
+            self._end_turn_span(turn_span)
+
+    def _process_message(self, message: str) -> str:
+        timings = {}
+        turn_start = time.perf_counter()
+
         # First, process the message through the memory graph
         memory_state = {"messages": [("user", message)]}
         memory_response = None
-        
-        for chunk in graph.stream(memory_state, config=self.memory_config):
-            if "messages" in chunk.get("agent", {}):
-                memory_response = chunk["agent"]["messages"][0].content
-        
+
+        start = time.perf_counter()
+        with span("memory"):
+            for chunk in self.engine.graph.stream(memory_state, config=self.memory_config):
+                if "messages" in chunk.get("agent", {}):
+                    memory_response = chunk["agent"]["messages"][0].content
+        timings["memory_s"] = time.perf_counter() - start
+
         # If memory agent provided a response, use it
         if memory_response:
+            self._record_timings(timings, turn_start, winner="memory")
             return memory_response
-            
+
         # Otherwise, fall back to regular service routing
-        service_type = self.router.route_message(message)
-        print("service_type:", service_type)
-        if service_type not in self.services:
+        start = time.perf_counter()
+        service_type = self.engine.router.route_message(message)
+        timings["router_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = self._call_service(service_type, message)
+        timings["service_s"] = time.perf_counter() - start
+
+        self._record_timings(timings, turn_start, winner=service_type)
+        return response
+
+    async def _aprocess_message(self, message: str) -> str:
+        timings = {}
+        turn_start = time.perf_counter()
+
+        if not self.speculative:
+            memory_response = await self._arun_memory_graph(message, timings)
+            if memory_response:
+                self._record_timings(timings, turn_start, winner="memory")
+                return memory_response
+            service_type, response = await self._aroute_and_call(message, timings)
+        else:
+            # Start routing (and optionally the routed service) speculatively,
+            # while the memory graph decides whether it answers the turn itself
+            routed = asyncio.create_task(self._aroute_and_call(message, timings))
+            try:
+                memory_response = await self._arun_memory_graph(message, timings)
+            except BaseException:
+                routed.cancel()
+                raise
+
+            if memory_response:
+                if not routed.done():
+                    # The router, or the routed service once routing finished
+                    timings["cancelled"] = "service" if "router_s" in timings else "router"
+                routed.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await routed
+                self._record_timings(timings, turn_start, winner="memory")
+                return memory_response
+
+            service_type, response = await routed
+        if response is None:
+            start = time.perf_counter()
+            response = await self._acall_service(service_type, message)
+            timings["service_s"] = time.perf_counter() - start
+
+        self._record_timings(timings, turn_start, winner=service_type)
+        return response
+
+    @staticmethod
+    def _memory_answer_tokens(mode: str, payload, pending: list) -> list:
+        """Tokens of the memory agent's answer from a ["messages", "updates"] graph stream.
+
+        A message's tokens are held in `pending` until the agent node's update
+        shows the message is final, i.e. it calls no tool, so text the model
+        writes before a tool call is never streamed.
+        """
+        if mode == "messages":
+            token, metadata = payload
+            if metadata.get("langgraph_node") == "agent" and token.content:
+                pending.append(token.content)
+            return []
+        messages = (payload.get("agent") or {}).get("messages")
+        if not messages:
+            return []
+        tokens, pending[:] = list(pending), []
+        final = messages[-1]
+        if final.tool_calls or not final.content:
+            return []
+        return tokens or [final.content]
+
+    def _stream_message(self, message: str):
+        timings = {}
+        turn_start = time.perf_counter()
+        memory_state = {"messages": [("user", message)]}
+        memory_answered = False
+
+        start = time.perf_counter()
+        with span("memory"):
+            pending = []
+            for mode, payload in self.engine.graph.stream(memory_state, config=self.memory_config,
+                                                          stream_mode=["messages", "updates"]):
+                for token in self._memory_answer_tokens(mode, payload, pending):
+                    timings.setdefault("ttft_s", time.perf_counter() - turn_start)
+                    memory_answered = True
+                    yield token
+        timings["memory_s"] = time.perf_counter() - start
+
+        if memory_answered:
+            self._record_timings(timings, turn_start, winner="memory")
+            return
+
+        start = time.perf_counter()
+        service_type = self.engine.router.route_message(message)
+        timings["router_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with span("service", service_type=service_type):
+            for token in self._stream_service(service_type, message):
+                timings.setdefault("ttft_s", time.perf_counter() - turn_start)
+                yield token
+        timings["service_s"] = time.perf_counter() - start
+
+        self._record_timings(timings, turn_start, winner=service_type)
+
+    async def _astream_message(self, message: str):
+        timings = {}
+        turn_start = time.perf_counter()
+        memory_state = {"messages": [("user", message)]}
+        memory_answered = False
+
+        start = time.perf_counter()
+        with span("memory"):
+            pending = []
+            async for mode, payload in self.engine.graph.astream(memory_state, config=self.memory_config,
+                                                                 stream_mode=["messages", "updates"]):
+                for token in self._memory_answer_tokens(mode, payload, pending):
+                    timings.setdefault("ttft_s", time.perf_counter() - turn_start)
+                    memory_answered = True
+                    yield token
+        timings["memory_s"] = time.perf_counter() - start
+
+        if memory_answered:
+            self._record_timings(timings, turn_start, winner="memory")
+            return
+
+        start = time.perf_counter()
+        service_type = await self.engine.router.aroute_message(message)
+        timings["router_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with span("service", service_type=service_type):
+            async for token in self._astream_service(service_type, message):
+                timings.setdefault("ttft_s", time.perf_counter() - turn_start)
+                yield token
+        timings["service_s"] = time.perf_counter() - start
+
+        self._record_timings(timings, turn_start, winner=service_type)
+
+    async def _arun_memory_graph(self, message: str, timings: dict):
+        memory_state = {"messages": [("user", message)]}
+        memory_response = None
+
+        start = time.perf_counter()
+        with span("memory"):
+            async for chunk in self.engine.graph.astream(memory_state, config=self.memory_config):
+                if "messages" in chunk.get("agent", {}):
+                    memory_response = chunk["agent"]["messages"][0].content
+        timings["memory_s"] = time.perf_counter() - start
+        return memory_response
+
+    async def _aroute_and_call(self, message: str, timings: dict):
+        start = time.perf_counter()
+        service_type = await self.engine.router.aroute_message(message)
+        timings["router_s"] = time.perf_counter() - start
+
+        if not (self.speculative and self.speculate_service):
+            return service_type, None
+
+        start = time.perf_counter()
+        response = await self._acall_service(service_type, message)
+        timings["service_s"] = time.perf_counter() - start
+        return service_type, response
+
+    def _get_service(self, service_type: str):
+        services = self.engine.services
+        if service_type not in services:
             raise ValueError(f"Unknown service type: {service_type}")
-            
-        # Special handling for restaurant recommendations
+        return services[service_type]
+
+    def _call_service(self, service_type: str, message: str) -> str:
+        service = self._get_service(service_type)
+
+        with span("service", service_type=service_type):
+            # Special handling for restaurant recommendations
+            if service_type == 'restaurant_recommendations':
+                return service.invoke(message)
+
+            # Regular handling for other services
+            return service.process_message(message)
+
+    async def _acall_service(self, service_type: str, message: str) -> str:
+        service = self._get_service(service_type)
+
+        with span("service", service_type=service_type):
+            if service_type == 'restaurant_recommendations':
+                return await service.ainvoke(message)
+
+            return await service.aprocess_message(message)
+
+    def _stream_service(self, service_type: str, message: str):
+        service = self._get_service(service_type)
+
         if service_type == 'restaurant_recommendations':
-            return self.services[service_type].invoke(message)
-        
-        # Regular handling for other services
-        return self.services[service_type].process_message(message)
+            return service.stream(message)
+
+        return service.stream_message(message)
+
+    def _astream_service(self, service_type: str, message: str):
+        service = self._get_service(service_type)
+
+        if service_type == 'restaurant_recommendations':
+            return service.astream(message)
+
+        return service.astream_message(message)
+
+    def _record_timings(self, timings: dict, turn_start: float, winner: str):
+        timings["total_s"] = time.perf_counter() - turn_start
+        # What the same branches would have cost when run one after another
+        timings["serial_s"] = sum(timings.get(key, 0.0) for key in ("memory_s", "router_s", "service_s"))
+        if winner == "memory":
+            timings["serial_s"] = timings["memory_s"]
+        timings["saved_s"] = max(timings["serial_s"] - timings["total_s"], 0.0)
+        timings["winner"] = winner
+        self.last_turn_timings = timings
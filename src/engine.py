@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from src.utils.response_cache import ResponseCache
+
+load_dotenv()
+
+
+class ChatbotEngine:
+    """Heavy, process-wide chatbot resources.
+
+    LLM clients, the Chroma retriever and the compiled memory graph are built
+    lazily on first use and then shared by every session; `warm_up()` builds
+    them ahead of the first turn. Per-user state lives in `src.chatbot.Chatbot`.
+
+    `response_cache` is shared by the routed services and restaurant chains
+    only; the memory agent's answers are per-user and never cached.
+    """
+
+    def __init__(self, services=None, router=None, graph=None, response_cache=None):
+        # LangSmith tracing unless explicitly disabled, e.g. for load tests
+        os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
+
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+
+        self._services = services
+        self._router = router
+        self._graph = graph
+        self._restaurant_chain = None
+        # Injected graphs bring their own resources; only the default is warmed
+        self._default_graph = graph is None
+        self._lock = threading.RLock()
+
+    def _build_services(self):
+        from src.services.chatbot_service import ChatbotService
+        from src.chains.restaurant_chain import RestaurantChain
+
+        cache = self.response_cache
+        # Kept so warm_up() can open the Michelin retriever
+        self._restaurant_chain = RestaurantChain(cache=cache)
+        return {
+            "tourist_attraction": ChatbotService("You are an expert in finding tourist attractions.", "tourist_attraction", cache),
+            "itinerary_planning": ChatbotService("You are an expert in travel itinerary planning.", "itinerary_planning", cache),
+            "exploring_travel_ideas": ChatbotService("You are an expert in recommending travel ideas.", "exploring_travel_ideas", cache),
+            "others": ChatbotService("You are a friendly and helpful chatbot.", "others", cache),
+            # Special case for restaurant recommendations
+            "restaurant_recommendations": self._restaurant_chain.get_restaurant_chain()
+        }
+
+    def _build_router(self):
+        from src.services.router_service import ChatbotRouter
+
+        return ChatbotRouter()
+
+    def _build_graph(self):
+        from src.utils.long_term_memory import get_graph
+
+        return get_graph()
+
+    @property
+    def services(self):
+        if self._services is None:
+            with self._lock:
+                if self._services is None:
+                    self._services = self._build_services()
+        return self._services
+
+    @property
+    def restaurant_chain(self):
+        """The `RestaurantChain` behind the restaurant service; None when services were injected."""
+        self.services
+        return self._restaurant_chain
+
+    @property
+    def router(self):
+        if self._router is None:
+            with self._lock:
+                if self._router is None:
+                    self._router = self._build_router()
+        return self._router
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            with self._lock:
+                if self._graph is None:
+                    self._graph = self._build_graph()
+        return self._graph
+
+    def warm_up(self, michelin: bool = True) -> dict:
+        """Build every lazy resource now; returns seconds spent per stage.
+
+        With `michelin=False` the Michelin retriever, which may have to build
+        its database on a fresh checkout, is left for the first Michelin query.
+        """
+        timings = {}
+
+        def stage(name, build):
+            start = time.perf_counter()
+            build()
+            timings[name] = time.perf_counter() - start
+
+        stage("services", lambda: self.services)
+        stage("router", lambda: self.router)
+        stage("graph", lambda: self.graph)
+        if self._default_graph:
+            from src.utils import long_term_memory
+
+            stage("memory", long_term_memory.warm_up)
+        if michelin and self._restaurant_chain is not None:
+            stage("michelin", self._restaurant_chain.warm_up)
+        return timings
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ChatbotEngine:
+    """Return the process-wide engine, creating it on first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ChatbotEngine()
+    return _engine
@@ -1,10 +1,14 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from src.services.llm_gateway import get_chat_model
 
 class ChatbotService:
-    def __init__(self, system_message: str):
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo")
+    def __init__(self, system_message: str, service_type: str = None, cache=None):
+        self.llm = get_chat_model("gpt-3.5-turbo")
+        self.system_message = system_message
+        self.service_type = service_type or "default"
+        # Optional shared ResponseCache; answers depend only on (system message, message)
+        self.cache = cache
         self.prompt_template = self._create_prompt_template(system_message)
         self.chain = self._create_chain()
 
@@ -21,6 +25,66 @@ class ChatbotService:
             | StrOutputParser()
         )
 
+    def _cache_get(self, message: str):
+        if self.cache is None:
+            return None
+        return self.cache.get(self.service_type, self.system_message, message)
+
+    def _cache_put(self, message: str, response: str):
+        if self.cache is not None:
+            self.cache.put(self.service_type, self.system_message, message, response)
+
     def process_message(self, message: str) -> str:
-        response = self.chain.invoke({"message": message})
-        return response
\ No newline at end of file
+        response = self._cache_get(message)
+        if response is None:
+            response = self.chain.invoke({"message": message})
+            self._cache_put(message, response)
+        return response
+
+    async def aprocess_message(self, message: str) -> str:
+        response = self._cache_get(message)
+        if response is None:
+            response = await self.chain.ainvoke({"message": message})
+            self._cache_put(message, response)
+        return response
+
+    def stream_message(self, message: str):
+        response = self._cache_get(message)
+        if response is not None:
+            yield response
+            return
+
+        chunks = []
+        for chunk in self.chain.stream({"message": message}):
+            chunks.append(chunk)
+            yield chunk
+        self._cache_put(message, "".join(chunks))
+
+    async def astream_message(self, message: str):
+        response = self._cache_get(message)
+        if response is not None:
+            yield response
+            return
+
+        chunks = []
+        async for chunk in self.chain.astream({"message": message}):
+            chunks.append(chunk)
+            yield chunk
+        self._cache_put(message, "".join(chunks))
+
+    async def abatch_messages(self, messages, max_concurrency: int = None) -> list:
+        """Answers for many messages; cache misses run as one `.abatch` and
+        repeated messages are answered once. A failed message gets the
+        exception instead of an answer."""
+        responses = [self._cache_get(message) for message in messages]
+        missing = list(dict.fromkeys(message for message, response in zip(messages, responses) if response is None))
+        if missing:
+            answers = await self.chain.abatch([{"message": message} for message in missing],
+                                              config={"max_concurrency": max_concurrency}, return_exceptions=True)
+            answered = dict(zip(missing, answers))
+            for message, answer in answered.items():
+                if not isinstance(answer, Exception):
+                    self._cache_put(message, answer)
+            responses = [answered[message] if response is None else response
+                         for message, response in zip(messages, responses)]
+        return responses
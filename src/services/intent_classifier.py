@@ -0,0 +1,245 @@
+import re
+import math
+import time
+import asyncio
+import threading
+from collections import defaultdict
+
+# Keyword/regex rules for ChatbotRouter's service types. Each matching
+# pattern adds its weight to the label's score.
+ROUTE_RULES = {
+    "restaurant_recommendations": [
+        (r"\brestaurants?\b", 2.0),
+        (r"\bmichelin\b", 2.0),
+        (r"\b(eat|eating|dine|dining|dinner|lunch|brunch|breakfast)\b", 1.0),
+        (r"\b(food|cuisine|dish(es)?|meal|menu|tasting menu)\b", 1.0),
+        (r"\b(sushi|ramen|pizza|steak(house)?|bistro|cafe|bakery|tapas|dim sum|vegan|vegetarian|seafood)\b", 1.0),
+        (r"\bbib gourmand\b", 2.0),
+    ],
+    "itinerary_planning": [
+        (r"\bitinerar(y|ies)\b", 2.0),
+        (r"\b\d+[- ]?(day|night)s?\b", 1.0),
+        (r"\b(one|two|three|four|five|six|seven|ten)[- ](day|night|week)s?\b", 1.0),
+        (r"\bplan(ning)? (my|a|our|the) (trip|visit|vacation|holiday|route)\b", 2.0),
+        (r"\b(schedule|day by day|day trip|road trip|route)\b", 1.0),
+    ],
+    "tourist_attraction": [
+        (r"\b(tourist )?attractions?\b", 2.0),
+        (r"\b(sightseeing|landmarks?|monuments?|museums?|galleries|gallery)\b", 1.5),
+        (r"\bthings to (do|see)\b", 1.5),
+        (r"\b(must[- ]see|what to see|places to visit|worth visiting)\b", 1.5),
+        (r"\b(parks?|beach(es)?|castles?|cathedrals?|temples?|viewpoints?)\b", 0.5),
+    ],
+    "exploring_travel_ideas": [
+        (r"\bwhere (should|can|could) (i|we) (go|travel)\b", 2.0),
+        (r"\b(travel|trip|vacation|holiday|getaway) (ideas?|inspiration|suggestions?)\b", 2.0),
+        (r"\b(destinations?|honeymoon|getaway|bucket list)\b", 1.0),
+        (r"\b(inspire|inspiration|somewhere (new|warm|cheap))\b", 1.0),
+    ],
+    "others": [
+        (r"^\s*(hi|hello|hey|thanks|thank you|bye|goodbye)\b[\s!.]*$", 2.0),
+        (r"\b(weather|visa|passport|currency|exchange rate|time zone|plug|adapter)\b", 1.0),
+    ],
+}
+
+# Rules for RestaurantChain's 'general' vs 'michelin' decision
+RESTAURANT_TYPE_RULES = {
+    "michelin": [
+        (r"\bmichelin\b", 2.0),
+        (r"\bbib gourmand\b", 2.0),
+        (r"\b(one|two|three|1|2|3)[- ]stars?\b", 1.5),
+        (r"\bgreen star\b", 1.5),
+        (r"\b(fine dining|tasting menu|gastronomic|upscale|high[- ]end)\b", 1.0),
+    ],
+    "general": [
+        (r"\b(cheap|budget|casual|fast food|takeout|take-out|food truck|quick bite|late night)\b", 1.5),
+        (r"\b(family[- ]friendly|kid[- ]friendly)\b", 1.0),
+    ],
+}
+
+
+class KeywordIntentClassifier:
+    """Scores labels by weighted regex matches.
+
+    Confidence is the winning score over the total score plus one. A single
+    weight-1 hit scores exactly 0.5 and hits spread across labels score less,
+    so neither clears the usual threshold, which a tier must exceed.
+    """
+
+    name = "keyword"
+
+    def __init__(self, rules: dict):
+        self.rules = {
+            label: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in patterns]
+            for label, patterns in rules.items()
+        }
+
+    def classify(self, message: str):
+        scores = defaultdict(float)
+        for label, patterns in self.rules.items():
+            for pattern, weight in patterns:
+                if pattern.search(message):
+                    scores[label] += weight
+
+        if not scores:
+            return None, 0.0
+        label = max(scores, key=scores.get)
+        return label, scores[label] / (sum(scores.values()) + 1.0)
+
+
+class CentroidIntentClassifier:
+    """Nearest-centroid match on embeddings of labelled example utterances.
+
+    Example embeddings are computed once, on first use, and averaged per label.
+    Confidence is the cosine margin between the best and second-best centroid
+    divided by `margin_scale`, capped at 1.
+    """
+
+    name = "centroid"
+
+    def __init__(self, embeddings, examples: dict, margin_scale: float = 0.1):
+        self.embeddings = embeddings
+        self.examples = examples
+        self.margin_scale = margin_scale
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def _get_centroids(self):
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    centroids = {}
+                    for label, utterances in self.examples.items():
+                        vectors = [self._normalize(v) for v in self.embeddings.embed_documents(list(utterances))]
+                        mean = [sum(column) / len(vectors) for column in zip(*vectors)]
+                        centroids[label] = self._normalize(mean)
+                    self._centroids = centroids
+        return self._centroids
+
+    def classify(self, message: str):
+        centroids = self._get_centroids()
+        query = self._normalize(self.embeddings.embed_query(message))
+        similarities = sorted(
+            ((sum(q * c for q, c in zip(query, centroid)), label) for label, centroid in centroids.items()),
+            reverse=True,
+        )
+        best, label = similarities[0]
+        second = similarities[1][0] if len(similarities) > 1 else -1.0
+        return label, min((best - second) / self.margin_scale, 1.0)
+
+
+class RouterStats:
+    """Thread-safe per-tier hit and latency counters for a tiered router."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hits = defaultdict(int)
+        self.attempts = defaultdict(int)
+        self.latency_s = defaultdict(float)
+
+    def record(self, tier: str, latency_s: float, hit: bool):
+        # Exactly one tier hits per classified message
+        with self._lock:
+            self.attempts[tier] += 1
+            if hit:
+                self.calls += 1
+                self.hits[tier] += 1
+            self.latency_s[tier] += latency_s
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "hits": dict(self.hits),
+                "hit_rate": {tier: count / calls for tier, count in self.hits.items()},
+                "mean_latency_s": {tier: self.latency_s[tier] / self.attempts[tier] for tier in self.attempts},
+            }
+
+
+class TieredClassifier:
+    """Tries cheap local classifiers in order and falls back to `fallback`.
+
+    `fallback` is a callable taking the message and returning a label (an LLM
+    call in practice), `afallback` its coroutine counterpart. A local tier wins
+    when its confidence exceeds `confidence_threshold`.
+
+    `abatch_fallback(messages, max_concurrency)` labels many messages in one
+    call for `aclassify_batch`, returning a label or an exception for each.
+    Without it, `afallback` is awaited per message.
+    """
+
+    def __init__(self, classifiers, fallback, afallback=None, confidence_threshold: float = 0.5,
+                 stats: RouterStats = None, abatch_fallback=None):
+        self.classifiers = list(classifiers)
+        self.fallback = fallback
+        self.afallback = afallback
+        self.abatch_fallback = abatch_fallback
+        self.confidence_threshold = confidence_threshold
+        self.stats = stats or RouterStats()
+
+    def _classify_locally(self, message: str):
+        for classifier in self.classifiers:
+            start = time.perf_counter()
+            label, confidence = classifier.classify(message)
+            hit = label is not None and confidence > self.confidence_threshold
+            self.stats.record(classifier.name, time.perf_counter() - start, hit)
+            if hit:
+                return label, classifier.name
+        return None, None
+
+    def classify_locally(self, message: str):
+        return self._classify_locally(message)[0]
+
+    def classify_with_tier(self, message: str):
+        """(label, name of the tier that produced it), the fallback being "llm"."""
+        label, tier = self._classify_locally(message)
+        if label is not None:
+            return label, tier
+
+        start = time.perf_counter()
+        label = self.fallback(message)
+        self.stats.record("llm", time.perf_counter() - start, True)
+        return label, "llm"
+
+    def classify(self, message: str) -> str:
+        return self.classify_with_tier(message)[0]
+
+    async def aclassify(self, message: str) -> str:
+        label = self.classify_locally(message)
+        if label is not None:
+            return label
+
+        start = time.perf_counter()
+        label = await self.afallback(message)
+        self.stats.record("llm", time.perf_counter() - start, True)
+        return label
+
+    async def aclassify_batch(self, messages, max_concurrency: int = None) -> list:
+        """Labels for `messages`, with every local miss sent to the fallback at once.
+
+        A message whose fallback failed gets the exception instead of a label.
+        """
+        labels = [self.classify_locally(message) for message in messages]
+        missing = [i for i, label in enumerate(labels) if label is None]
+        if not missing:
+            return labels
+
+        start = time.perf_counter()
+        if self.abatch_fallback is not None:
+            found = await self.abatch_fallback([messages[i] for i in missing], max_concurrency)
+        else:
+            found = await asyncio.gather(*(self.afallback(messages[i]) for i in missing), return_exceptions=True)
+        # The batch's wall time, shared by its messages
+        latency_s = (time.perf_counter() - start) / len(missing)
+        for i, label in zip(missing, found):
+            labels[i] = label
+            if not isinstance(label, Exception):
+                self.stats.record("llm", latency_s, True)
+        return labels
@@ -0,0 +1,456 @@
+import os
+import re
+import json
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+import contextlib
+import contextvars
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+import httpx
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+# Connection pool of each model's clients
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+EMBEDDINGS_MODEL = "text-embedding-ada-002"
+
+
+def _env_limits(name: str, rpm: int, tpm: int) -> dict:
+    # e.g. LLM_RPM_GPT_4O=5000 LLM_TPM_GPT_4O=800000; the arguments are the fallbacks
+    suffix = re.sub(r"[^A-Z0-9]+", "_", name.upper())
+    return {"rpm": float(os.getenv(f"LLM_RPM_{suffix}", rpm)), "tpm": float(os.getenv(f"LLM_TPM_{suffix}", tpm))}
+
+
+# Requests and tokens per minute of the account's tier; also settable with configure_model_limits()
+MODEL_LIMITS = {
+    "gpt-3.5-turbo": _env_limits("gpt-3.5-turbo", 3500, 160000),
+    "gpt-4o": _env_limits("gpt-4o", 500, 30000),
+    EMBEDDINGS_MODEL: _env_limits(EMBEDDINGS_MODEL, 3000, 1000000),
+}
+# Models not listed above; LLM_RPM_DEFAULT and LLM_TPM_DEFAULT
+DEFAULT_LIMITS = _env_limits("default", 500, 30000)
+# e.g. LLM_MODEL_LIMITS='{"gpt-4o": {"rpm": 5000, "tpm": 800000}}'
+for _model, _limits in json.loads(os.getenv("LLM_MODEL_LIMITS", "{}")).items():
+    MODEL_LIMITS[_model] = dict(MODEL_LIMITS.get(_model, DEFAULT_LIMITS), **_limits)
+# Completion tokens assumed for a request that does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+# Longest sleep between scheduler checks
+POLL_S = 0.05
+
+INTERACTIVE = 0
+BACKGROUND = 1
+_priority = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def background_priority():
+    """Run the enclosed LLM calls behind interactive ones, e.g. memory upkeep."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now) -> float:
+        self._refill(now)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount):
+        self.tokens -= amount
+
+
+class ModelScheduler:
+    """Request and token buckets of one model, served in priority order.
+
+    Waiters queue by (priority, arrival); only the head of the queue may take
+    capacity, so background work never overtakes an interactive request. A
+    429 response pauses the whole model for the server's retry delay.
+    """
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+        self.granted = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.max_queue_depth = 0
+        self.wait_s = [0.0, 0.0]
+        self.waits = [0, 0]
+        self.max_wait_s = 0.0
+
+    def configure(self, rpm: float = None, tpm: float = None):
+        with self._lock:
+            if rpm is not None:
+                self.requests = TokenBucket(rpm)
+            if tpm is not None:
+                self.tokens = TokenBucket(tpm)
+
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._seq))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        return ticket
+
+    def _dequeue(self, ticket):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _try_acquire(self, ticket, tokens) -> float:
+        """0 when granted, otherwise how long to wait before asking again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self._queue[0] != ticket:
+                return POLL_S
+            tokens = min(tokens, self.tokens.capacity)
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            heapq.heappop(self._queue)
+            self.granted += 1
+            return 0.0
+
+    def _record_wait(self, priority, waited):
+        with self._lock:
+            self.wait_s[priority] += waited
+            self.waits[priority] += 1
+            self.max_wait_s = max(self.max_wait_s, waited)
+
+    def acquire(self, tokens: int):
+        priority = _priority.get()
+        ticket = self._enqueue(priority)
+        start = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    break
+                time.sleep(min(wait, POLL_S))
+        finally:
+            self._dequeue(ticket)
+        self._record_wait(priority, time.monotonic() - start)
+
+    async def aacquire(self, tokens: int):
+        priority = _priority.get()
+        ticket = self._enqueue(priority)
+        start = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    break
+                await asyncio.sleep(min(wait, POLL_S))
+        finally:
+            # Also drops the ticket of a cancelled waiter
+            self._dequeue(ticket)
+        self._record_wait(priority, time.monotonic() - start)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def backoff(self, delay_s: float):
+        with self._lock:
+            self.rate_limited += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay_s)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "granted": self.granted,
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "mean_wait_ms": {
+                    name: 1000 * self.wait_s[priority] / self.waits[priority] if self.waits[priority] else 0.0
+                    for name, priority in (("interactive", INTERACTIVE), ("background", BACKGROUND))
+                },
+                "max_wait_ms": 1000 * self.max_wait_s,
+            }
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """Prompt plus expected completion tokens of an OpenAI request, roughly."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return DEFAULT_COMPLETION_TOKENS
+    if "input" in body:
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        return sum(len(item) if isinstance(item, list) else len(item) // 4 + 1 for item in inputs)
+    prompt = sum(len(json.dumps(message.get("content") or "")) // 4 + 4 for message in body.get("messages", []))
+    return prompt + (body.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def retry_delay(attempt: int, response: httpx.Response = None, base_delay_s: float = 0.5, max_delay_s: float = 30.0):
+    """The server's Retry-After if given, otherwise exponential backoff with full jitter."""
+    if response is not None:
+        for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+            try:
+                return min(float(response.headers[header]) * scale, max_delay_s)
+            except (KeyError, ValueError):
+                pass
+    return random.uniform(0, min(max_delay_s, base_delay_s * 2 ** attempt))
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    def __init__(self, scheduler: ModelScheduler, transport: httpx.BaseTransport, max_retries: int = MAX_RETRIES):
+        self.scheduler = scheduler
+        self.transport = transport
+        self.max_retries = max_retries
+
+    def handle_request(self, request):
+        tokens = estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(tokens)
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                self.scheduler.record_retry()
+                time.sleep(retry_delay(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            self.scheduler.record_retry()
+            delay = retry_delay(attempt, response)
+            response.close()
+            if response.status_code == 429:
+                self.scheduler.backoff(delay)
+            else:
+                time.sleep(delay)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, scheduler: ModelScheduler, transport: httpx.AsyncBaseTransport, max_retries: int = MAX_RETRIES):
+        self.scheduler = scheduler
+        self.transport = transport
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request):
+        tokens = estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.aacquire(tokens)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                self.scheduler.record_retry()
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            self.scheduler.record_retry()
+            delay = retry_delay(attempt, response)
+            await response.aclose()
+            if response.status_code == 429:
+                self.scheduler.backoff(delay)
+            else:
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_schedulers = {}
+_clients = {}
+_model_factories = {}
+# Runs coroutines for sync callers; see run_sync()
+_loop = None
+_lock = threading.Lock()
+
+
+def get_scheduler(model: str) -> ModelScheduler:
+    with _lock:
+        scheduler = _schedulers.get(model)
+        if scheduler is None:
+            limits = MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+            scheduler = _schedulers[model] = ModelScheduler(model, limits["rpm"], limits["tpm"])
+        return scheduler
+
+
+def configure_model_limits(model: str, rpm: float = None, tpm: float = None):
+    """Set a model's requests/min and tokens/min, also for clients already built."""
+    with _lock:
+        MODEL_LIMITS[model] = dict(MODEL_LIMITS.get(model, DEFAULT_LIMITS))
+        if rpm is not None:
+            MODEL_LIMITS[model]["rpm"] = rpm
+        if tpm is not None:
+            MODEL_LIMITS[model]["tpm"] = tpm
+    get_scheduler(model).configure(rpm=rpm, tpm=tpm)
+
+
+def get_http_clients(model: str):
+    """The (sync, async) httpx clients of `model`, created on first call.
+
+    Every ChatOpenAI or OpenAIEmbeddings built by this module for the same
+    model shares these clients, their connection pool and their scheduler.
+    """
+    scheduler = get_scheduler(model)
+    with _lock:
+        clients = _clients.get(model)
+        if clients is None:
+            clients = _clients[model] = (
+                httpx.Client(
+                    transport=RateLimitedTransport(scheduler, httpx.HTTPTransport(limits=HTTP_LIMITS)),
+                    timeout=HTTP_TIMEOUT,
+                ),
+                httpx.AsyncClient(
+                    transport=AsyncRateLimitedTransport(scheduler, httpx.AsyncHTTPTransport(limits=HTTP_LIMITS)),
+                    timeout=HTTP_TIMEOUT,
+                ),
+            )
+        return clients
+
+
+def set_model_factories(chat=None, embeddings=None, tokenizer=None):
+    """Build models with `chat(model, **kwargs)` and `embeddings(model, **kwargs)`,
+    and tokenizers with `tokenizer(model)`.
+
+    For local stand-ins, e.g. in offline benchmarks; call it before the
+    first model is created. None restores the OpenAI models and tiktoken.
+    """
+    _model_factories["chat"] = chat
+    _model_factories["embeddings"] = embeddings
+    _model_factories["tokenizer"] = tokenizer
+
+
+def get_chat_model(model: str = "gpt-3.5-turbo", **kwargs) -> "ChatOpenAI":
+    """A ChatOpenAI on the model's shared, rate-limited clients.
+
+    Retries happen in the gateway, which knows about the other callers, so
+    the OpenAI SDK's own retries are off.
+    """
+    from src.utils.tracing_callbacks import get_tracing_handler
+
+    # Every call becomes an `llm` span with its token counts and cost;
+    # streamed responses report their usage in the last chunk
+    kwargs.setdefault("callbacks", [get_tracing_handler()])
+    if _model_factories.get("chat") is not None:
+        return _model_factories["chat"](model, **kwargs)
+
+    # Imported on first use; langchain_openai and the openai SDK are slow to import
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = get_http_clients(model)
+    kwargs.setdefault("max_retries", 0)
+    kwargs.setdefault("stream_usage", True)
+    return ChatOpenAI(model=model, http_client=http_client, http_async_client=http_async_client, **kwargs)
+
+
+def get_embeddings_model(model: str = EMBEDDINGS_MODEL, **kwargs) -> "OpenAIEmbeddings":
+    if _model_factories.get("embeddings") is not None:
+        return _model_factories["embeddings"](model, **kwargs)
+
+    from langchain_openai import OpenAIEmbeddings
+
+    http_client, http_async_client = get_http_clients(model)
+    kwargs.setdefault("max_retries", 0)
+    return OpenAIEmbeddings(model=model, http_client=http_client, http_async_client=http_async_client, **kwargs)
+
+
+def get_tokenizer(model: str):
+    """The model's tiktoken encoding; tiktoken downloads its BPE file on first use and caches it."""
+    if _model_factories.get("tokenizer") is not None:
+        return _model_factories["tokenizer"](model)
+
+    import tiktoken
+
+    return tiktoken.encoding_for_model(model)
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-gateway-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(coroutine):
+    """Run `coroutine` to completion from sync code, on one persistent event loop thread.
+
+    The shared async clients' pooled connections belong to the loop that
+    opened them, so sync callers must not give each call its own loop, as
+    `asyncio.run` does. The coroutine runs in a copy of the caller's context.
+    Do not call this from the gateway's own loop thread.
+    """
+    loop = _get_loop()
+    context = contextvars.copy_context()
+    result = Future()
+
+    def finish(task):
+        if task.cancelled():
+            result.set_exception(asyncio.CancelledError())
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    def start():
+        loop.create_task(coroutine, context=context).add_done_callback(finish)
+
+    loop.call_soon_threadsafe(start)
+    return result.result()
+
+
+def gateway_metrics() -> dict:
+    """Queue depth, wait times and rate-limit counters per model."""
+    with _lock:
+        schedulers = dict(_schedulers)
+    return {model: scheduler.metrics() for model, scheduler in schedulers.items()}
+
+
+async def aclose():
+    """Close the shared clients, e.g. at server shutdown."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for http_client, http_async_client in clients:
+        await http_async_client.aclose()
+        http_client.close()
@@ -1,8 +1,10 @@
 from typing import Literal
 from operator import itemgetter
 from typing_extensions import TypedDict
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from src.services.llm_gateway import get_chat_model
+from src.services.intent_classifier import ROUTE_RULES, KeywordIntentClassifier, TieredClassifier
+from src.utils.tracing import span
 
 
 class RouteMessage(TypedDict):
@@ -15,8 +17,8 @@ class RouteMessage(TypedDict):
         "others"
     ]
 class ChatbotRouter:
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo")
+    def __init__(self, local_classifiers=None, confidence_threshold: float = 0.5):
+        self.llm = get_chat_model("gpt-3.5-turbo")
         self.route_system = "Route the user's message to either 'tourist_attraction', 'itinerary_planning', 'restaurant_recommendations', 'exploring_travel_ideas', or 'others' if it doesn't fit into the previous categories."
         self.route_prompt = ChatPromptTemplate.from_messages([
             ("system", self.route_system),
@@ -24,5 +26,49 @@ class ChatbotRouter:
         ])
         self.route_chain = self.route_prompt | self.llm.with_structured_output(RouteMessage) | itemgetter("service_type")
 
-    def route_message(self, message: str) -> str:
+        # Cheap local tiers first; the LLM route chain only for low-confidence messages
+        if local_classifiers is None:
+            local_classifiers = [KeywordIntentClassifier(ROUTE_RULES)]
+        self.classifier = TieredClassifier(
+            local_classifiers,
+            fallback=self._llm_route,
+            afallback=self._allm_route,
+            confidence_threshold=confidence_threshold,
+            abatch_fallback=self._allm_route_batch,
+        )
+
+    @property
+    def stats(self):
+        return self.classifier.stats
+
+    def _llm_route(self, message: str) -> str:
         return self.route_chain.invoke({"message": message})
+
+    async def _allm_route(self, message: str) -> str:
+        return await self.route_chain.ainvoke({"message": message})
+
+    async def _allm_route_batch(self, messages, max_concurrency=None) -> list:
+        return await self.route_chain.abatch([{"message": message} for message in messages],
+                                             config={"max_concurrency": max_concurrency}, return_exceptions=True)
+
+    def route_message(self, message: str) -> str:
+        with span("router") as route_span:
+            service_type = self.classifier.classify(message)
+            route_span.set(service_type=service_type)
+        return service_type
+
+    async def aroute_message(self, message: str) -> str:
+        with span("router") as route_span:
+            service_type = await self.classifier.aclassify(message)
+            route_span.set(service_type=service_type)
+        return service_type
+
+    async def aroute_messages(self, messages, max_concurrency: int = None) -> list:
+        """Service types for many messages; LLM-routed ones share one batch.
+
+        A message that could not be routed gets the exception instead.
+        """
+        with span("router.batch", messages=len(messages)) as route_span:
+            service_types = await self.classifier.aclassify_batch(messages, max_concurrency)
+            route_span.set(errors=sum(isinstance(service_type, Exception) for service_type in service_types))
+        return service_types
@@ -0,0 +1,66 @@
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are at be by for from in is it of on or the to with me my i you we our can what which "
+    "where some any good best find recommend restaurant restaurants place places".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index.
+
+    Suited to exact names, streets and dishes, which embeddings tend to
+    blur. Postings map each term to per-document term frequencies, so a
+    query only touches the documents sharing one of its terms.
+    """
+
+    def __init__(self, documents: Dict[str, str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        for doc_id, text in documents.items():
+            tokens = tokenize(text)
+            self.lengths[doc_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                self.postings[term][doc_id] = count
+        self.avg_length = sum(self.lengths.values()) / len(self.lengths) if self.lengths else 0.0
+        n = len(self.lengths)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def search(self, query: str, k: int = 10, candidates: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Top `k` (doc_id, score) pairs, optionally restricted to `candidates`."""
+        allowed = set(candidates) if candidates is not None else None
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term].items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists; each id scores the sum of 1 / (k + rank)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
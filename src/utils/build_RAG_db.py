@@ -1,52 +1,318 @@
 import os
+import csv
+import time
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders.csv_loader import CSVLoader
+from langchain_core.documents import Document
+from src.utils.docstore import SQLiteDocStore
+from src.utils.embedding_service import EmbeddingService
+from src.services.llm_gateway import background_priority
 
-def build_michelin_database():
+PERSIST_DIRECTORY = "data/embeddings_chroma"
+# Child chunks live in Chroma, whole restaurant rows (parents) in the docstore
+COLLECTION_NAME = "michelin_guide_restaurant_chunks"
+# Whole rows embedded as single vectors, from before the parent/child layout; dropped by the next build
+LEGACY_COLLECTION_NAME = "michelin_guide_restaurants"
+DOCSTORE_FILENAME = "michelin_parents.sqlite3"
+CHILD_CHUNK_SIZE = 200
+# Metadata key linking a child chunk to its parent, as ParentDocumentRetriever expects
+ID_KEY = "doc_id"
+# Part of every row's content hash; bump it when the stored metadata changes
+SCHEMA_VERSION = "2"
+MICHELIN_CSV_PATH = "data/dataset/canada_michelin_guide_restaurants_Aug2024.csv"
+FIELDNAMES = ['Name', 'Address', 'Location', 'Price', 'Cuisine',
+              'Longitude', 'Latitude', 'PhoneNumber', 'Url',
+              'WebsiteUrl', 'Award', 'GreenStar',
+              'FacilitiesAndServices', 'Description']
+
+
+class IngestManifest:
+    """Content hash of every indexed row, so re-runs skip unchanged rows.
+
+    A row is recorded only after its embeddings were written, which makes an
+    interrupted run resumable. The schema version is recorded before the
+    first row, so a collection whose manifest has none predates the manifest.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows (row_id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, updated_at REAL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def schema_version(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        return row[0] if row else None
+
+    def set_schema_version(self, version: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (version,))
+        self._conn.commit()
+
+    def hashes(self) -> dict:
+        return dict(self._conn.execute("SELECT row_id, content_hash FROM rows"))
+
+    def mark(self, entries):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO rows (row_id, content_hash, updated_at) VALUES (?, ?, ?)",
+            [(row_id, content_hash, now) for row_id, content_hash in entries],
+        )
+        self._conn.commit()
+
+    def remove(self, row_ids):
+        self._conn.executemany("DELETE FROM rows WHERE row_id = ?", [(row_id,) for row_id in row_ids])
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def _parse_float(value: str):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def price_level(price: str) -> int:
+    """Number of currency symbols in a Price value such as '$$$', 0 if unknown."""
+    price = (price or "").strip()
+    if price and len(set(price)) == 1 and not price[0].isalnum():
+        return len(price)
+    return 0
+
+
+def row_metadata(row: dict, index: int) -> dict:
+    """Typed, filterable fields of a row. Chroma rejects None values, so absent fields are omitted."""
+    value = lambda field: (row.get(field) or "").strip()
+    metadata = {
+        "source": row.get("Name") or "",
+        "row": index,
+        "name": value("Name"),
+        "location": value("Location"),
+        "cuisine": value("Cuisine"),
+        "award": value("Award"),
+        "price_level": price_level(value("Price")),
+        "green_star": value("GreenStar").lower() in ("1", "true", "yes"),
+    }
+    longitude, latitude = _parse_float(value("Longitude")), _parse_float(value("Latitude"))
+    if longitude is not None and latitude is not None:
+        metadata["longitude"] = longitude
+        metadata["latitude"] = latitude
+    return metadata
+
+
+def row_to_document(row: dict, index: int) -> Document:
+    # Same page layout as CSVLoader: one "column: value" line per field
+    content = "\n".join(f"{field}: {(row.get(field) or '').strip()}" for field in FIELDNAMES)
+    return Document(page_content=content, metadata=row_metadata(row, index))
+
+
+def row_key(row: dict) -> str:
+    """Stable identity of a restaurant across CSV revisions."""
+    key = f"{(row.get('Name') or '').strip()}|{(row.get('Address') or '').strip()}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def iter_csv_chunks(path: str, chunk_size: int):
+    """Yield lists of (row_id, content_hash, Document), `chunk_size` rows at a time."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f, fieldnames=FIELDNAMES, delimiter=",", quotechar='"')
+        chunk = []
+        for index, row in enumerate(reader):
+            if row.get("Name") == "Name":
+                # Header line
+                continue
+            document = row_to_document(row, index)
+            content_hash = hashlib.sha256(f"{SCHEMA_VERSION}\n{document.page_content}".encode("utf-8")).hexdigest()
+            chunk.append((row_key(row), content_hash, document))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def docstore_path(persist_directory: str = PERSIST_DIRECTORY) -> str:
+    return os.path.join(persist_directory, DOCSTORE_FILENAME)
+
+
+def split_parent(child_splitter, row_id: str, document: Document):
+    """Split a parent row into child chunks tagged with the parent id."""
+    children = child_splitter.split_documents([document])
+    for child in children:
+        child.metadata[ID_KEY] = row_id
+    return [f"{row_id}:{i}" for i in range(len(children))], children
+
+
+def embed_in_background(embeddings, texts):
+    # Ingest yields to interactive requests in the shared LLM gateway, whose
+    # transport also retries rate-limited and failed requests
+    with background_priority():
+        return embeddings.embed_documents(texts)
+
+
+def drop_legacy_collection(vectorstore, persist_directory: str) -> bool:
+    """Delete the pre-chunking collection and its manifest, if this directory still has them."""
+    client = vectorstore._client
+    if LEGACY_COLLECTION_NAME not in {collection.name for collection in client.list_collections()}:
+        return False
+    client.delete_collection(LEGACY_COLLECTION_NAME)
+    legacy_manifest = os.path.join(persist_directory, f"{LEGACY_COLLECTION_NAME}_manifest.sqlite3")
+    if os.path.exists(legacy_manifest):
+        os.remove(legacy_manifest)
+    print(f"Deleted the unused {LEGACY_COLLECTION_NAME!r} collection; restaurants are now in {COLLECTION_NAME!r}")
+    return True
+
+
+def build_michelin_database(csv_path: str = MICHELIN_CSV_PATH, persist_directory: str = PERSIST_DIRECTORY,
+                            embeddings=None, batch_size: int = 64, max_workers: int = 4, chunk_size: int = 1000,
+                            delete_missing: bool = True) -> dict:
     """
     Build and persist the Michelin guide restaurant database.
-    This should be run once before starting the application.
+    This should be run once before starting the application; re-running it
+    only embeds rows that are new or changed since the last run.
+
+    Each CSV row is a parent document stored in a SQLite docstore; its
+    200-character child chunks are embedded into Chroma with a `doc_id`
+    pointing back at the parent, which is the layout ParentDocumentRetriever
+    reads at query time.
+
+    The CSV is streamed in chunks of `chunk_size` rows. Changed rows are
+    embedded in batches of `batch_size` rows on up to `max_workers` threads,
+    and each batch is written and recorded in the ingest manifest as soon as
+    it completes. Rows that disappeared from the CSV are deleted when
+    `delete_missing` is set. Failed embedding requests are retried by the
+    LLM gateway's transport only, not here as well.
+
+    The chunks used to live in the "michelin_guide_restaurants" collection,
+    one vector per row; a build deletes that collection if it finds it.
     """
     # Load environment variables
     load_dotenv()
-    
-    # Check if API key is set
-    if not os.getenv("OPENAI_API_KEY"):
-        raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in .env file.")
-
-    # Initialize embeddings
-    embeddings = OpenAIEmbeddings()
-    
+
+    if embeddings is None:
+        # Check if API key is set
+        if not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in .env file.")
+        # Uncached: document chunks would only evict the query vectors of the shared service
+        embeddings = EmbeddingService(cache=False)
+
+    # Imported here so that reading the constants above stays cheap
+    from langchain_chroma import Chroma
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     # Set up Chroma with persist_directory
-    persist_directory = "data/embeddings_chroma"
     vectorstore = Chroma(
-        collection_name="michelin_guide_restaurants",
+        collection_name=COLLECTION_NAME,
         embedding_function=embeddings,
         persist_directory=persist_directory
     )
+    drop_legacy_collection(vectorstore, persist_directory)
+    docstore = SQLiteDocStore(docstore_path(persist_directory))
+    manifest = IngestManifest(os.path.join(persist_directory, f"{COLLECTION_NAME}_manifest.sqlite3"))
+    child_splitter = RecursiveCharacterTextSplitter(chunk_size=CHILD_CHUNK_SIZE)
+    indexed = manifest.hashes()
+    version = manifest.schema_version()
+    if version is None and not indexed and vectorstore._collection.count():
+        # Built before the manifest existed, with random ids: start over
+        print("Existing collection has no ingest manifest; re-indexing it...")
+        vectorstore.delete(ids=vectorstore.get(include=[])["ids"])
+    elif version is not None and version != SCHEMA_VERSION:
+        # Every content hash includes the version, so each row is re-embedded and replaced
+        print(f"Ingest schema changed from {version} to {SCHEMA_VERSION}; re-indexing every row...")
+    # Recorded before any row, so a crash before the first batch is not mistaken for a legacy build
+    manifest.set_schema_version(SCHEMA_VERSION)
+    seen = set()
+    stats = {"rows": 0, "skipped": 0, "upserted": 0, "deleted": 0, "batches": 0}
+    start = time.perf_counter()
+
+    print(f"Streaming documents from {csv_path}...")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for chunk in iter_csv_chunks(csv_path, chunk_size):
+            stats["rows"] += len(chunk)
+            pending = []
+            for row_id, content_hash, document in chunk:
+                if row_id in seen:
+                    # Duplicate restaurant line; the first occurrence wins
+                    continue
+                seen.add(row_id)
+                if indexed.get(row_id) == content_hash:
+                    stats["skipped"] += 1
+                else:
+                    pending.append((row_id, content_hash, document))
+
+            batches = []
+            for i in range(0, len(pending), batch_size):
+                rows = pending[i:i + batch_size]
+                child_ids, children = [], []
+                for row_id, _, document in rows:
+                    ids, chunks = split_parent(child_splitter, row_id, document)
+                    child_ids.extend(ids)
+                    children.extend(chunks)
+                batches.append((rows, child_ids, children))
+
+            futures = {
+                pool.submit(embed_in_background, embeddings, [child.page_content for child in batch[2]]): batch
+                for batch in batches
+            }
+            # Embeddings run in the pool; Chroma, the docstore and the manifest are written from this thread only
+            for future in as_completed(futures):
+                rows, child_ids, children = futures[future]
+                changed = [row_id for row_id, _, _ in rows if row_id in indexed]
+                if changed:
+                    # A changed row may now split into fewer chunks
+                    vectorstore._collection.delete(where={ID_KEY: {"$in": changed}})
+                vectorstore._collection.upsert(
+                    ids=child_ids,
+                    embeddings=future.result(),
+                    metadatas=[child.metadata for child in children],
+                    documents=[child.page_content for child in children],
+                )
+                docstore.mset([(row_id, document) for row_id, _, document in rows])
+                manifest.mark([(row_id, content_hash) for row_id, content_hash, _ in rows])
+                stats["upserted"] += len(rows)
+                stats["batches"] += 1
+            print(f"  {stats['rows']} rows read, {stats['upserted']} upserted, {stats['skipped']} unchanged")
+
+    missing = [row_id for row_id in indexed if row_id not in seen]
+    if delete_missing and missing:
+        vectorstore._collection.delete(where={ID_KEY: {"$in": missing}})
+        docstore.mdelete(missing)
+        manifest.remove(missing)
+        stats["deleted"] = len(missing)
+    manifest.close()
+    docstore.close()
+
+    stats["elapsed_s"] = time.perf_counter() - start
+    print(f"Database built successfully and stored in {persist_directory} "
+          f"({stats['upserted']} upserted, {stats['skipped']} unchanged, {stats['deleted']} deleted)")
+    print(f"You can find the SQLite database at {persist_directory}/chroma.sqlite3")
+    print(f"Parent documents are stored at {docstore_path(persist_directory)}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally update the Michelin guide vector index.")
+    parser.add_argument("--csv", default=MICHELIN_CSV_PATH)
+    parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--keep-missing", action="store_true", help="Do not delete rows that left the CSV.")
+    args = parser.parse_args()
 
-    # Load and store data
-    michelin_guide_restaurants_file_path = "data/dataset/canada_michelin_guide_restaurants_Aug2024.csv"
-    loader = CSVLoader(
-        file_path=michelin_guide_restaurants_file_path,
-        source_column='Name',
-        csv_args={
-            "delimiter": ",",
-            "quotechar": '"',
-            "fieldnames": ['Name', 'Address', 'Location', 'Price', 'Cuisine', 
-                          'Longitude', 'Latitude', 'PhoneNumber', 'Url', 
-                          'WebsiteUrl', 'Award', 'GreenStar', 
-                          'FacilitiesAndServices', 'Description']
-        },
+    build_michelin_database(
+        csv_path=args.csv,
+        persist_directory=args.persist_directory,
+        batch_size=args.batch_size,
+        max_workers=args.max_workers,
+        chunk_size=args.chunk_size,
+        delete_missing=not args.keep_missing,
     )
-    
-    print("Loading documents from CSV...")
-    documents = loader.load()
-    
-    print("Adding documents to Chroma...")
-    vectorstore.add_documents(documents)
-    
-    print(f"Database built successfully and stored in {persist_directory}")
-    print(f"You can find the SQLite database at {persist_directory}/chroma.sqlite3")
\ No newline at end of file
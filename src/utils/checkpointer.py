@@ -0,0 +1,206 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+
+class BoundedSqliteSaver(MemorySaver):
+    """Checkpointer that persists to SQLite and keeps memory bounded.
+
+    `MemorySaver`'s storage is used as a hot cache of recently active threads:
+    a thread is loaded from SQLite on first access and dropped from memory
+    once more than `max_threads_in_memory` threads are cached or it has been
+    idle for `idle_ttl_s`. Only the newest `max_checkpoints_per_thread`
+    checkpoints (and their pending writes) of each thread are kept, both in
+    memory and on disk.
+    """
+
+    def __init__(self, path: str = "data/checkpoints.sqlite3", max_checkpoints_per_thread: int = 10,
+                 max_threads_in_memory: int = 1000, idle_ttl_s: float = 1800.0, *, serde=None):
+        super().__init__(serde=serde)
+        # The latest checkpoint needs its parent to rebuild pending sends
+        self.max_checkpoints_per_thread = max(max_checkpoints_per_thread, 2)
+        self.max_threads_in_memory = max_threads_in_memory
+        self.idle_ttl_s = idle_ttl_s
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " thread_id TEXT NOT NULL,"
+            " checkpoint_ns TEXT NOT NULL DEFAULT '',"
+            " checkpoint_id TEXT NOT NULL,"
+            " parent_checkpoint_id TEXT,"
+            " type TEXT,"
+            " checkpoint BLOB,"
+            " metadata_type TEXT,"
+            " metadata BLOB,"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            " thread_id TEXT NOT NULL,"
+            " checkpoint_ns TEXT NOT NULL DEFAULT '',"
+            " checkpoint_id TEXT NOT NULL,"
+            " task_id TEXT NOT NULL,"
+            " idx INTEGER NOT NULL,"
+            " channel TEXT NOT NULL,"
+            " type TEXT,"
+            " value BLOB,"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+        )
+        self._conn.commit()
+
+        # thread_id -> last access time, least recently used first
+        self._active = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _touch(self, thread_id: str):
+        now = time.monotonic()
+        if thread_id in self._active:
+            self._active.move_to_end(thread_id)
+        else:
+            self._hydrate(thread_id)
+        self._active[thread_id] = now
+
+        while self._active:
+            oldest, last_used = next(iter(self._active.items()))
+            if len(self._active) <= self.max_threads_in_memory and now - last_used < self.idle_ttl_s:
+                break
+            self._evict(oldest)
+
+    def _hydrate(self, thread_id: str):
+        rows = self._conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+            " FROM checkpoints WHERE thread_id = ?",
+            (thread_id,),
+        ).fetchall()
+        for ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata in rows:
+            self.storage[thread_id][ns][checkpoint_id] = ((type_, checkpoint), (metadata_type, metadata), parent_id)
+
+        rows = self._conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value FROM writes WHERE thread_id = ?",
+            (thread_id,),
+        ).fetchall()
+        for ns, checkpoint_id, task_id, idx, channel, type_, value in rows:
+            self.writes[(thread_id, ns, checkpoint_id)][(task_id, idx)] = (task_id, channel, (type_, value))
+
+    def _evict(self, thread_id: str):
+        self._active.pop(thread_id, None)
+        self.storage.pop(thread_id, None)
+        for key in [key for key in self.writes if key[0] == thread_id]:
+            del self.writes[key]
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+        stale = sorted(checkpoints)[:-self.max_checkpoints_per_thread]
+        for checkpoint_id in stale:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        cutoff = stale[-1]
+        for table in ("checkpoints", "writes"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id <= ?",
+                (thread_id, checkpoint_ns, cutoff),
+            )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config:
+            thread_ids = [config["configurable"]["thread_id"]]
+        else:
+            with self._lock:
+                thread_ids = [row[0] for row in self._conn.execute("SELECT DISTINCT thread_id FROM checkpoints")]
+
+        for thread_id in thread_ids:
+            thread_config = config or {"configurable": {"thread_id": thread_id}}
+            with self._lock:
+                self._touch(thread_id)
+                items = list(super().list(thread_config, filter=filter, before=before, limit=limit))
+            for item in items:
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._touch(thread_id)
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            checkpoint_id = next_config["configurable"]["checkpoint_id"]
+            (type_, blob), (metadata_type, metadata_blob), parent_id = self.storage[thread_id][checkpoint_ns][checkpoint_id]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints"
+                " (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, blob, metadata_type, metadata_blob),
+            )
+            self._prune(thread_id, checkpoint_ns)
+            self._conn.commit()
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            self._touch(thread_id)
+            super().put_writes(config, writes, task_id)
+            rows = [
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, blob)
+                for (write_task_id, idx), (_, channel, (type_, blob))
+                in self.writes[(thread_id, checkpoint_ns, checkpoint_id)].items()
+                if write_task_id == task_id
+            ]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO writes"
+                " (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def threads_in_memory(self) -> int:
+        with self._lock:
+            return len(self._active)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,80 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.stores import BaseStore
+
+
+class SQLiteDocStore(BaseStore[str, Document]):
+    """Documents persisted in a local SQLite file, keyed by id.
+
+    Used as the parent store of `ParentDocumentRetriever`. The connection is
+    opened on first access, so constructing the store is free.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, document TEXT NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _dumps(document: Document) -> str:
+        return json.dumps({"page_content": document.page_content, "metadata": document.metadata})
+
+    @staticmethod
+    def _loads(value: str) -> Document:
+        return Document(**json.loads(value))
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[Document]]:
+        if not keys:
+            return []
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = dict(self._connection().execute(
+                f"SELECT id, document FROM documents WHERE id IN ({placeholders})", list(keys)
+            ))
+        return [self._loads(rows[key]) if key in rows else None for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, Document]]) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (id, document) VALUES (?, ?)",
+                [(key, self._dumps(document)) for key, document in key_value_pairs],
+            )
+            conn.commit()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("DELETE FROM documents WHERE id = ?", [(key,) for key in keys])
+            conn.commit()
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        with self._lock:
+            if prefix:
+                rows = self._connection().execute(
+                    "SELECT id FROM documents WHERE id LIKE ? ESCAPE '\\'",
+                    (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",),
+                ).fetchall()
+            else:
+                rows = self._connection().execute("SELECT id FROM documents").fetchall()
+        for (key,) in rows:
+            yield key
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,255 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.utils.tracing import span
+
+EMBEDDING_CACHE_PATH = "data/embedding_cache.sqlite3"
+
+
+class EmbeddingService(Embeddings):
+    """Shared, caching front for an embeddings model.
+
+    Vectors are keyed by a hash of the model name and the exact text, held in
+    an LRU of `max_entries` float32 arrays and, when `path` is given, in a
+    SQLite file that survives restarts. Concurrent misses are coalesced: the
+    first caller waits `batch_window_s` for others to queue their texts and
+    sends them all in requests of at most `max_batch_size` texts, and a text
+    already in flight is awaited rather than requested again. Callers that
+    arrive while a request is running start their own, so requests still
+    overlap. Requests of `max_batch_size` texts or more, such as ingest
+    batches, skip the window.
+
+    `base` defaults to OpenAI embeddings on the shared connection pool,
+    created on first use. With `cache=False` every text is requested, in
+    requests of at most `max_batch_size` texts, and nothing is kept; ingest
+    uses this so document chunks do not evict cached query vectors.
+    """
+
+    def __init__(self, base: Optional[Embeddings] = None, path: Optional[str] = None, max_entries: int = 10000,
+                 batch_window_s: float = 0.005, max_batch_size: int = 256, cache: bool = True):
+        self._base = base
+        self.path = path if cache else None
+        self.cache = cache
+        self.max_entries = max_entries
+        self.batch_window_s = batch_window_s
+        self.max_batch_size = max_batch_size
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._queue = []
+        self._inflight = {}
+        self._draining = False
+        self._batch_lock = threading.Lock()
+
+        self.requests = 0
+        self.texts = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Misses already requested by a concurrent caller
+        self.coalesced = 0
+        self.api_calls = 0
+        self.api_texts = 0
+        self.api_latency_s = 0.0
+        self.request_latency_s = 0.0
+
+    @property
+    def base(self) -> Embeddings:
+        if self._base is None:
+            from src.services.llm_gateway import get_embeddings_model
+
+            self._base = get_embeddings_model()
+        return self._base
+
+    def _key(self, text: str) -> str:
+        model = getattr(self.base, "model", None) or type(self.base).__name__
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            self.hits += len(found)
+
+            missing = [key for key in keys if key not in found]
+            conn = self._connection()
+            if conn is not None and missing:
+                placeholders = ",".join("?" * len(missing))
+                for key, blob in conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ):
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+        return found
+
+    def _store(self, pairs):
+        with self._lock:
+            for key, vector in pairs:
+                self._remember(key, vector)
+            conn = self._connection()
+            if conn is not None:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in pairs],
+                )
+                conn.commit()
+
+    def _request(self, texts: List[str]) -> List[np.ndarray]:
+        start = time.perf_counter()
+        with span("llm.embeddings", texts=len(texts)) as request_span:
+            vectors = [np.asarray(vector, dtype=np.float32) for vector in self.base.embed_documents(texts)]
+            # The embeddings client drops the API's usage; about four characters per token
+            request_span.add_usage(getattr(self.base, "model", None), sum(len(text) for text in texts) // 4, 0,
+                                   estimated=True)
+        with self._lock:
+            self.api_calls += 1
+            self.api_texts += len(texts)
+            self.api_latency_s += time.perf_counter() - start
+        return vectors
+
+    def _run_batch(self, batch):
+        try:
+            vectors = self._request([text for _, text, _ in batch])
+            self._store([(key, vector) for (key, _, _), vector in zip(batch, vectors)])
+            for (_, _, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+        finally:
+            with self._batch_lock:
+                for key, _, _ in batch:
+                    self._inflight.pop(key, None)
+
+    def _fetch(self, missing: dict) -> dict:
+        """Embed {key: text} through the shared micro-batch queue."""
+        futures, queued = {}, 0
+        with self._batch_lock:
+            for key, text in missing.items():
+                future = self._inflight.get(key)
+                if future is None:
+                    future = Future()
+                    self._inflight[key] = future
+                    self._queue.append((key, text, future))
+                    queued += 1
+                futures[key] = future
+            drain = not self._draining
+            self._draining = True
+        with self._lock:
+            self.misses += queued
+            self.coalesced += len(missing) - queued
+
+        if drain:
+            if queued < self.max_batch_size:
+                # Give concurrent callers a moment to join this request
+                time.sleep(self.batch_window_s)
+            with self._batch_lock:
+                # Texts queued from now on start a new, concurrent request
+                batch, self._queue = self._queue, []
+                self._draining = False
+            for i in range(0, len(batch), self.max_batch_size):
+                self._run_batch(batch[i:i + self.max_batch_size])
+        return {key: future.result() for key, future in futures.items()}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        if not self.cache:
+            vectors = []
+            for i in range(0, len(texts), self.max_batch_size):
+                vectors.extend(self._request(texts[i:i + self.max_batch_size]))
+            with self._lock:
+                self.requests += 1
+                self.texts += len(texts)
+                self.misses += len(texts)
+                self.request_latency_s += time.perf_counter() - start
+            return [vector.tolist() for vector in vectors]
+
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            found.update(self._fetch(missing))
+        with self._lock:
+            self.requests += 1
+            self.texts += len(texts)
+            self.request_latency_s += time.perf_counter() - start
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+            return {
+                "entries": len(self._entries),
+                "requests": self.requests,
+                "texts": self.texts,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits + self.coalesced) / lookups if lookups else 0.0,
+                "api_calls": self.api_calls,
+                "api_texts": self.api_texts,
+                "mean_batch_size": self.api_texts / self.api_calls if self.api_calls else 0.0,
+                "mean_api_latency_ms": 1000 * self.api_latency_s / self.api_calls if self.api_calls else 0.0,
+                "mean_request_latency_ms": 1000 * self.request_latency_s / self.requests if self.requests else 0.0,
+            }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """The process-wide embedding service, with its disk cache under data/."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService(path=EMBEDDING_CACHE_PATH)
+    return _service
@@ -1,24 +1,77 @@
 #!/usr/bin/env python
-import uuid
-import tiktoken
+"""Long-term memory agent graph.
+
+Nothing expensive happens at import: the recall store and its writer, the
+tools, the gpt-4o client, the tokenizer, the checkpointer and the compiled
+graph are each built on first use by a `get_*` factory and then shared.
+`warm_up()` builds them all ahead of the first turn.
+"""
+import os
+import atexit
+import threading
 from typing import List
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.documents import Document
-from langchain_core.messages import get_buffer_string
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage, get_buffer_string
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.tools import tool
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_openai import ChatOpenAI
-from langchain_openai.embeddings import OpenAIEmbeddings
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, START, MessagesState, StateGraph
-from langgraph.prebuilt import ToolNode
 from dotenv import load_dotenv
+from src.services.llm_gateway import background_priority, get_chat_model, get_tokenizer as get_model_tokenizer
+from src.utils.recall_store import RecallMemoryStore
+from src.utils.memory_writer import RecallMemoryWriter
+from src.utils.embedding_service import get_embedding_service
+from src.utils.checkpointer import BoundedSqliteSaver
+from src.utils.token_window import TokenWindowCache
+from src.utils.web_search import get_web_search
+from src.utils.tracing import span, traced
 
 load_dotenv()
 
-recall_vector_store = InMemoryVectorStore(OpenAIEmbeddings())
+_resources = {}
+# Reentrant: factories call each other while building
+_resources_lock = threading.RLock()
+# Where checkpoints and recall memories are kept; see set_data_dir()
+_data_dir = "data"
+
+
+def _resource(name, build):
+    resource = _resources.get(name)
+    if resource is None:
+        with _resources_lock:
+            resource = _resources.get(name)
+            if resource is None:
+                resource = _resources[name] = build()
+    return resource
+
+
+def set_data_dir(path: str):
+    """Keep checkpoints and recall memories under `path` rather than data/,
+    e.g. so an offline replay leaves real users' threads alone. Call it
+    before the memory graph is first used."""
+    global _data_dir
+    with _resources_lock:
+        if "checkpointer" in _resources or "recall_store" in _resources:
+            raise RuntimeError("set_data_dir() must be called before the checkpointer or recall store is built")
+        _data_dir = path
+
+
+def get_recall_store() -> RecallMemoryStore:
+    """Durable, per-user partitioned recall memories; query embeddings go
+    through the shared, cached embedding service."""
+    return _resource("recall_store", lambda: RecallMemoryStore(
+        get_embedding_service(), path=os.path.join(_data_dir, "recall_memories.sqlite3"),
+    ))
+
+
+def get_recall_writer() -> RecallMemoryWriter:
+    """Saves are queued and written in batches off the turn's critical path;
+    whatever is still queued at exit is written first."""
+    def build():
+        writer = RecallMemoryWriter(get_recall_store())
+        atexit.register(writer.close)
+        return writer
+
+    return _resource("recall_writer", build)
 
 def get_user_id(config: RunnableConfig) -> str:
     user_id = config["configurable"].get("user_id")
@@ -31,27 +84,24 @@ def get_user_id(config: RunnableConfig) -> str:
 def save_recall_memory(memory: str, config: RunnableConfig) -> str:
     """Save memory to vectorstore for later semantic retrieval."""
     user_id = get_user_id(config)
-    document = Document(
-        page_content=memory, id=str(uuid.uuid4()), metadata={"user_id": user_id}
-    )
-    recall_vector_store.add_documents([document])
+    get_recall_writer().submit(user_id, memory)
     return memory
 
 @tool
 def search_recall_memories(query: str, config: RunnableConfig) -> List[str]:
     """Search for relevant memories."""
     user_id = get_user_id(config)
+    # Waits for this user's queued saves, if any
+    return get_recall_writer().search(user_id, query, k=3)
 
-    def _filter_function(doc: Document) -> bool:
-        return doc.metadata.get("user_id") == user_id
-
-    documents = recall_vector_store.similarity_search(
-        query, k=3, filter=_filter_function
-    )
-    return [document.page_content for document in documents]
+@tool
+def web_search(queries: List[str]) -> dict:
+    """Search the web for current information. Pass several queries at once to search them in parallel."""
+    # Cached by normalized query, so popular destinations are searched once
+    return get_web_search().search(queries)
 
-search = TavilySearchResults(max_results=1)
-tools = [save_recall_memory, search_recall_memories, search]
+def get_tools() -> list:
+    return _resource("tools", lambda: [save_recall_memory, search_recall_memories, web_search])
 
 class State(MessagesState):
     # add memories that will be retrieved based on the conversation context
@@ -80,17 +130,54 @@ prompt = ChatPromptTemplate.from_messages(
             "5. Cross-reference new information with existing memories for"
             " consistency.\n"
             "6. Prioritize storing emotional context and personal values"
-            " alongside facts.\n"
+            " alongside facts.\n\n"
+            "Put every web search you need into a single web_search call;"
+            " its queries run in parallel.\n"
         ),
         ("placeholder", "{messages}"),
     ]
 )
 
-model = ChatOpenAI(model_name="gpt-4o")
-model_with_tools = model.bind_tools(tools)
+def get_model():
+    return _resource("model", lambda: get_chat_model("gpt-4o"))
+
+def get_model_with_tools():
+    return _resource("model_with_tools", lambda: get_model().bind_tools(get_tools()))
+
+def get_tokenizer():
+    return _resource("tokenizer", lambda: get_model_tokenizer("gpt-4o"))
 
-tokenizer = tiktoken.encoding_for_model("gpt-4o")
+def get_token_windows() -> TokenWindowCache:
+    """Per-thread incremental tokenization; the recall query uses the newest 2048 tokens."""
+    return _resource("token_windows", lambda: TokenWindowCache(get_tokenizer(), max_tokens=2048))
 
+# Older messages are summarized once a thread's history exceeds this many tokens
+HISTORY_TOKEN_BUDGET = 4000
+# Recent messages that are always kept verbatim
+HISTORY_KEEP_LAST = 6
+
+summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Summarize the conversation below between a user and a travel"
+            " assistant. Keep facts about the user, their plans and preferences,"
+            " and any open questions. Be concise.",
+        ),
+        ("human", "{conversation}"),
+    ]
+)
+
+def _agent_inputs(state: State) -> dict:
+    recall_str = (
+        "<recall_memory>\n" + "\n".join(state["recall_memories"]) + "\n</recall_memory>"
+    )
+    return {
+        "messages": state["messages"],
+        "recall_memories": recall_str,
+    }
+
+@traced("memory.agent")
 def agent(state: State) -> State:
     """Process the current state and generate a response using the LLM.
 
@@ -100,20 +187,60 @@ def agent(state: State) -> State:
     Returns:
         schemas.State: The updated state with the agent's response.
     """
-    bound = prompt | model_with_tools
-    recall_str = (
-        "<recall_memory>\n" + "\n".join(state["recall_memories"]) + "\n</recall_memory>"
-    )
-    prediction = bound.invoke(
-        {
-            "messages": state["messages"],
-            "recall_memories": recall_str,
-        }
-    )
+    bound = prompt | get_model_with_tools()
+    prediction = bound.invoke(_agent_inputs(state))
+    return {
+        "messages": [prediction],
+    }
+
+@traced("memory.agent")
+async def aagent(state: State) -> State:
+    """Async `agent`, so `ainvoke`/`abatch` of the graph keep the model call on the event loop."""
+    bound = prompt | get_model_with_tools()
+    prediction = await bound.ainvoke(_agent_inputs(state))
     return {
         "messages": [prediction],
     }
 
+@traced("memory.compact_history")
+def compact_history(state: State, config: RunnableConfig) -> State:
+    """Summarize old messages once the conversation exceeds the token budget.
+
+    Args:
+        state (schemas.State): The current state of the conversation.
+        config (RunnableConfig): The runtime configuration for the agent.
+
+    Returns:
+        State: Message updates replacing the older messages with one summary.
+    """
+    messages = state["messages"]
+    # An empty update; langgraph rejects a node that writes no channel at all
+    unchanged = {"messages": []}
+    if len(messages) <= HISTORY_KEEP_LAST:
+        return unchanged
+    window = get_token_windows().update(config["configurable"]["thread_id"], messages)
+    if window.total_tokens <= HISTORY_TOKEN_BUDGET:
+        return unchanged
+
+    # Split on a user turn so no tool result is separated from its tool call
+    split = len(messages) - HISTORY_KEEP_LAST
+    while split > 0 and not isinstance(messages[split], HumanMessage):
+        split -= 1
+    if split == 0:
+        return unchanged
+
+    old = messages[:split]
+    # Upkeep, so it queues behind other turns' answers when the model is rate-limited
+    with background_priority():
+        summary = (summary_prompt | get_model()).invoke({"conversation": get_buffer_string(old)})
+    # Reusing the first old message's id replaces it in place, keeping order
+    return {
+        "messages": [
+            SystemMessage(content=f"Summary of the earlier conversation:\n{summary.content}", id=old[0].id)
+        ] + [RemoveMessage(id=message.id) for message in old[1:]],
+    }
+
+@traced("memory.load_memories")
 def load_memories(state: State, config: RunnableConfig) -> State:
     """Load memories for the current conversation.
 
@@ -124,8 +251,8 @@ def load_memories(state: State, config: RunnableConfig) -> State:
     Returns:
         State: The updated state with loaded memories.
     """
-    convo_str = get_buffer_string(state["messages"])
-    convo_str = tokenizer.decode(tokenizer.encode(convo_str)[:2048])
+    window = get_token_windows().update(config["configurable"]["thread_id"], state["messages"])
+    convo_str = window.text
     recall_memories = search_recall_memories.invoke(convo_str, config)
     return {
         "recall_memories": recall_memories,
@@ -146,21 +273,74 @@ def route_tools(state: State):
 
     return END
 
-# Create the graph and add nodes
-builder = StateGraph(State)
-builder.add_node(load_memories)
-builder.add_node(agent)
-builder.add_node("tools", ToolNode(tools))
-
-# Add edges to the graph
-builder.add_edge(START, "load_memories")
-builder.add_edge("load_memories", "agent")
-builder.add_conditional_edges("agent", route_tools, ["tools", END])
-builder.add_edge("tools", "agent")
-
-# Compile the graph
-memory = MemorySaver()
-graph = builder.compile(checkpointer=memory)
+def build_graph(checkpointer=None):
+    """Build and compile the agent graph."""
+    from langgraph.prebuilt import ToolNode
+
+    # Create the graph and add nodes
+    builder = StateGraph(State)
+    builder.add_node(compact_history)
+    builder.add_node(load_memories)
+    builder.add_node("agent", RunnableLambda(agent, afunc=aagent))
+    tool_node = ToolNode(get_tools())
+
+    def run_tools(state, config):
+        with span("memory.tools"):
+            return tool_node.invoke(state, config)
+
+    async def arun_tools(state, config):
+        with span("memory.tools"):
+            return await tool_node.ainvoke(state, config)
+
+    builder.add_node("tools", RunnableLambda(run_tools, afunc=arun_tools))
+
+    # Add edges to the graph
+    builder.add_edge(START, "compact_history")
+    builder.add_edge("compact_history", "load_memories")
+    builder.add_edge("load_memories", "agent")
+    builder.add_conditional_edges("agent", route_tools, ["tools", END])
+    builder.add_edge("tools", "agent")
+
+    return builder.compile(checkpointer=checkpointer)
+
+def get_checkpointer() -> BoundedSqliteSaver:
+    """Checkpoints are persisted and bounded per thread."""
+    return _resource("checkpointer", lambda: BoundedSqliteSaver(os.path.join(_data_dir, "checkpoints.sqlite3")))
+
+def get_graph():
+    """The shared agent graph, compiled once on first use."""
+    return _resource("graph", lambda: build_graph(checkpointer=get_checkpointer()))
+
+def warm_up():
+    """Build every lazy resource now rather than during the first turn."""
+    get_graph()
+    get_model_with_tools()
+    get_token_windows()
+    get_recall_writer()
+
+def shutdown():
+    """Drain queued recall memories, if the writer was ever started."""
+    writer = _resources.get("recall_writer")
+    if writer is not None:
+        writer.close()
+
+_LEGACY_NAMES = {
+    "recall_store": get_recall_store,
+    "recall_writer": get_recall_writer,
+    "tools": get_tools,
+    "model": get_model,
+    "model_with_tools": get_model_with_tools,
+    "tokenizer": get_tokenizer,
+    "token_windows": get_token_windows,
+    "memory": get_checkpointer,
+    "graph": get_graph,
+}
+
+def __getattr__(name):
+    # The module-level names these factories replaced, built on first access
+    if name in _LEGACY_NAMES:
+        return _LEGACY_NAMES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def pretty_print_stream_chunk(chunk):
     for node, updates in chunk.items():
@@ -0,0 +1,180 @@
+import time
+import random
+import threading
+from collections import Counter, deque
+from typing import List
+
+from src.services.llm_gateway import background_priority
+
+
+class RecallMemoryWriter:
+    """Write-behind queue in front of a `RecallMemoryStore`.
+
+    `submit` only enqueues the memory. A background thread waits
+    `flush_interval_s` for more to arrive, then embeds up to `max_batch`
+    pending memories of all users with one embeddings call and stores them
+    in one transaction. `search` first waits up to `read_timeout_s` for the
+    user's own pending memories to be flushed, so a user reads their earlier
+    writes; a search that gives up waiting is reported and counted.
+
+    When `max_queue` memories are already pending, `submit` writes
+    synchronously instead. `close` drains the queue before returning.
+    """
+
+    def __init__(self, store, max_batch: int = 64, flush_interval_s: float = 0.05, max_queue: int = 10000,
+                 max_retries: int = 5, read_timeout_s: float = 10.0):
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval_s = flush_interval_s
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.read_timeout_s = read_timeout_s
+
+        self._pending = deque()
+        # Pending or in-flight memories per user
+        self._unflushed = Counter()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closing = False
+        self._urgent = False
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.sync_writes = 0
+        self.flushes = 0
+        self.errors = 0
+        self.read_waits = 0
+        self.read_timeouts = 0
+        self.max_queue_depth = 0
+        self.flush_s = 0.0
+        self.max_flush_s = 0.0
+        self.queue_delay_s = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="recall-memory-writer", daemon=True)
+            self._worker.start()
+
+    def submit(self, user_id: str, text: str):
+        with self._cond:
+            if len(self._pending) < self.max_queue and not self._closing:
+                self._pending.append((user_id, text, time.monotonic()))
+                self._unflushed[user_id] += 1
+                self.submitted += 1
+                self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+                self._ensure_worker()
+                self._cond.notify_all()
+                return
+            self.sync_writes += 1
+        self.store.add(user_id, [text])
+
+    def wait_for_user(self, user_id: str, timeout_s: float = 10.0) -> bool:
+        """Block until `user_id` has no unflushed memories; False on timeout."""
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            if not self._unflushed[user_id]:
+                return True
+            self.read_waits += 1
+            # Skip the batching delay, a reader is waiting
+            self._urgent = True
+            self._cond.notify_all()
+            while self._unflushed[user_id]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def search(self, user_id: str, query: str, k: int = 3) -> List[str]:
+        if not self.wait_for_user(user_id, self.read_timeout_s):
+            with self._cond:
+                self.read_timeouts += 1
+                pending = self._unflushed[user_id]
+            print(f"Recall search for {user_id} gave up after {self.read_timeout_s:g} s;"
+                  f" {pending} of their memories are not written yet")
+        return self.store.search(user_id, query, k=k)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                if self._closing:
+                    return None
+                self._cond.wait()
+            if not self._closing and not self._urgent and len(self._pending) < self.max_batch:
+                # Let concurrent turns add to this batch
+                self._cond.wait_for(
+                    lambda: self._closing or self._urgent or len(self._pending) >= self.max_batch,
+                    self.flush_interval_s,
+                )
+            self._urgent = False
+            return [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+
+    def _write(self, batch):
+        user_ids = [user_id for user_id, _, _ in batch]
+        texts = [text for _, text, _ in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                with background_priority():
+                    vectors = self.store.embeddings.embed_documents(texts)
+                self.store.add_embedded_batch(user_ids, texts, vectors)
+                return True
+            except Exception as e:
+                with self._cond:
+                    self.errors += 1
+                if attempt == self.max_retries:
+                    print(f"Dropping {len(batch)} recall memories after {attempt + 1} failed writes: {e}")
+                    return False
+                time.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            start = time.monotonic()
+            written = self._write(batch)
+            elapsed = time.monotonic() - start
+            with self._cond:
+                for user_id, _, queued_at in batch:
+                    self._unflushed[user_id] -= 1
+                    if not self._unflushed[user_id]:
+                        del self._unflushed[user_id]
+                    self.queue_delay_s += start - queued_at
+                if written:
+                    self.written += len(batch)
+                else:
+                    self.dropped += len(batch)
+                self.flushes += 1
+                self.flush_s += elapsed
+                self.max_flush_s = max(self.max_flush_s, elapsed)
+                self._cond.notify_all()
+
+    def close(self, timeout_s: float = 30.0):
+        """Write everything still queued, then stop the worker."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout_s)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            done = self.written + self.dropped
+            return {
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self.max_queue_depth,
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "sync_writes": self.sync_writes,
+                "flushes": self.flushes,
+                "errors": self.errors,
+                "read_waits": self.read_waits,
+                "read_timeouts": self.read_timeouts,
+                "mean_batch_size": done / self.flushes if self.flushes else 0.0,
+                "mean_flush_ms": 1000 * self.flush_s / self.flushes if self.flushes else 0.0,
+                "max_flush_ms": 1000 * self.max_flush_s,
+                "mean_queue_delay_ms": 1000 * self.queue_delay_s / done if done else 0.0,
+            }
@@ -0,0 +1,182 @@
+import re
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from typing_extensions import TypedDict
+
+EARTH_RADIUS_KM = 6371.0
+# Radius used for "near <city>" when the query gives no distance
+DEFAULT_NEAR_KM = 25.0
+STAR_AWARDS = {"1 star", "2 stars", "3 stars"}
+
+
+class MichelinFilters(TypedDict, total=False):
+    awards: List[str]
+    green_star: bool
+    max_price: int
+    cuisines: List[str]
+    city: str
+    near: tuple
+    radius_km: float
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def city_of(location: str) -> str:
+    return location.split(",")[0].strip().lower()
+
+
+class MichelinIndex:
+    """In-process indexes over Michelin parent-row metadata.
+
+    Inverted indexes map award, price level, cuisine and city to row ids; a
+    uniform lat/lon grid answers radius queries by scanning only the cells
+    that overlap the search circle. City centroids, derived from the rows
+    themselves, resolve place names in queries.
+    """
+
+    def __init__(self, rows: Dict[str, dict], cell_deg: float = 0.5):
+        self.cell_deg = cell_deg
+        self.rows = rows
+        self.by_award = defaultdict(set)
+        self.by_price = defaultdict(set)
+        self.by_cuisine = defaultdict(set)
+        self.by_city = defaultdict(set)
+        self.green_star = set()
+        self.grid = defaultdict(list)
+
+        coordinates = defaultdict(list)
+        for row_id, metadata in rows.items():
+            self.by_award[metadata.get("award", "").lower()].add(row_id)
+            self.by_price[metadata.get("price_level", 0)].add(row_id)
+            for cuisine in metadata.get("cuisine", "").split(","):
+                if cuisine.strip():
+                    self.by_cuisine[cuisine.strip().lower()].add(row_id)
+            city = city_of(metadata.get("location", ""))
+            if city:
+                self.by_city[city].add(row_id)
+            if metadata.get("green_star"):
+                self.green_star.add(row_id)
+            if "latitude" in metadata and "longitude" in metadata:
+                lat, lon = metadata["latitude"], metadata["longitude"]
+                self.grid[self._cell(lat, lon)].append((row_id, lat, lon))
+                if city:
+                    coordinates[city].append((lat, lon))
+
+        self.city_centroids = {
+            city: (sum(lat for lat, _ in points) / len(points), sum(lon for _, lon in points) / len(points))
+            for city, points in coordinates.items()
+        }
+
+    @classmethod
+    def from_docstore(cls, docstore, **kwargs) -> "MichelinIndex":
+        keys = list(docstore.yield_keys())
+        documents = docstore.mget(keys)
+        return cls({key: document.metadata for key, document in zip(keys, documents) if document is not None}, **kwargs)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> Set[str]:
+        lat_span = radius_km / 111.0
+        lon_span = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+        (min_y, min_x), (max_y, max_x) = self._cell(lat - lat_span, lon - lon_span), self._cell(lat + lat_span, lon + lon_span)
+        found = set()
+        for y in range(min_y, max_y + 1):
+            for x in range(min_x, max_x + 1):
+                for row_id, row_lat, row_lon in self.grid.get((y, x), ()):
+                    if haversine_km(lat, lon, row_lat, row_lon) <= radius_km:
+                        found.add(row_id)
+        return found
+
+    def candidates(self, filters: MichelinFilters) -> Optional[Set[str]]:
+        """Row ids satisfying every filter, or None when nothing is filtered."""
+        sets = []
+        if filters.get("awards"):
+            sets.append(set().union(*(self.by_award.get(award.lower(), set()) for award in filters["awards"])))
+        if filters.get("green_star"):
+            sets.append(self.green_star)
+        if filters.get("max_price"):
+            # Rows with an unknown price (level 0) are kept
+            sets.append(set().union(*(ids for level, ids in self.by_price.items() if level <= filters["max_price"])))
+        if filters.get("cuisines"):
+            sets.append(set().union(*(self.by_cuisine.get(cuisine, set()) for cuisine in filters["cuisines"])))
+        if filters.get("near"):
+            lat, lon = filters["near"]
+            sets.append(self.within_radius(lat, lon, filters.get("radius_km", DEFAULT_NEAR_KM)))
+        elif filters.get("city"):
+            sets.append(self.by_city.get(filters["city"], set()))
+
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return set.intersection(*sets)
+
+    def matches(self, row_id: str, filters: MichelinFilters) -> bool:
+        candidates = self.candidates(filters)
+        return candidates is None or row_id in candidates
+
+
+_PRICE_CAP = re.compile(r"\b(?:under|below|less than|at most|max(?:imum)?|up to|no more than)\s*(\$+)|<=?\s*(\$+)", re.IGNORECASE)
+_CHEAP = re.compile(r"\b(cheap|budget|inexpensive|affordable)\b", re.IGNORECASE)
+_WITHIN = re.compile(r"\bwithin\s+(\d+(?:\.\d+)?)\s*(km|kilometers?|kilometres?|mi|miles?)\b", re.IGNORECASE)
+_NEAR = re.compile(r"\b(near|around|close to|nearby)\b", re.IGNORECASE)
+_AWARD_PATTERNS = [
+    (re.compile(r"\bbib\s+gourmand\b", re.IGNORECASE), ["bib gourmand"]),
+    (re.compile(r"\b(3|three)[- ]stars?\b", re.IGNORECASE), ["3 stars"]),
+    (re.compile(r"\b(2|two)[- ]stars?\b", re.IGNORECASE), ["2 stars"]),
+    (re.compile(r"\b(1|one)[- ]stars?\b", re.IGNORECASE), ["1 star"]),
+    (re.compile(r"\b(michelin[- ]starred|michelin stars?|starred)\b", re.IGNORECASE), sorted(STAR_AWARDS)),
+    (re.compile(r"\bselected restaurants?\b", re.IGNORECASE), ["selected restaurants"]),
+]
+_GREEN_STAR = re.compile(r"\bgreen\s+star\b", re.IGNORECASE)
+
+
+def extract_filters(query: str, index: MichelinIndex) -> MichelinFilters:
+    """Turn explicit constraints in a user query into structured filters.
+
+    Only unambiguous phrases are mapped (award names, "under $$", known
+    cuisines and city names from the index); everything else is left to
+    the vector search.
+    """
+    filters = MichelinFilters()
+    lowered = query.lower()
+
+    awards = []
+    for pattern, names in _AWARD_PATTERNS:
+        if pattern.search(query):
+            awards.extend(name for name in names if name not in awards)
+    if awards:
+        filters["awards"] = awards
+    if _GREEN_STAR.search(query):
+        filters["green_star"] = True
+
+    cap = _PRICE_CAP.search(query)
+    if cap:
+        filters["max_price"] = len(cap.group(1) or cap.group(2))
+    elif _CHEAP.search(query):
+        filters["max_price"] = 2
+
+    cuisines = [cuisine for cuisine in index.by_cuisine if re.search(rf"\b{re.escape(cuisine)}\b", lowered)]
+    if cuisines:
+        filters["cuisines"] = cuisines
+
+    # Longest city names first, so "quebec city" wins over "quebec"
+    for city in sorted(index.by_city, key=len, reverse=True):
+        if re.search(rf"\b{re.escape(city)}\b", lowered):
+            within = _WITHIN.search(query)
+            if within or _NEAR.search(query):
+                if city in index.city_centroids:
+                    filters["near"] = index.city_centroids[city]
+                    radius = float(within.group(1)) if within else DEFAULT_NEAR_KM
+                    if within and within.group(2).lower().startswith("mi"):
+                        radius *= 1.609
+                    filters["radius_km"] = radius
+            else:
+                filters["city"] = city
+            break
+    return filters
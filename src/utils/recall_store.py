@@ -0,0 +1,142 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+
+
+class _Partition:
+    """One user's memories with a row-normalized float32 embedding matrix."""
+
+    def __init__(self, contents, matrix):
+        self.contents = contents
+        self.matrix = matrix
+
+    def extend(self, contents, matrix):
+        self.contents = self.contents + contents
+        self.matrix = np.vstack([self.matrix, matrix]) if len(self.matrix) else matrix
+
+
+class RecallMemoryStore:
+    """Durable recall memories, partitioned by user_id.
+
+    Memories and their embeddings live in a local SQLite file indexed on
+    user_id. A user's partition is loaded into a NumPy matrix on first search
+    and kept in an LRU of at most `max_cached_users` partitions, so a search
+    only scores that user's memories with one matrix-vector product.
+    """
+
+    def __init__(self, embeddings, path: str = "data/recall_memories.sqlite3", max_cached_users: int = 1024):
+        self.embeddings = embeddings
+        self.path = path
+        self.max_cached_users = max_cached_users
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS memories ("
+            " id TEXT PRIMARY KEY,"
+            " user_id TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS memories_user_id ON memories (user_id, created_at)")
+        self._conn.commit()
+
+        self._partitions = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def add(self, user_id: str, texts: List[str]) -> List[str]:
+        """Embed and store `texts` as new memories of `user_id`."""
+        return self.add_embedded(user_id, texts, self.embeddings.embed_documents(list(texts)))
+
+    def add_embedded(self, user_id: str, texts: List[str], vectors) -> List[str]:
+        """Store memories whose embeddings were computed by the caller."""
+        return self.add_embedded_batch([user_id] * len(texts), texts, vectors)
+
+    def add_embedded_batch(self, user_ids: List[str], texts: List[str], vectors) -> List[str]:
+        """Store memories of several users in one transaction."""
+        matrix = self._normalize(vectors).reshape(len(texts), -1)
+        ids = [str(uuid.uuid4()) for _ in texts]
+        now = time.time()
+        rows = [
+            (memory_id, user_id, text, vector.tobytes(), now)
+            for memory_id, user_id, text, vector in zip(ids, user_ids, texts, matrix)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO memories (id, user_id, content, embedding, created_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            for user_id in dict.fromkeys(user_ids):
+                partition = self._partitions.get(user_id)
+                if partition is not None:
+                    rows_of_user = [i for i, owner in enumerate(user_ids) if owner == user_id]
+                    partition.extend([texts[i] for i in rows_of_user], matrix[rows_of_user])
+        return ids
+
+    def _load_partition(self, user_id: str) -> _Partition:
+        partition = self._partitions.get(user_id)
+        if partition is not None:
+            self._partitions.move_to_end(user_id)
+            return partition
+
+        rows = self._conn.execute(
+            "SELECT content, embedding FROM memories WHERE user_id = ? ORDER BY created_at", (user_id,)
+        ).fetchall()
+        contents = [content for content, _ in rows]
+        if rows:
+            matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        partition = _Partition(contents, matrix)
+
+        self._partitions[user_id] = partition
+        while len(self._partitions) > self.max_cached_users:
+            self._partitions.popitem(last=False)
+        return partition
+
+    def search(self, user_id: str, query: str, k: int = 3) -> List[str]:
+        """Return the contents of `user_id`'s `k` memories most similar to `query`."""
+        with self._lock:
+            if not len(self._load_partition(user_id).contents):
+                return []
+        return self.search_by_vector(user_id, self.embeddings.embed_query(query), k)
+
+    def search_by_vector(self, user_id: str, vector, k: int = 3) -> List[str]:
+        with self._lock:
+            partition = self._load_partition(user_id)
+            contents, matrix = partition.contents, partition.matrix
+        if not contents:
+            return []
+
+        scores = matrix @ self._normalize(vector)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [contents[i] for i in top]
+
+    def count(self, user_id: str = None) -> int:
+        with self._lock:
+            if user_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM memories WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,163 @@
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_message(message: str) -> str:
+    message = re.sub(r"\s+", " ", message.strip().lower())
+    return message.strip(" .!?")
+
+
+def hash_prompt(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Shared LLM response cache for stateless services.
+
+    Entries are keyed by (service_type, system prompt hash, normalized message).
+    Only store answers that are a pure function of that key: anything that
+    depends on a user's memory or conversation must bypass this cache.
+
+    The exact layer is an LRU bounded by `max_entries` and `max_bytes`, with
+    entries expiring after `ttl_s`. When `embeddings` is given, a miss is
+    retried as a cosine-similarity lookup among live entries of the same
+    service and prompt, accepting the best match at or above
+    `similarity_threshold`. Their normalized vectors are rows of one float32
+    matrix, so a lookup scores every entry with a single product.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl_s: float = 3600.0,
+                 embeddings=None, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+
+        # key -> (response, created, matrix row or None)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Allocated on the first vector; one spare row for the entry being added
+        self._matrix = None
+        self._row_keys = [None] * (max_entries + 1)
+        self._free_rows = list(range(max_entries, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(service_type: str, system_prompt: str, message: str) -> tuple:
+        return (service_type, hash_prompt(system_prompt), normalize_message(message))
+
+    @staticmethod
+    def _size(key, response, vector) -> int:
+        return len(key[2]) + len(response) + (vector.nbytes if vector is not None else 0)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _is_fresh(self, entry, now) -> bool:
+        return now - entry[1] < self.ttl_s
+
+    def _remove(self, key):
+        response, _, row = self._entries.pop(key)
+        self._bytes -= self._size(key, response, self._matrix[row] if row is not None else None)
+        if row is not None:
+            self._matrix[row] = 0.0
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def get(self, service_type: str, system_prompt: str, message: str):
+        key = self.make_key(service_type, system_prompt, message)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+
+        if self.embeddings is not None:
+            response = self._semantic_get(key, now)
+            if response is not None:
+                return response
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _semantic_get(self, key, now):
+        query = self._normalize(self.embeddings.embed_query(key[2]))
+        with self._lock:
+            if self._matrix is None:
+                return None
+            scores = self._matrix @ query
+            for row in np.argsort(-scores):
+                if scores[row] < self.similarity_threshold:
+                    return None
+                candidate_key = self._row_keys[row]
+                if candidate_key is None or candidate_key[:2] != key[:2]:
+                    continue
+                if not self._is_fresh(self._entries[candidate_key], now):
+                    continue
+                self._entries.move_to_end(candidate_key)
+                self.semantic_hits += 1
+                return self._entries[candidate_key][0]
+        return None
+
+    def put(self, service_type: str, system_prompt: str, message: str, response: str):
+        if not isinstance(response, str):
+            return
+        key = self.make_key(service_type, system_prompt, message)
+        vector = self._normalize(self.embeddings.embed_query(key[2])) if self.embeddings is not None else None
+        size = self._size(key, response, vector)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            row = None
+            if vector is not None:
+                if self._matrix is None:
+                    self._matrix = np.zeros((len(self._row_keys), len(vector)), dtype=np.float32)
+                row = self._free_rows.pop()
+                self._matrix[row] = vector
+                self._row_keys[row] = key
+            self._entries[key] = (response, time.monotonic(), row)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+            self._row_keys = [None] * len(self._row_keys)
+            self._free_rows = list(range(len(self._row_keys) - 1, -1, -1))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
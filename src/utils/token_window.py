@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict, deque
+
+from langchain_core.messages import get_buffer_string
+
+
+class TokenWindow:
+    """Incrementally tokenized view of one conversation thread.
+
+    Only messages appended since the last `update` are encoded. The most
+    recent `max_tokens` tokens are kept for building the recall query, and
+    `total_tokens` counts the whole conversation. If the history was rewritten
+    (e.g. compacted), the window is rebuilt from scratch.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int = 2048):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.reset()
+
+    def reset(self):
+        self.tokens = deque(maxlen=self.max_tokens)
+        self.total_tokens = 0
+        self._count = 0
+        self._last_id = None
+        self._text = ""
+        self._dirty = False
+
+    def update(self, messages):
+        if self._count and (len(messages) < self._count or messages[self._count - 1].id != self._last_id):
+            self.reset()
+
+        new_messages = messages[self._count:]
+        if not new_messages:
+            return
+        # get_buffer_string joins messages with newlines
+        text = get_buffer_string(new_messages)
+        if self._count:
+            text = "\n" + text
+        tokens = self.tokenizer.encode(text)
+
+        self.tokens.extend(tokens)
+        self.total_tokens += len(tokens)
+        self._count = len(messages)
+        self._last_id = messages[-1].id
+        self._dirty = True
+
+    @property
+    def text(self) -> str:
+        if self._dirty:
+            self._text = self.tokenizer.decode(list(self.tokens))
+            self._dirty = False
+        return self._text
+
+
+class TokenWindowCache:
+    """Per-thread `TokenWindow`s, keeping the `max_threads` most recently used."""
+
+    def __init__(self, tokenizer, max_tokens: int = 2048, max_threads: int = 1000):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.max_threads = max_threads
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, thread_id: str) -> TokenWindow:
+        with self._lock:
+            window = self._windows.get(thread_id)
+            if window is None:
+                window = self._windows[thread_id] = TokenWindow(self.tokenizer, self.max_tokens)
+                while len(self._windows) > self.max_threads:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end(thread_id)
+            return window
+
+    def update(self, thread_id: str, messages) -> TokenWindow:
+        window = self.get(thread_id)
+        window.update(messages)
+        return window
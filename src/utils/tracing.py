@@ -0,0 +1,355 @@
+import os
+import json
+import time
+import atexit
+import random
+import bisect
+import asyncio
+import threading
+import functools
+import contextlib
+from contextvars import ContextVar
+from typing import Optional
+
+# USD per million (input, output) tokens; override with LLM_MODEL_PRICES='{"gpt-4o": [2.5, 10]}'
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-ada-002": (0.10, 0.0),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_MODEL_PRICES", "{}")).items()})
+
+# Histogram buckets of span durations, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span = ContextVar("current_span", default=None)
+_usage_lock = threading.Lock()
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost; dated model names use the price of their base model."""
+    if not model:
+        return 0.0
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # "gpt-4o-2024-08-06" -> "gpt-4o"; the longest matching prefix wins
+        matches = [name for name in MODEL_PRICES if model.startswith(name)]
+        if not matches:
+            return 0.0
+        prices = MODEL_PRICES[max(matches, key=len)]
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1e6
+
+
+class Span:
+    """One timed step of a turn.
+
+    Token counts and cost include those of the span's descendants, so a
+    turn's span carries the turn's total; `model` is set only on the LLM
+    call spans that reported the usage.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent", "sampled", "start_time", "_start", "duration_s",
+                 "attributes", "model", "prompt_tokens", "completion_tokens", "cost_usd", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], sampled: bool, attributes: dict):
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.parent = parent
+        self.sampled = sampled
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_s = None
+        self.attributes = attributes
+        self.model = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_usage(self, model: Optional[str], prompt_tokens: int, completion_tokens: int, estimated: bool = False):
+        """Record an LLM call's tokens here and on every ancestor."""
+        self.model = model
+        if estimated:
+            self.attributes["estimated_tokens"] = True
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        with _usage_lock:
+            span = self
+            while span is not None:
+                span.prompt_tokens += prompt_tokens
+                span.completion_tokens += completion_tokens
+                span.cost_usd += cost
+                span = span.parent
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "start_time": self.start_time,
+            "duration_ms": 1000 * self.duration_s if self.duration_s is not None else None,
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": self.cost_usd,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def add_usage(self, model, prompt_tokens, completion_tokens, estimated=False):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanAggregator:
+    """In-process totals of finished spans, rendered as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> [count, errors, sum_s, max_s, bucket counts, cost_usd]
+        self._spans = {}
+        # model -> [calls, prompt_tokens, completion_tokens, cost_usd]
+        self._models = {}
+
+    def export(self, span: Span):
+        with self._lock:
+            stats = self._spans.get(span.name)
+            if stats is None:
+                stats = self._spans[span.name] = [0, 0, 0.0, 0.0, [0] * (len(DURATION_BUCKETS) + 1), 0.0]
+            stats[0] += 1
+            stats[1] += span.error is not None
+            stats[2] += span.duration_s
+            stats[3] = max(stats[3], span.duration_s)
+            stats[4][bisect.bisect_left(DURATION_BUCKETS, span.duration_s)] += 1
+            stats[5] += span.cost_usd
+            if span.model is not None:
+                usage = self._models.get(span.model)
+                if usage is None:
+                    usage = self._models[span.model] = [0, 0, 0, 0.0]
+                usage[0] += 1
+                usage[1] += span.prompt_tokens
+                usage[2] += span.completion_tokens
+                usage[3] += span.cost_usd
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "spans": {
+                    name: {
+                        "count": count,
+                        "errors": errors,
+                        "mean_ms": 1000 * total_s / count,
+                        "max_ms": 1000 * max_s,
+                        "cost_usd": cost,
+                    }
+                    for name, (count, errors, total_s, max_s, _, cost) in self._spans.items()
+                },
+                "models": {
+                    model: {"calls": calls, "prompt_tokens": prompt, "completion_tokens": completion, "cost_usd": cost}
+                    for model, (calls, prompt, completion, cost) in self._models.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP chatbot_span_duration_seconds Wall time of instrumented steps.",
+            "# TYPE chatbot_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            spans = {name: (stats[:4], list(stats[4]), stats[5]) for name, stats in self._spans.items()}
+            models = {model: list(usage) for model, usage in self._models.items()}
+        for name, ((count, _, total_s, _), buckets, _) in sorted(spans.items()):
+            cumulative = 0
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'chatbot_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'chatbot_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'chatbot_span_duration_seconds_sum{{span="{name}"}} {total_s}')
+            lines.append(f'chatbot_span_duration_seconds_count{{span="{name}"}} {count}')
+        lines += ["# HELP chatbot_span_errors_total Instrumented steps that raised.",
+                  "# TYPE chatbot_span_errors_total counter"]
+        lines += [f'chatbot_span_errors_total{{span="{name}"}} {stats[0][1]}' for name, stats in sorted(spans.items())]
+        lines += ["# HELP chatbot_span_cost_usd_total Estimated LLM cost of instrumented steps, descendants included.",
+                  "# TYPE chatbot_span_cost_usd_total counter"]
+        lines += [f'chatbot_span_cost_usd_total{{span="{name}"}} {stats[2]}' for name, stats in sorted(spans.items())]
+        lines += ["# HELP chatbot_llm_calls_total LLM and embedding requests.",
+                  "# TYPE chatbot_llm_calls_total counter"]
+        lines += [f'chatbot_llm_calls_total{{model="{model}"}} {usage[0]}' for model, usage in sorted(models.items())]
+        lines += ["# HELP chatbot_llm_tokens_total LLM tokens, as reported by the API or estimated.",
+                  "# TYPE chatbot_llm_tokens_total counter"]
+        for model, usage in sorted(models.items()):
+            lines.append(f'chatbot_llm_tokens_total{{model="{model}",type="prompt"}} {usage[1]}')
+            lines.append(f'chatbot_llm_tokens_total{{model="{model}",type="completion"}} {usage[2]}')
+        lines += ["# HELP chatbot_llm_cost_usd_total Estimated LLM cost.",
+                  "# TYPE chatbot_llm_cost_usd_total counter"]
+        lines += [f'chatbot_llm_cost_usd_total{{model="{model}"}} {usage[3]}' for model, usage in sorted(models.items())]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._models.clear()
+
+
+class JsonlExporter:
+    """Appends sampled spans to a JSON Lines file, one span per line.
+
+    Lines are buffered and flushed when a turn's root span ends, or at the
+    latest every `flush_interval_s`.
+    """
+
+    def __init__(self, path: str, flush_interval_s: float = 1.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def export(self, span: Span):
+        if not span.sampled:
+            return
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            now = time.monotonic()
+            if span.parent is None or now - self._last_flush >= self.flush_interval_s:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Tracer:
+    """Creates spans and hands finished ones to its exporters.
+
+    The aggregator sees every span. Whether a turn goes to the other
+    exporters is decided once, at its root span, with `sample_rate`.
+    """
+
+    def __init__(self, exporters=(), sample_rate: float = 1.0, enabled: bool = True):
+        self.aggregator = SpanAggregator()
+        self.exporters = [self.aggregator, *exporters]
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+
+    def start(self, name: str, **attributes):
+        """A span that is a child of the current one, but does not become current."""
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        sampled = parent.sampled if parent is not None else random.random() < self.sample_rate
+        return Span(name, parent, sampled, attributes)
+
+    def finish(self, span, error: BaseException = None):
+        if span is NOOP_SPAN:
+            return
+        span.duration_s = time.perf_counter() - span._start
+        if error is not None:
+            span.error = type(error).__name__
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """Time the block as a child of the current span."""
+        span = self.start(name, **attributes)
+        if span is NOOP_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # A generator closed from another context cannot reset its token
+            with contextlib.suppress(ValueError):
+                _current_span.reset(token)
+            self.finish(span, error)
+
+    def close(self):
+        for exporter in self.exporters:
+            close = getattr(exporter, "close", None)
+            if close is not None:
+                close()
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer.
+
+    TRACING_ENABLED=false turns spans off. TRACE_JSONL_PATH adds a JSONL
+    exporter, and TRACE_SAMPLE_RATE is the fraction of turns written to it.
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                exporters = []
+                path = os.getenv("TRACE_JSONL_PATH")
+                if path:
+                    exporters.append(JsonlExporter(path))
+                tracer = Tracer(
+                    exporters,
+                    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+                    enabled=os.getenv("TRACING_ENABLED", "true").lower() != "false",
+                )
+                atexit.register(tracer.close)
+                _tracer = tracer
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """`with span("router"): ...` on the process-wide tracer."""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def traced(name: str):
+    """Decorator form of `span`, for plain and async functions."""
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
@@ -0,0 +1,85 @@
+import threading
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from src.utils.tracing import get_tracer
+
+
+def _estimate_tokens(chars: int) -> int:
+    # About four characters per token for English text
+    return max(1, chars // 4) if chars else 0
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records each chat model call as an `llm` span of the current span.
+
+    Token counts come from the API response; streamed responses carry them
+    only with `stream_usage`, otherwise they are estimated from the text.
+    """
+
+    # Runs in the caller's context, so the span nests under the caller's
+    run_inline = True
+
+    def __init__(self):
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[BaseMessage]], *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> Any:
+        model = (kwargs.get("invocation_params") or {}).get("model") or (metadata or {}).get("ls_model_name")
+        span = get_tracer().start("llm")
+        prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        with self._lock:
+            self._spans[run_id] = (span, model, prompt_chars)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        with self._lock:
+            entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        span, model, prompt_chars = entry
+
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        generations = [generation for batch in response.generations for generation in batch]
+        if prompt_tokens is None:
+            metadata = [getattr(getattr(g, "message", None), "usage_metadata", None) for g in generations]
+            metadata = [m for m in metadata if m]
+            if metadata:
+                prompt_tokens = sum(m["input_tokens"] for m in metadata)
+                completion_tokens = sum(m["output_tokens"] for m in metadata)
+        estimated = prompt_tokens is None
+        if estimated:
+            completion_text = "".join(
+                g.text + str(getattr(getattr(g, "message", None), "tool_calls", "") or "") for g in generations
+            )
+            prompt_tokens = _estimate_tokens(prompt_chars)
+            completion_tokens = _estimate_tokens(len(completion_text))
+        span.add_usage(model, prompt_tokens, completion_tokens or 0, estimated=estimated)
+        get_tracer().finish(span)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        with self._lock:
+            entry = self._spans.pop(run_id, None)
+        if entry is not None:
+            span, model, _ = entry
+            span.set(model=model)
+            get_tracer().finish(span, error)
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def get_tracing_handler() -> TracingCallbackHandler:
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                _handler = TracingCallbackHandler()
+    return _handler
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from src.utils.response_cache import normalize_message
+from src.utils.tracing import span
+
+WEB_SEARCH_CACHE_PATH = "data/web_search_cache.sqlite3"
+
+
+class CachedWebSearch:
+    """Web search with a local result cache, behind the memory agent's tool.
+
+    Results are keyed by the normalized query (see `normalize_message`) and
+    live for `ttl_s`, in an LRU of `max_entries` and, when `path` is given,
+    in a SQLite file that survives restarts. An entry fetched with more
+    results than a later call asks for answers it too. A query already in
+    flight is awaited rather than sent again.
+
+    `search()` takes several queries and sends the uncached ones in
+    parallel, on up to `max_workers` threads. A query that fails gets an
+    "error" entry instead of results, and is not cached.
+
+    `backend(query, max_results)` returns a list of {"url", "content"}
+    dicts. It defaults to the Tavily API, created on first use.
+    """
+
+    def __init__(self, backend: Optional[Callable[[str, int], List[dict]]] = None, path: Optional[str] = None,
+                 max_results: int = 3, ttl_s: float = 6 * 3600.0, max_entries: int = 1024, max_workers: int = 4):
+        self._backend = backend
+        self.path = path
+        self.max_results = max_results
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+
+        # key -> (results, max_results asked for, wall-clock time fetched)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._executor = None
+
+        self.queries = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.errors = 0
+        self.api_calls = 0
+        self.api_latency_s = 0.0
+
+    @property
+    def backend(self) -> Callable[[str, int], List[dict]]:
+        if self._backend is None:
+            from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+
+            wrapper = TavilySearchAPIWrapper()
+            self._backend = lambda query, max_results: wrapper.results(query, max_results=max_results)
+        return self._backend
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS searches "
+                "(query TEXT PRIMARY KEY, results TEXT NOT NULL, max_results INTEGER NOT NULL, fetched REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _usable(self, entry, max_results: int, now: float) -> bool:
+        return entry is not None and now - entry[2] < self.ttl_s and entry[1] >= max_results
+
+    def _remember(self, key: str, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, key: str, max_results: int) -> Optional[List[dict]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if self._usable(entry, max_results, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0][:max_results]
+            conn = self._connection()
+            if conn is not None:
+                row = conn.execute(
+                    "SELECT results, max_results, fetched FROM searches WHERE query = ?", (key,)
+                ).fetchone()
+                entry = (json.loads(row[0]), row[1], row[2]) if row else None
+                if self._usable(entry, max_results, now):
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                    return entry[0][:max_results]
+        return None
+
+    def _store(self, key: str, entry):
+        with self._lock:
+            self._remember(key, entry)
+            conn = self._connection()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO searches (query, results, max_results, fetched) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(entry[0]), entry[1], entry[2]),
+                )
+                conn.commit()
+
+    def _fetch(self, key: str, query: str, max_results: int, future: Future):
+        start = time.perf_counter()
+        try:
+            with span("web_search", max_results=max_results) as search_span:
+                results = list(self.backend(query, max_results))
+                search_span.set(results=len(results))
+            self._store(key, (results, max_results, time.time()))
+            future.set_result(results)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self.api_calls += 1
+                self.api_latency_s += time.perf_counter() - start
+                self._inflight.pop(key, None)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="web-search")
+            return self._executor
+
+    def search(self, queries: List[str], max_results: Optional[int] = None) -> Dict[str, object]:
+        """{query: results, or {"error": message}} for each distinct query."""
+        max_results = max_results or self.max_results
+        queries = list(dict.fromkeys(query for query in queries if query.strip()))
+        found, futures, owned = {}, {}, []
+        for query in queries:
+            key = normalize_message(query)
+            results = self._lookup(key, max_results)
+            if results is not None:
+                found[query] = results
+                continue
+            with self._lock:
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._inflight[key] = Future()
+                    owned.append((key, query, future))
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+            futures[query] = future
+        with self._lock:
+            self.queries += len(queries)
+
+        if len(owned) == 1:
+            # No point in a thread hop for a single query
+            self._fetch(owned[0][0], owned[0][1], max_results, owned[0][2])
+        elif owned:
+            pool = self._pool()
+            for key, query, future in owned:
+                # A copy of the caller's context, so each web_search span stays under the current span
+                pool.submit(contextvars.copy_context().run, self._fetch, key, query, max_results, future)
+        for query, future in futures.items():
+            try:
+                found[query] = future.result()[:max_results]
+            except Exception as e:
+                found[query] = {"error": str(e)}
+        return {query: found[query] for query in queries}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            cached = self.hits + self.disk_hits + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "queries": self.queries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": cached / self.queries if self.queries else 0.0,
+                "api_calls": self.api_calls,
+                "mean_api_latency_ms": 1000 * self.api_latency_s / self.api_calls if self.api_calls else 0.0,
+            }
+
+
+_search = None
+_search_lock = threading.Lock()
+
+
+def get_web_search() -> CachedWebSearch:
+    """The process-wide web search, with its disk cache under data/.
+
+    `WEB_SEARCH_MAX_RESULTS` sets the results per query (default 3).
+    """
+    global _search
+    if _search is None:
+        with _search_lock:
+            if _search is None:
+                _search = CachedWebSearch(path=WEB_SEARCH_CACHE_PATH,
+                                          max_results=int(os.getenv("WEB_SEARCH_MAX_RESULTS", "3")))
+    return _search
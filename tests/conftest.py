@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.fakes import install_fake_models
+from src.services import llm_gateway
+from src.utils import embedding_service, long_term_memory
+
+
+@pytest.fixture
+def fake_models(tmp_path, monkeypatch):
+    """Installs the fake models with the given options; each test gets fresh shared resources.
+
+    Caches, checkpoints and recall memories are written under `tmp_path`.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LANGCHAIN_TRACING_V2", "false")
+    monkeypatch.setattr(long_term_memory, "_resources", {})
+    monkeypatch.setattr(embedding_service, "_service", None)
+    yield install_fake_models
+    long_term_memory.shutdown()
+    llm_gateway.set_model_factories()
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.batch import BatchRunner
+from src.engine import ChatbotEngine
+from src.utils import long_term_memory
+
+
+class EchoService:
+    def __init__(self, name):
+        self.name = name
+
+    async def aprocess_message(self, message):
+        return f"{self.name}: {message}"
+
+
+class KeywordRouter:
+    async def aroute_message(self, message):
+        return "itinerary_planning" if "plan" in message else "others"
+
+
+@pytest.fixture
+def runner(fake_models):
+    # The memory agent never answers, so every turn goes through the router and a service
+    fake_models(agent_answer_rate=0.0)
+    engine = ChatbotEngine(
+        services={name: EchoService(name) for name in ("itinerary_planning", "others")},
+        router=KeywordRouter(),
+        graph=long_term_memory.build_graph(checkpointer=MemorySaver()),
+    )
+    return BatchRunner(engine, max_concurrency=2)
+
+
+async def collect(runner, records):
+    return [result async for result in runner.arun(records)]
+
+
+def test_turns_run_in_waves_per_thread(runner):
+    records = [
+        {"user_id": "u1", "message": "Hi there", "id": "a"},
+        {"user_id": "u2", "message": "Help me plan a trip"},
+        {"user_id": "u1", "message": "Plan a weekend in Quebec"},
+        {"message": "no user"},
+        {"user_id": "u1", "thread_id": "t2", "message": "Hello again"},
+        {"user_id": "u1", "message": "Thanks"},
+    ]
+    results = asyncio.run(collect(runner, records))
+
+    # Invalid records first, then wave by wave, in input order within a wave
+    assert [(result["index"], result.get("wave")) for result in results] == [
+        (3, None), (0, 0), (1, 0), (4, 0), (2, 1), (5, 2),
+    ]
+    assert runner.waves == 3
+    assert results[0] == {"index": 3, "error": "Each record needs a user_id and a message", "timings": {}}
+
+    first = results[1]
+    assert first["id"] == "a" and first["user_id"] == "u1" and first["thread_id"] == "u1"
+    assert first["response"] == "others: Hi there" and first["winner"] == "others"
+    assert set(first["timings"]) == {"memory_s", "router_s", "service_s"}
+    assert results[2]["winner"] == "itinerary_planning"
+    assert "service_type" not in first
+
+    # Each thread's messages reached the memory graph in order
+    state = runner.engine.graph.get_state({"configurable": {"user_id": "u1", "thread_id": "u1"}})
+    sent = [message.content for message in state.values["messages"] if message.type == "human"]
+    assert sent == ["Hi there", "Plan a weekend in Quebec", "Thanks"]
+
+
+def test_set_data_dir_moves_checkpoints_and_recall_memories(fake_models, tmp_path, monkeypatch):
+    fake_models()
+    monkeypatch.setattr(long_term_memory, "_data_dir", "data")
+    long_term_memory.set_data_dir(str(tmp_path / "replay"))
+
+    assert long_term_memory.get_recall_store().path == str(tmp_path / "replay" / "recall_memories.sqlite3")
+    long_term_memory.get_checkpointer()
+    assert (tmp_path / "replay" / "checkpoints.sqlite3").exists()
+    with pytest.raises(RuntimeError):
+        long_term_memory.set_data_dir(str(tmp_path / "other"))
@@ -0,0 +1,45 @@
+import os
+
+import chromadb
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.ingest_benchmark import synthetic_rows, write_csv
+from src.utils.build_RAG_db import COLLECTION_NAME, LEGACY_COLLECTION_NAME, build_michelin_database
+
+
+class FailingEmbeddings(FakeEmbeddings):
+    def embed_documents(self, texts):
+        self.calls += 1
+        raise ConnectionError("embeddings endpoint unreachable")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "michelin.csv")
+    write_csv(path, synthetic_rows(20, seed=0))
+    return path
+
+
+def collections(persist_directory):
+    return {collection.name for collection in chromadb.PersistentClient(persist_directory).list_collections()}
+
+
+def test_build_drops_the_legacy_collection(tmp_path, csv_path):
+    persist_directory = str(tmp_path / "chroma")
+    chromadb.PersistentClient(persist_directory).create_collection(LEGACY_COLLECTION_NAME)
+    open(os.path.join(persist_directory, f"{LEGACY_COLLECTION_NAME}_manifest.sqlite3"), "w").close()
+
+    stats = build_michelin_database(csv_path=csv_path, persist_directory=persist_directory,
+                                    embeddings=FakeEmbeddings())
+    assert stats["upserted"] == 20
+    assert collections(persist_directory) == {COLLECTION_NAME}
+    assert not os.path.exists(os.path.join(persist_directory, f"{LEGACY_COLLECTION_NAME}_manifest.sqlite3"))
+
+
+def test_failed_embeddings_are_not_retried_on_top_of_the_gateway(tmp_path, csv_path):
+    embeddings = FailingEmbeddings()
+    with pytest.raises(ConnectionError):
+        build_michelin_database(csv_path=csv_path, persist_directory=str(tmp_path / "chroma"),
+                                embeddings=embeddings, batch_size=64, max_workers=1)
+    assert embeddings.calls == 1
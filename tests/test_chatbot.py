@@ -0,0 +1,40 @@
+import asyncio
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.chatbot import Chatbot
+from src.engine import ChatbotEngine
+from src.utils import long_term_memory
+
+PREAMBLE = "Let me note that down first."
+
+
+def make_chatbot(fake_models, thread_id):
+    fake_models(agent_answer_rate=1.0, tool_call_preamble=PREAMBLE)
+    engine = ChatbotEngine(graph=long_term_memory.build_graph(checkpointer=MemorySaver()))
+    return Chatbot(engine=engine, user_id="user-1", thread_id=thread_id)
+
+
+def final_answer(chatbot):
+    return chatbot.engine.graph.get_state(chatbot.memory_config).values["messages"][-1].content
+
+
+def test_stream_skips_text_before_a_tool_call(fake_models):
+    # The fake agent saves a memory (writing the preamble first), then answers
+    chatbot = make_chatbot(fake_models, "stream")
+    streamed = "".join(chatbot.stream_message("I love sushi, remember that"))
+
+    assert PREAMBLE not in streamed
+    assert streamed == final_answer(chatbot)
+    assert chatbot.last_turn_timings["winner"] == "memory"
+
+
+def test_astream_skips_text_before_a_tool_call(fake_models):
+    chatbot = make_chatbot(fake_models, "astream")
+
+    async def collect():
+        return "".join([token async for token in chatbot.astream_message("I love sushi, remember that")])
+
+    streamed = asyncio.run(collect())
+    assert PREAMBLE not in streamed
+    assert streamed == final_answer(chatbot)
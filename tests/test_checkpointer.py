@@ -0,0 +1,62 @@
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.graph import START, MessagesState, StateGraph
+
+from src.utils.checkpointer import BoundedSqliteSaver
+
+
+def echo(state: MessagesState):
+    return {"messages": [AIMessage(f"echo: {state['messages'][-1].content}")]}
+
+
+@pytest.fixture
+def saver(tmp_path):
+    saver = BoundedSqliteSaver(str(tmp_path / "checkpoints.sqlite3"), max_checkpoints_per_thread=3,
+                               max_threads_in_memory=2)
+    yield saver
+    saver.close()
+
+
+@pytest.fixture
+def graph(saver):
+    builder = StateGraph(MessagesState)
+    builder.add_node(echo)
+    builder.add_edge(START, "echo")
+    return builder.compile(checkpointer=saver)
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def rows(saver, thread_id):
+    return saver._conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+def test_prunes_old_checkpoints(graph, saver):
+    for turn in range(5):
+        graph.invoke({"messages": [("user", f"turn {turn}")]}, config("thread-1"))
+
+    assert len(saver.storage["thread-1"][""]) == 3
+    assert rows(saver, "thread-1") == 3
+    assert len(graph.get_state(config("thread-1")).values["messages"]) == 10
+
+
+def test_rehydrates_an_evicted_thread(graph, saver):
+    for turn in range(3):
+        graph.invoke({"messages": [("user", f"turn {turn}")]}, config("thread-1"))
+    saver._evict("thread-1")
+    assert "thread-1" not in saver.storage
+
+    messages = graph.invoke({"messages": [("user", "turn 3")]}, config("thread-1"))["messages"]
+    assert [message.content for message in messages[::2]] == [f"turn {turn}" for turn in range(4)]
+
+
+def test_keeps_the_most_recent_threads_in_memory(graph, saver):
+    for thread_id in ("thread-1", "thread-2", "thread-3"):
+        graph.invoke({"messages": [("user", "hello")]}, config(thread_id))
+
+    assert saver.threads_in_memory() == 2
+    assert "thread-1" not in saver.storage
+    # Read back from SQLite on next access
+    assert len(graph.get_state(config("thread-1")).values["messages"]) == 2
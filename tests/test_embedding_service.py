@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+
+from benchmarks.fakes import FakeEmbeddings
+from src.utils.embedding_service import EmbeddingService
+
+
+def test_repeated_texts_are_requested_once():
+    base = FakeEmbeddings()
+    service = EmbeddingService(base, batch_window_s=0.0)
+    first = service.embed_documents(["a", "b", "a"])
+    second = service.embed_query("b")
+
+    assert first[0] == first[2] and first[1] == second
+    assert np.allclose(second, FakeEmbeddings().embed_query("b"))
+    assert base.texts == 2
+    metrics = service.metrics()
+    assert metrics["api_texts"] == 2 and metrics["hits"] == 1
+
+
+def test_least_recently_used_vectors_are_evicted():
+    base = FakeEmbeddings()
+    service = EmbeddingService(base, max_entries=2, batch_window_s=0.0)
+    service.embed_documents(["a", "b"])
+    service.embed_query("a")
+    service.embed_query("c")
+
+    service.embed_query("a")
+    assert service.metrics()["api_texts"] == 3
+    service.embed_query("b")
+    assert service.metrics()["api_texts"] == 4
+
+
+def test_vectors_survive_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingService(FakeEmbeddings(), path=path, batch_window_s=0.0).embed_documents(["a", "b"])
+
+    base = FakeEmbeddings()
+    service = EmbeddingService(base, path=path, batch_window_s=0.0)
+    service.embed_documents(["a", "b"])
+    assert base.calls == 0
+    assert service.metrics()["disk_hits"] == 2
+
+
+def test_concurrent_misses_share_one_request():
+    base = FakeEmbeddings(latency_s=0.05)
+    service = EmbeddingService(base, batch_window_s=0.05)
+    results = {}
+
+    def embed(name, texts):
+        results[name] = service.embed_documents(texts)
+
+    threads = [threading.Thread(target=embed, args=(name, texts))
+               for name, texts in (("first", ["a", "b"]), ("second", ["b", "c"]), ("third", ["c"]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert base.calls == 1 and base.texts == 3
+    assert results["first"][1] == results["second"][0] and results["second"][1] == results["third"][0]
+    assert service.metrics()["coalesced"] == 2
+
+
+def test_uncached_mode_splits_large_requests():
+    base = FakeEmbeddings()
+    service = EmbeddingService(base, max_batch_size=2, cache=False)
+    assert len(service.embed_documents(["a", "b", "c", "a"])) == 4
+    assert base.calls == 2 and base.texts == 4
+    assert service.metrics()["entries"] == 0
@@ -0,0 +1,37 @@
+import pytest
+
+from src.services.intent_classifier import (
+    RESTAURANT_TYPE_RULES, ROUTE_RULES, KeywordIntentClassifier, TieredClassifier,
+)
+
+
+def tiered(rules):
+    return TieredClassifier([KeywordIntentClassifier(rules)], fallback=lambda message: "from-llm")
+
+
+@pytest.mark.parametrize("message", [
+    "My name is Sam and I love dinner parties",
+    "I am vegetarian, remember that for later",
+])
+def test_single_weak_route_hit_falls_back(message):
+    assert KeywordIntentClassifier(ROUTE_RULES).classify(message) == ("restaurant_recommendations", 0.5)
+    assert tiered(ROUTE_RULES).classify_with_tier(message) == ("from-llm", "llm")
+
+
+def test_single_weak_restaurant_type_hit_falls_back():
+    assert KeywordIntentClassifier(RESTAURANT_TYPE_RULES).classify("fine dining in Vancouver") == ("michelin", 0.5)
+    assert tiered(RESTAURANT_TYPE_RULES).classify_with_tier("fine dining in Vancouver") == ("from-llm", "llm")
+
+
+def test_strong_hit_is_routed_locally():
+    classifier = tiered(ROUTE_RULES)
+    assert classifier.classify_with_tier("Best restaurants in Toronto") == ("restaurant_recommendations", "keyword")
+    assert classifier.stats.snapshot()["hits"] == {"keyword": 1}
+
+
+def test_no_hit_counts_one_keyword_attempt():
+    classifier = tiered(ROUTE_RULES)
+    assert classifier.classify("Tell me a joke") == "from-llm"
+    stats = classifier.stats.snapshot()
+    assert stats["hits"] == {"llm": 1}
+    assert classifier.stats.attempts["keyword"] == 1
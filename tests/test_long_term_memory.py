@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.services import llm_gateway
+from src.utils import long_term_memory
+
+
+@pytest.fixture
+def graph(fake_models):
+    fake_models(agent_answer_rate=1.0)
+    return long_term_memory.build_graph(checkpointer=MemorySaver())
+
+
+@pytest.mark.parametrize("mode", ["invoke", "ainvoke"])
+def test_short_history_turn(graph, mode):
+    # compact_history leaves a history shorter than HISTORY_KEEP_LAST as it is
+    state = {"messages": [("user", "Any ideas for a weekend in Montreal?")]}
+    config = {"configurable": {"user_id": "user-1", "thread_id": f"thread-{mode}"}}
+    if mode == "invoke":
+        result = graph.invoke(state, config)
+    else:
+        result = asyncio.run(graph.ainvoke(state, config))
+
+    messages = result["messages"]
+    assert [type(message) for message in messages] == [HumanMessage, AIMessage]
+    assert messages[-1].content
+
+
+def long_history():
+    """Ten messages; the naive split, HISTORY_KEEP_LAST from the end, lands on a tool result."""
+    filler = " and some more words about the trip" * 5
+    call = {"name": "web_search", "args": {"queries": ["Montreal"]}, "id": "call-1"}
+    return [
+        HumanMessage("Planning a weekend in Montreal" + filler, id="h0"),
+        AIMessage("Happy to help" + filler, id="a0"),
+        HumanMessage("What is on this weekend?" + filler, id="h1"),
+        AIMessage("", tool_calls=[call], id="a1"),
+        ToolMessage("Jazz festival" + filler, tool_call_id="call-1", id="t1"),
+        AIMessage("There is a jazz festival" + filler, id="a1b"),
+        HumanMessage("Where should I eat?" + filler, id="h2"),
+        AIMessage("Try the Plateau" + filler, id="a2"),
+        HumanMessage("And for brunch?" + filler, id="h3"),
+        AIMessage("Try Old Montreal" + filler, id="a3"),
+    ]
+
+
+@pytest.fixture
+def small_budget(monkeypatch):
+    monkeypatch.setattr(long_term_memory, "HISTORY_TOKEN_BUDGET", 50)
+
+
+def test_compaction_keeps_tool_calls_with_their_results(fake_models, small_budget):
+    fake_models()
+    messages = long_history()
+    assert isinstance(messages[len(messages) - long_term_memory.HISTORY_KEEP_LAST], ToolMessage)
+
+    config = {"configurable": {"user_id": "user-1", "thread_id": "thread-1"}}
+    update = long_term_memory.compact_history({"messages": messages}, config)["messages"]
+
+    summary, removals = update[0], update[1:]
+    # The split moved back to the user turn before the tool call
+    assert isinstance(summary, SystemMessage) and summary.id == "h0"
+    assert all(isinstance(message, RemoveMessage) for message in removals)
+    assert [message.id for message in removals] == ["a0"]
+
+
+def test_compaction_rewrites_the_thread(graph, small_budget):
+    config = {"configurable": {"user_id": "user-1", "thread_id": "thread-1"}}
+    state = {"messages": long_history() + [HumanMessage("Any museums?", id="h4")]}
+    messages = graph.invoke(state, config)["messages"]
+
+    assert isinstance(messages[0], SystemMessage) and messages[0].id == "h0"
+    assert [message.id for message in messages[1:6]] == ["h1", "a1", "t1", "a1b", "h2"]
+    assert "a0" not in [message.id for message in messages]
+
+
+def test_compaction_summary_runs_at_background_priority(fake_models, small_budget, monkeypatch):
+    fake_models()
+    priorities = []
+
+    def summarize(prompt):
+        priorities.append(llm_gateway._priority.get())
+        return AIMessage("The user is planning a weekend in Montreal.")
+
+    monkeypatch.setattr(long_term_memory, "get_model", lambda: RunnableLambda(summarize))
+    config = {"configurable": {"user_id": "user-1", "thread_id": "thread-1"}}
+    long_term_memory.compact_history({"messages": long_history()}, config)
+
+    assert priorities == [llm_gateway.BACKGROUND]
+    assert llm_gateway._priority.get() == llm_gateway.INTERACTIVE
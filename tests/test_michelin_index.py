@@ -0,0 +1,70 @@
+import pytest
+
+from src.utils.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from src.utils.michelin_index import MichelinIndex, extract_filters, haversine_km
+
+ROWS = {
+    "alo": {"award": "1 Star", "price_level": 4, "cuisine": "French, Contemporary", "location": "Toronto, Canada",
+            "latitude": 43.648, "longitude": -79.396},
+    "edulis": {"award": "2 Stars", "price_level": 4, "cuisine": "Contemporary", "location": "Toronto, Canada",
+               "latitude": 43.643, "longitude": -79.404},
+    "enigma": {"award": "Bib Gourmand", "price_level": 2, "cuisine": "Korean", "location": "Mississauga, Canada",
+               "latitude": 43.589, "longitude": -79.644, "green_star": True},
+    "st_lawrence": {"award": "1 Star", "price_level": 3, "cuisine": "French", "location": "Vancouver, Canada",
+                    "latitude": 49.283, "longitude": -123.099},
+    "unknown_price": {"award": "Selected Restaurants", "price_level": 0, "cuisine": "Korean",
+                      "location": "Vancouver, Canada"},
+}
+
+
+@pytest.fixture
+def index():
+    return MichelinIndex(ROWS)
+
+
+def test_candidates_intersect_every_filter(index):
+    assert index.candidates({}) is None
+    assert index.candidates({"awards": ["1 star"]}) == {"alo", "st_lawrence"}
+    assert index.candidates({"awards": ["1 star"], "city": "toronto"}) == {"alo"}
+    assert index.candidates({"cuisines": ["korean"], "max_price": 2}) == {"enigma", "unknown_price"}
+    assert index.candidates({"green_star": True}) == {"enigma"}
+    assert index.candidates({"city": "calgary"}) == set()
+
+
+def test_radius_search_uses_the_grid(index):
+    toronto = index.city_centroids["toronto"]
+    assert index.within_radius(*toronto, 5.0) == {"alo", "edulis"}
+    assert index.within_radius(*toronto, 30.0) == {"alo", "edulis", "enigma"}
+    assert haversine_km(*toronto, 43.589, -79.644) < 30.0
+    # Rows without coordinates have no centroid and are never near anything
+    assert index.candidates({"near": toronto, "radius_km": 5000.0}) == {"alo", "edulis", "enigma", "st_lawrence"}
+
+
+def test_extract_filters(index):
+    assert extract_filters("Two star restaurants in Toronto", index) == {"awards": ["2 stars"], "city": "toronto"}
+    assert extract_filters("cheap korean food in vancouver", index) == {
+        "max_price": 2, "cuisines": ["korean"], "city": "vancouver",
+    }
+    filters = extract_filters("Michelin starred French within 10 miles of Toronto, under $$$", index)
+    assert filters["awards"] == ["1 star", "2 stars", "3 stars"]
+    assert filters["max_price"] == 3 and filters["cuisines"] == ["french"]
+    assert filters["near"] == index.city_centroids["toronto"] and filters["radius_km"] == pytest.approx(16.09)
+    assert extract_filters("somewhere nice for dinner", index) == {}
+
+
+def test_bm25_ranks_exact_names_first():
+    bm25 = BM25Index({
+        "alo": "Alo, a French tasting menu on Spadina Avenue",
+        "edulis": "Edulis, seasonal contemporary cooking on Niagara Street",
+        "enigma": "Enigma Yoga Cafe, Korean comfort food",
+    })
+    assert tokenize("The best restaurants in Toronto") == ["toronto"]
+    assert bm25.search("Spadina tasting menu", k=2)[0][0] == "alo"
+    assert [doc_id for doc_id, _ in bm25.search("korean food, seasonal, on niagara street")] == ["edulis", "enigma"]
+    assert bm25.search("niagara", candidates=["alo", "enigma"]) == []
+    assert bm25.search("sushi") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"]])[0] == "b"
+    assert reciprocal_rank_fusion([["a"], []]) == ["a"]
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.stores import InMemoryStore
+
+from src.chains.michelin_retriever import MichelinRetriever
+from src.utils.build_RAG_db import ID_KEY
+
+PARENTS = {
+    "kissa": ("Kissa Tanto", "Japanese, Italian", "Vancouver, Canada", "supper club with handmade pasta", "1 Star"),
+    "anh": ("Anh and Chi", "Vietnamese", "Vancouver, Canada", "family pho and banh xeo", "Bib Gourmand"),
+    "published": ("The Published on Main", "Contemporary", "Vancouver, Canada", "wild ingredients", "1 Star"),
+    "alo": ("Alo", "French", "Toronto, Canada", "tasting menu on Spadina", "1 Star"),
+    "edulis": ("Edulis", "Contemporary", "Toronto, Canada", "seasonal cooking near Niagara", "2 Stars"),
+}
+# Query words the fake embeddings know, one axis each
+AXES = ["pasta", "noodles", "foraged", "french", "seasonal"]
+CHILD_AXIS = {"kissa": "pasta", "anh": "noodles", "published": "foraged", "alo": "french", "edulis": "seasonal"}
+
+
+class KeywordEmbeddings:
+    def embed_query(self, text):
+        self.calls = getattr(self, "calls", 0) + 1
+        return [float(axis in text.lower()) for axis in AXES]
+
+
+class Collection:
+    def get(self, include):
+        ids = list(CHILD_AXIS)
+        return {
+            "embeddings": [[float(axis == CHILD_AXIS[parent]) for axis in AXES] for parent in ids],
+            "metadatas": [{ID_KEY: parent} for parent in ids],
+        }
+
+
+class VectorStore:
+    def __init__(self):
+        self.embeddings = KeywordEmbeddings()
+        self._collection = Collection()
+
+    def similarity_search(self, query, k):
+        target = np.array(self.embeddings.embed_query(query))
+        found = self._collection.get(include=["embeddings", "metadatas"])
+        distances = ((np.array(found["embeddings"]) - target) ** 2).sum(axis=1)
+        return [Document("", metadata=found["metadatas"][i]) for i in np.argsort(distances, kind="stable")[:k]]
+
+
+class CountingStore(InMemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.scans = 0
+
+    def yield_keys(self, prefix=None):
+        self.scans += 1
+        # A slow scan, so concurrent first queries overlap
+        time.sleep(0.05)
+        return super().yield_keys(prefix=prefix)
+
+
+def make_retriever(mode="hybrid", top_k=4):
+    docstore = CountingStore()
+    docstore.mset([
+        (parent_id, Document(f"Name: {name}\nCuisine: {cuisine}\nLocation: {location}\nDescription: {description}",
+                             metadata={"name": name, "cuisine": cuisine, "location": location, "award": award}))
+        for parent_id, (name, cuisine, location, description, award) in PARENTS.items()
+    ])
+    return MichelinRetriever(vectorstore=VectorStore(), docstore=docstore, top_k=top_k, mode=mode)
+
+
+def names(documents):
+    return [document.metadata["name"] for document in documents]
+
+
+def test_few_candidates_are_ranked_lexically_without_embedding():
+    retriever = make_retriever()
+    query = "Anything in Vancouver with wild ingredients?"
+    assert not retriever.needs_embedding(query)
+    found = names(retriever.invoke(query))
+    assert found[0] == "The Published on Main"
+    assert sorted(found) == ["Anh and Chi", "Kissa Tanto", "The Published on Main"]
+    assert getattr(retriever.vectorstore.embeddings, "calls", 0) == 0
+
+
+def test_few_candidates_without_lexical_hits_are_ranked_by_vector():
+    retriever = make_retriever()
+    # The award filter leaves the four starred restaurants; no text mentions "foraged"
+    query = "Michelin starred, foraged"
+    assert retriever.needs_embedding(query)
+    found = names(retriever.invoke(query))
+    assert found[0] == "The Published on Main"
+    assert sorted(found) == ["Alo", "Edulis", "Kissa Tanto", "The Published on Main"]
+
+
+@pytest.mark.parametrize("mode", ["lexical", "hybrid"])
+def test_no_lexical_hit_falls_back_to_the_vector_ranking(mode):
+    retriever = make_retriever(mode=mode, top_k=2)
+    query = "homemade noodles"
+    assert retriever.needs_embedding(query)
+    assert names(retriever.invoke(query))[0] == "Anh and Chi"
+
+
+def test_indexes_are_built_once_under_concurrent_first_use():
+    retriever = make_retriever()
+    barrier = threading.Barrier(8)
+
+    def first_query():
+        barrier.wait()
+        retriever.invoke("tasting menu in Toronto")
+
+    threads = [threading.Thread(target=first_query) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert retriever.docstore.scans == 1
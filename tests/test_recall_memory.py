@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings
+from src.utils.memory_writer import RecallMemoryWriter
+from src.utils.recall_store import RecallMemoryStore
+
+
+class BlockingEmbeddings(FakeEmbeddings):
+    """Embeds only once `release` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def embed_documents(self, texts):
+        self.release.wait()
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecallMemoryStore(FakeEmbeddings(), path=str(tmp_path / "recall.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_search_only_sees_the_users_own_memories(store):
+    store.add("alice", ["Alice is vegetarian", "Alice lives in Montreal"])
+    store.add("bob", ["Bob is vegetarian"])
+
+    assert set(store.search("alice", "Bob is vegetarian", k=3)) == {"Alice is vegetarian", "Alice lives in Montreal"}
+    assert store.search("bob", "Alice is vegetarian", k=3) == ["Bob is vegetarian"]
+    assert store.search("carol", "anything") == []
+    assert store.count("alice") == 2 and store.count() == 3
+
+
+def test_search_ranks_by_similarity_and_survives_a_restart(store):
+    store.add("alice", ["likes jazz", "allergic to peanuts", "travels with a dog"])
+    assert store.search("alice", "allergic to peanuts", k=1) == ["allergic to peanuts"]
+
+    reopened = RecallMemoryStore(FakeEmbeddings(), path=store.path)
+    assert reopened.search("alice", "travels with a dog", k=1) == ["travels with a dog"]
+    reopened.close()
+
+
+def test_new_memories_reach_a_cached_partition(store):
+    store.add("alice", ["likes jazz"])
+    store.search("alice", "likes jazz")
+    store.add("alice", ["likes opera"])
+    assert store.search("alice", "likes opera", k=1) == ["likes opera"]
+
+
+def test_search_waits_for_the_users_queued_saves(store):
+    store.embeddings = FakeEmbeddings(latency_s=0.1)
+    writer = RecallMemoryWriter(store, flush_interval_s=1.0)
+    writer.submit("alice", "Alice is vegetarian")
+    writer.submit("bob", "Bob likes steak")
+
+    # Without the wait this would run before the batching delay is over
+    assert writer.search("alice", "Alice is vegetarian", k=1) == ["Alice is vegetarian"]
+    assert writer.metrics()["read_waits"] == 1
+    writer.close()
+    assert store.count() == 2
+
+
+def test_search_reports_a_timed_out_wait(tmp_path, capsys):
+    embeddings = BlockingEmbeddings()
+    store = RecallMemoryStore(embeddings, path=str(tmp_path / "recall.sqlite3"))
+    writer = RecallMemoryWriter(store, flush_interval_s=0.0, read_timeout_s=0.05)
+    writer.submit("alice", "Alice is vegetarian")
+
+    assert writer.search("alice", "Alice is vegetarian") == []
+    assert writer.metrics()["read_timeouts"] == 1
+    assert "gave up after 0.05 s; 1 of their memories" in capsys.readouterr().out
+
+    embeddings.release.set()
+    writer.close()
+    assert store.count("alice") == 1
+    store.close()
+
+
+def test_close_writes_what_is_still_queued(store):
+    writer = RecallMemoryWriter(store, flush_interval_s=10.0)
+    for i in range(5):
+        writer.submit("alice", f"memory {i}")
+    writer.close()
+
+    assert store.count("alice") == 5
+    metrics = writer.metrics()
+    assert metrics["written"] == 5 and metrics["queue_depth"] == 0
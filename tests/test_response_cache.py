@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from src.utils import response_cache
+from src.utils.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class KeywordEmbeddings:
+    """One axis per known word, so messages sharing most words are close."""
+
+    WORDS = ["best", "top", "sushi", "toronto", "pizza", "montreal"]
+
+    def embed_query(self, text):
+        words = text.split()
+        return [float(word in words) for word in self.WORDS]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+def test_hit_ignores_case_whitespace_and_punctuation():
+    cache = ResponseCache()
+    cache.put("others", "prompt", "Hello there!", "Hi!")
+    assert cache.get("others", "prompt", "  hello   THERE ") == "Hi!"
+    assert cache.get("others", "another prompt", "Hello there") is None
+    assert cache.get("itinerary_planning", "prompt", "Hello there") is None
+    assert cache.metrics()["hits"] == 1 and cache.metrics()["misses"] == 2
+
+
+def test_entries_expire(clock):
+    cache = ResponseCache(ttl_s=60.0)
+    cache.put("others", "prompt", "hello", "hi")
+    clock.now += 59.0
+    assert cache.get("others", "prompt", "hello") == "hi"
+    clock.now += 2.0
+    assert cache.get("others", "prompt", "hello") is None
+    assert cache.metrics()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put("others", "prompt", "a", "A")
+    cache.put("others", "prompt", "b", "B")
+    cache.get("others", "prompt", "a")
+    cache.put("others", "prompt", "c", "C")
+
+    assert cache.get("others", "prompt", "b") is None
+    assert cache.get("others", "prompt", "a") == "A"
+    assert cache.get("others", "prompt", "c") == "C"
+    assert cache.metrics()["evictions"] == 1
+
+
+def test_byte_budget_evicts_and_skips_oversized_answers():
+    cache = ResponseCache(max_bytes=30)
+    cache.put("others", "prompt", "a", "x" * 20)
+    cache.put("others", "prompt", "b", "y" * 20)
+    assert cache.get("others", "prompt", "a") is None
+    cache.put("others", "prompt", "c", "z" * 100)
+    assert cache.get("others", "prompt", "c") is None
+    assert cache.metrics()["bytes"] <= 30
+
+
+def test_semantic_hit_stays_within_the_service_and_prompt():
+    cache = ResponseCache(embeddings=KeywordEmbeddings(), similarity_threshold=0.6)
+    cache.put("restaurant_recommendations", "prompt", "best sushi toronto", "Try Shoushin")
+
+    assert cache.get("restaurant_recommendations", "prompt", "top sushi toronto") == "Try Shoushin"
+    assert cache.get("restaurant_recommendations", "prompt", "best pizza montreal") is None
+    assert cache.get("others", "prompt", "top sushi toronto") is None
+    assert cache.metrics()["semantic_hits"] == 1
+
+
+def test_semantic_lookup_skips_expired_and_evicted_entries(clock):
+    cache = ResponseCache(max_entries=1, ttl_s=60.0, embeddings=KeywordEmbeddings(), similarity_threshold=0.6)
+    cache.put("others", "prompt", "best sushi toronto", "sushi")
+    cache.put("others", "prompt", "best pizza montreal", "pizza")
+    assert cache.get("others", "prompt", "top sushi toronto") is None
+
+    clock.now += 61.0
+    assert cache.get("others", "prompt", "top pizza montreal") is None
+    # The evicted entry's matrix row was cleared and reused
+    assert np.count_nonzero(cache._matrix.any(axis=1)) == 1
@@ -0,0 +1,57 @@
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks import fake_openai_server
+from benchmarks.fakes import FakeTokenizer
+from src.chatbot import Chatbot
+from src.engine import ChatbotEngine
+from src.services import llm_gateway
+from src.utils import embedding_service, long_term_memory
+
+
+@pytest.fixture
+def openai_server(tmp_path, monkeypatch):
+    """The fake OpenAI server on a free port, with the gateway's real OpenAI clients pointed at it."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setitem(fake_openai_server.settings, "latency_s", 0.0)
+    monkeypatch.setitem(fake_openai_server.settings, "tokens_per_s", 10000.0)
+    server = uvicorn.Server(uvicorn.Config(fake_openai_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+    monkeypatch.setenv("LANGCHAIN_TRACING_V2", "false")
+    monkeypatch.setattr(long_term_memory, "_resources", {})
+    monkeypatch.setattr(embedding_service, "_service", None)
+    # Fresh shared clients, so none is bound to another test's event loop
+    monkeypatch.setattr(llm_gateway, "_clients", {})
+    # Real chat and embeddings clients; only tiktoken's download is avoided
+    tokenizer = FakeTokenizer()
+    llm_gateway.set_model_factories(tokenizer=lambda model: tokenizer)
+    yield
+    long_term_memory.shutdown()
+    llm_gateway.set_model_factories()
+    server.should_exit = True
+    thread.join()
+
+
+def test_speculative_sync_turns_reuse_the_async_clients(openai_server):
+    engine = ChatbotEngine(graph=long_term_memory.build_graph(checkpointer=MemorySaver()))
+    chatbot = Chatbot(engine=engine, user_id="user-1", thread_id="thread-1", speculative=True)
+
+    # Every turn's router, service and memory calls go through the shared httpx.AsyncClient
+    for message in ("Hello there", "Any tips for Quebec City?", "Thanks!"):
+        assert chatbot.process_message(message)
+        assert chatbot.last_turn_timings["winner"] == "others"
+    assert fake_openai_server.stats["chat_completions"] >= 6
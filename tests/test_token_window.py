@@ -0,0 +1,48 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+
+from benchmarks.fakes import FakeTokenizer
+from src.utils.token_window import TokenWindow
+
+
+def conversation(n):
+    return [
+        (HumanMessage if i % 2 == 0 else AIMessage)(f"message number {i} about travel", id=f"m{i}")
+        for i in range(n)
+    ]
+
+
+def test_encodes_only_new_messages():
+    tokenizer = FakeTokenizer()
+    window = TokenWindow(tokenizer, max_tokens=8)
+    messages = conversation(4)
+    window.update(messages[:2])
+    window.update(messages)
+
+    tokens = tokenizer.encode(get_buffer_string(messages))
+    assert window.total_tokens == len(tokens)
+    assert window.text == tokenizer.decode(tokens[-8:])
+
+
+def test_resets_when_history_is_rewritten():
+    tokenizer = FakeTokenizer()
+    window = TokenWindow(tokenizer)
+    messages = conversation(6)
+    window.update(messages)
+
+    # Compaction: the first message becomes a summary and the next ones are removed
+    compacted = [SystemMessage("Summary of the earlier conversation", id="m0")] + messages[3:]
+    window.update(compacted)
+    assert window.total_tokens == len(tokenizer.encode(get_buffer_string(compacted)))
+    assert window.text == get_buffer_string(compacted)
+
+
+def test_resets_when_the_last_seen_message_changes():
+    tokenizer = FakeTokenizer()
+    window = TokenWindow(tokenizer)
+    messages = conversation(4)
+    window.update(messages)
+
+    # Same length, but the newest message was replaced
+    rewritten = messages[:3] + [AIMessage("a different answer", id="other")] + conversation(5)[4:]
+    window.update(rewritten)
+    assert window.text == get_buffer_string(rewritten)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from src.utils import web_search
+from src.utils.web_search import CachedWebSearch
+
+
+class Backend:
+    def __init__(self, latency_s=0.0, failing=()):
+        self.latency_s = latency_s
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, query, max_results):
+        with self._lock:
+            self.calls.append((query, max_results))
+        time.sleep(self.latency_s)
+        if query in self.failing:
+            raise RuntimeError("quota exceeded")
+        return [{"url": f"https://example.com/{query}/{i}", "content": f"{query} {i}"} for i in range(max_results)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+
+def test_queries_are_cached_by_normalized_text():
+    backend = Backend()
+    search = CachedWebSearch(backend, max_results=2)
+    first = search.search(["Montreal festivals"])
+    second = search.search(["  montreal FESTIVALS! "])
+
+    assert len(backend.calls) == 1
+    assert second == {"  montreal FESTIVALS! ": first["Montreal festivals"]}
+    # A larger entry answers a smaller request, not the other way round
+    assert len(search.search(["montreal festivals"], max_results=1)["montreal festivals"]) == 1
+    search.search(["montreal festivals"], max_results=3)
+    assert len(backend.calls) == 2
+
+
+def test_entries_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(web_search, "time", clock)
+    backend = Backend()
+    search = CachedWebSearch(backend, ttl_s=60.0)
+    search.search(["quebec"])
+    clock.now += 59.0
+    search.search(["quebec"])
+    clock.now += 2.0
+    search.search(["quebec"])
+    assert len(backend.calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    backend = Backend()
+    search = CachedWebSearch(backend, max_entries=2)
+    search.search(["a"])
+    search.search(["b"])
+    search.search(["a"])
+    search.search(["c"])
+    search.search(["a"])
+    assert len(backend.calls) == 3
+    search.search(["b"])
+    assert len(backend.calls) == 4
+
+
+def test_concurrent_searches_share_one_request():
+    backend = Backend(latency_s=0.1)
+    search = CachedWebSearch(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(search.search(["banff hikes"]))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(backend.calls) == 1
+    assert all(result == results[0] for result in results)
+    assert search.metrics()["coalesced"] == 3
+
+
+def test_queries_run_in_parallel_and_failures_are_not_cached():
+    backend = Backend(latency_s=0.1, failing={"broken"})
+    search = CachedWebSearch(backend, max_workers=4)
+    start = time.perf_counter()
+    results = search.search(["a", "b", "c", "broken", "a"])
+    elapsed = time.perf_counter() - start
+
+    assert list(results) == ["a", "b", "c", "broken"]
+    assert results["broken"] == {"error": "quota exceeded"}
+    assert elapsed < 0.3
+    search.search(["broken"])
+    assert [query for query, _ in backend.calls].count("broken") == 2
+    search.close()
+
+
+def test_results_survive_a_restart(tmp_path):
+    path = str(tmp_path / "search.sqlite3")
+    first = CachedWebSearch(Backend(), path=path)
+    first.search(["vancouver"])
+    first.close()
+
+    backend = Backend()
+    search = CachedWebSearch(backend, path=path)
+    assert search.search(["Vancouver"])["Vancouver"][0]["url"] == "https://example.com/vancouver/0"
+    assert backend.calls == [] and search.metrics()["disk_hits"] == 1